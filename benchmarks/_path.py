@@ -0,0 +1,7 @@
+"""Añade src/CalendarIA al sys.path para que los benchmarks importen los módulos como la CLI."""
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src" / "CalendarIA"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
@@ -0,0 +1,98 @@
+"""
+Benchmark: backend síncrono (googleapiclient) frente al asyncio (httpx) contra un servidor REST local.
+
+    python benchmarks/bench_async_backend.py --events 300 --rtt 0.05 --in-flight 16
+    python benchmarks/bench_async_backend.py --throttle 0.05 --server-errors 0.03 --retry-after 0.2
+
+Los dos caminos hablan HTTP de verdad con fake_calendar.serve_http; se mide el ritmo de importación y de
+purga y se comprueba la semántica de reintentos: tras los 429/503 simulados no puede faltar ni sobrar
+ningún evento (cada inserción exactamente una vez; tras la purga solo quedan los borrados con error).
+Los 503 de una inserción van en los dos backends a la cola de reintentos, que se vuelve a pasar al final;
+en la purga async se reintentan, igual que con --batch, y el borrado síncrono uno a uno los deja como error.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import time
+
+from fake_calendar import FakeCalendarAPI, serve_http
+import async_calendar
+import google_calendar as gcal
+import purge
+from ratelimit import RateLimiter
+
+CALENDARS = {"ESTUDIOS": "estudios@group.calendar.google.com", "TRABAJO": "trabajo", "RUTINAS": "rutinas",
+             "MEJORA": "mejora", "DEFAULT": "primary"}
+
+
+def _items(n: int):
+    cal_ids = list(CALENDARS.values())
+    return [(cal_ids[i % len(cal_ids)],
+             {"summary": f"Evento {i}",
+              "start": {"dateTime": "2025-11-05T08:00:00+01:00", "timeZone": "Europe/Madrid"},
+              "end": {"dateTime": "2025-11-05T09:00:00+01:00", "timeZone": "Europe/Madrid"}},
+             "BENCH")
+            for i in range(n)]
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--events", type=int, default=300)
+    p.add_argument("--rtt", type=float, default=0.05)
+    p.add_argument("--in-flight", type=int, default=16)
+    p.add_argument("--workers", type=int, default=4, help="Hilos de la purga síncrona.")
+    p.add_argument("--qps", type=float, default=1000.0, help="Ritmo del limitador (1000 = sin limitar).")
+    p.add_argument("--throttle", type=float, default=0.0)
+    p.add_argument("--server-errors", type=float, default=0.0, help="Fracción de 503 simulados.")
+    p.add_argument("--retry-after", type=float, default=None)
+    args = p.parse_args()
+
+    from google.oauth2.credentials import Credentials
+    creds = Credentials(token="bench")
+    items = _items(args.events)
+    rows = []
+
+    for backend in ("sync", "async"):
+        api = FakeCalendarAPI(args.rtt, args.throttle, args.server_errors)
+        server, base_url = serve_http(api, args.retry_after)
+        gcal._DISCOVERY["calendar"] = dict(gcal._discovery_document(), rootUrl=base_url.split("calendar/v3/")[0])
+        limiter = RateLimiter(qps=args.qps, max_qps=args.qps)
+
+        # Importación
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if backend == "sync":
+                failed = gcal._import_sequential(gcal.build_service(creds), items, limiter)
+            else:
+                failed = async_calendar.import_items(items, creds, limiter, max_in_flight=args.in_flight,
+                                                     base_url=base_url)
+        import_s = time.perf_counter() - t0
+        inserted, import_throttled = api.inserted, api.throttled
+
+        # Purga de todo lo importado
+        api.throttled = 0
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if backend == "sync":
+                purge.service_factory = lambda *_: gcal.per_thread_services(creds)
+                purge.purge_events(CALENDARS, "2025-11-01", dry_run=False, limiter=limiter, workers=args.workers)
+            else:
+                async_calendar.purge_calendars(CALENDARS, "2025-11-01T00:00:00Z", None, False, creds, limiter,
+                                               max_in_flight=args.in_flight, base_url=base_url)
+        purge_s = time.perf_counter() - t0
+        server.shutdown()
+        rows.append((backend, import_s, inserted, failed, import_throttled, purge_s, api.inserted, api.throttled))
+
+    print(f"{'backend':<7} {'importar':>9} {'ev/s':>7} {'creados':>8} {'errores':>8} {'429':>4}   "
+          f"{'purgar':>8} {'ev/s':>7} {'quedan':>7} {'429':>4}")
+    for backend, imp, inserted, failed, thr, pur, left, thr2 in rows:
+        print(f"{backend:<7} {imp:>8.2f}s {args.events / imp:>7.1f} {inserted:>8} {failed:>8} {thr:>4}   "
+              f"{pur:>7.2f}s {inserted / pur:>7.1f} {left:>7} {thr2:>4}")
+        # Reintentos correctos: ni duplicados ni pérdidas (un 503 que persiste tras la cola cuenta como error)
+        assert inserted + failed == args.events, f"{backend}: {inserted} creados + {failed} errores != {args.events}"
+    print(f"speedup async: importar x{rows[0][1] / rows[1][1]:.1f}, purgar x{rows[0][5] / rows[1][5]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: JSON del plan → bodies de la API (+ .ics) por el camino anterior y por el directo.
+
+    python benchmarks/bench_ics_pipeline.py --events 1000 10000 100000
+
+- anterior: icalendar construye y escribe el .ics, la librería ics lo vuelve a leer y de ahí salen los bodies
+- directo: ics_utils.plan_bodies desde el JSON en memoria + ics_utils.write_ics en streaming
+Comprueba además que ambos caminos producen exactamente los mismos bodies, y que import-ics sobre el .ics
+escrito da los mismos que plan_bodies también con eventos de día completo y series RRULE.
+"""
+from __future__ import annotations
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+from google_calendar import _build_insert_items
+from ics_utils import parse_local, plan_bodies, write_ics
+from routing import Router
+
+TZ = "Europe/Madrid"
+TITLES = ["📚 Estudio — Redes", "☕ Desayuno", "🧘‍♂️ Pausa activa", "🇬🇧 Inglés", "💼 Trabajo", "🍝 Almuerzo"]
+
+
+def make_plan(n: int) -> dict:
+    t = datetime(2025, 1, 1, 8, 0)
+    events = []
+    for i in range(n):
+        end = t + timedelta(minutes=30)
+        events.append({"summary": TITLES[i % len(TITLES)], "start": t.isoformat(), "end": end.isoformat()})
+        t = end if end.hour < 23 else datetime.combine(end.date() + timedelta(days=1), datetime.min.time()).replace(hour=8)
+    return {"calendar": {"timezone": TZ}, "events": events}
+
+
+def old_path(data: dict, ics_path: Path):
+    """El camino de antes: icalendar para escribir, ics para volver a leer."""
+    from icalendar import Calendar as ICalCalendar, Event as ICalEvent
+    from ics import Calendar as ICSCalendar
+
+    cal = ICalCalendar()
+    cal.add("prodid", "-//Plan//GenAI//ES")
+    cal.add("version", "2.0")
+    now_utc = datetime.now(timezone.utc)
+    for i, evj in enumerate(data["events"], 1):
+        ev = ICalEvent()
+        ev.add("summary", evj["summary"])
+        ev.add("dtstart", parse_local(evj["start"], TZ))
+        ev.add("dtend", parse_local(evj["end"], TZ))
+        ev.add("uid", f"uned-plan-{i}")
+        ev.add("dtstamp", now_utc)
+        cal.add_component(ev)
+    ics_path.write_bytes(cal.to_ical())
+
+    z = ZoneInfo(TZ)
+    bodies = []
+    for ev in ICSCalendar(ics_path.read_text(encoding="utf-8")).events:
+        dt_start = ev.begin.astimezone(z)
+        dt_end = ev.end.astimezone(z)
+        bodies.append({"summary": ev.name or "(sin título)",
+                       "start": {"dateTime": dt_start.isoformat(), "timeZone": TZ},
+                       "end": {"dateTime": dt_end.isoformat(), "timeZone": TZ}})
+    return bodies
+
+
+def new_path(data: dict, ics_path: Path):
+    write_ics(data, ics_path, TZ)
+    return plan_bodies(data, TZ, TZ)
+
+
+def _key(body: dict):
+    return body["start"].get("dateTime") or body["start"]["date"], body["summary"]
+
+
+def check_import_ics(tmp: Path) -> None:
+    """Los bodies directos deben ser los mismos que los de import-ics leyendo el .ics (los hashes de sync también)."""
+    data = make_plan(20)
+    data["events"] += [
+        {"summary": "🎉 Fiesta", "start": "2025-01-06", "end": "2025-01-07", "all_day": True},
+        {"summary": "🏖️ Vacaciones", "start": "2025-03-30T00:00:00", "end": "2025-04-01T00:00:00", "all_day": True,
+         "rrule": "FREQ=WEEKLY;COUNT=2"},
+        {"summary": "☕ Desayuno", "start": "2025-03-29T08:00:00", "end": "2025-03-29T08:30:00",
+         "rrule": "FREQ=DAILY;COUNT=3"},
+    ]
+    write_ics(data, tmp / "check.ics", TZ)
+    imported = [body for _, body, _ in _build_insert_items(tmp / "check.ics", TZ, Router({}))]
+    assert sorted(imported, key=_key) == sorted(plan_bodies(data, TZ, TZ), key=_key), \
+        "import-ics y plan_bodies no dan los mismos bodies"
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--events", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    p.add_argument("--old-max", type=int, default=10_000,
+                   help="No mide el camino anterior por encima de este tamaño (con 100k tarda varios minutos).")
+    args = p.parse_args()
+
+    print(f"{'eventos':>8} {'anterior':>10} {'directo':>9} {'mejora':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_import_ics(Path(tmp))
+        for n in args.events:
+            data = make_plan(n)
+            t0 = time.perf_counter()
+            new = new_path(data, Path(tmp) / "new.ics")
+            fast = time.perf_counter() - t0
+            if n > args.old_max:
+                print(f"{n:>8} {'-':>10} {fast:>8.3f}s {'-':>7}")
+                continue
+            t0 = time.perf_counter()
+            old = old_path(data, Path(tmp) / "old.ics")
+            slow = time.perf_counter() - t0
+            # ics no conserva el orden del fichero: se comparan ordenados
+            assert sorted(old, key=_key) == sorted(new, key=_key), "los bodies no coinciden"
+            print(f"{n:>8} {slow:>9.3f}s {fast:>8.3f}s {slow / fast:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
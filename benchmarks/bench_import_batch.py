@@ -0,0 +1,62 @@
+"""
+Benchmark: importación secuencial vs batch contra un doble local de la API de Calendar.
+
+    python benchmarks/bench_import_batch.py --events 150 --rtt 0.08
+    python benchmarks/bench_import_batch.py --qps 1000   # sin limitar el ritmo
+
+Usa el doble local de fake_calendar.py: cada ida y vuelta cuesta --rtt segundos y un batch cuenta como una.
+Ambos modos pasan por el RateLimiter: cada elemento de un batch consume cuota, así que con
+el ritmo por defecto la ganancia del batch se limita a las idas y vueltas ahorradas.
+Con --throttle se devuelve 429 a esa fracción de las llamadas para ejercitar los reintentos.
+"""
+from __future__ import annotations
+import argparse
+import time
+
+from fake_calendar import FakeCalendarAPI
+import google_calendar as gcal
+from ratelimit import RateLimiter
+
+
+def _items(n: int):
+    cals = ["ESTUDIOS", "TRABAJO", "RUTINAS", "MEJORA", "primary"]
+    return [
+        (cals[i % len(cals)],
+         {"summary": f"Evento {i}",
+          "start": {"dateTime": "2025-11-05T08:00:00+01:00", "timeZone": "Europe/Madrid"},
+          "end": {"dateTime": "2025-11-05T09:00:00+01:00", "timeZone": "Europe/Madrid"}},
+         cals[i % len(cals)])
+        for i in range(n)
+    ]
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--events", type=int, default=150)
+    p.add_argument("--rtt", type=float, default=0.08)
+    p.add_argument("--qps", type=float, default=5.0, help="Ritmo inicial del limitador (como en settings.toml).")
+    p.add_argument("--throttle", type=float, default=0.0)
+    args = p.parse_args()
+
+    items = _items(args.events)
+    results = []
+    for label, fn in (
+        ("secuencial", gcal._import_sequential),
+        ("batch", gcal._import_batched),
+    ):
+        api = FakeCalendarAPI(args.rtt, args.throttle)
+        limiter = RateLimiter(qps=args.qps, max_qps=max(args.qps, 10.0))
+        t0 = time.perf_counter()
+        fn(api, items, limiter)
+        results.append((label, time.perf_counter() - t0, api))
+        print(limiter.report())
+
+    print()
+    for label, dt, api in results:
+        print(f"{label:<12} {dt:8.2f}s  {args.events / dt:8.1f} ev/s  "
+              f"{api.round_trips:5d} round trips  {api.throttled:3d} 429")
+    print(f"speedup: x{results[0][1] / results[1][1]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
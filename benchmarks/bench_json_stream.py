@@ -0,0 +1,102 @@
+"""
+Fuzzing y benchmark: parser incremental de la salida en streaming (json_stream.EventStreamParser).
+
+    python benchmarks/bench_json_stream.py --fuzz 2000 --seed 7
+    python benchmarks/bench_json_stream.py --kb 64 256 1024 --chunk 40
+
+Fuzzing: planes aleatorios con strings hostiles (llaves y corchetes entre comillas, escapes, emojis), objetos
+anidados dentro de los eventos y fuera de "events", "calendar" antes o después de los eventos y texto del
+modelo alrededor. El texto se corta en trozos de tamaño aleatorio (desde 1 carácter) y los eventos emitidos
+y parser.calendar deben ser exactamente los de json.loads del texto completo.
+
+Benchmark: tiempo de alimentar el parser con trozos de --chunk caracteres (como llegan de Gemini) frente a
+un único json.loads del texto completo al final.
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import time
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+from json_stream import EventStreamParser, iter_events
+
+HOSTILE = ['{', '}', '[', ']', '{"a": 1}', '"', '\\', '\\"', '\\n', '\\u00f1', 'ñ', '💼', '"events": [', ':', ',']
+NOISE = ["Claro, aquí tienes el plan:\n```json\n", "```json\n", "", "Plan (sin llaves):\n"]
+
+
+def _text(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice(HOSTILE) if rng.random() < 0.3 else rng.choice("abcdefgh áé ") for _ in range(n))
+
+
+def make_plan(rng: random.Random, events: int) -> dict:
+    out = []
+    for i in range(events):
+        ev = {"summary": _text(rng, rng.randint(1, 20)), "start": f"2025-11-{3 + i % 7:02d}T{8 + i % 12:02d}:00:00",
+              "end": f"2025-11-{3 + i % 7:02d}T{8 + i % 12:02d}:30:00"}
+        if rng.random() < 0.5:
+            ev["description"] = _text(rng, rng.randint(0, 40))
+        if rng.random() < 0.3:
+            ev["meta"] = {"nested": {"deep": [1, {"x": "}]"}, []]}, "tags": ["{", "]"]}
+        out.append(ev)
+    calendar = {"name": _text(rng, 8), "timezone": "Europe/Madrid", "extra": {"a": [{"b": "}"}]}}
+    parts = [("events", out), ("calendar", calendar)]
+    if rng.random() < 0.5:
+        parts.reverse()  # los eventos llegan antes que "calendar"
+    if rng.random() < 0.3:
+        parts.insert(rng.randint(0, 2), ("notes", {"events": "no", "list": [{"x": 1}]}))
+    return dict(parts)
+
+
+def split(rng: random.Random, text: str, max_chunk: int):
+    i = 0
+    while i < len(text):
+        n = rng.randint(1, max_chunk)
+        yield text[i:i + n]
+        i += n
+
+
+def fuzz(cases: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for case in range(cases):
+        plan = make_plan(rng, rng.randint(0, 12))
+        body = json.dumps(plan, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+        text = rng.choice(NOISE) + body + rng.choice(["", "\n```", "\n```\nEspero que te sirva."])
+        parser = EventStreamParser()
+        events = list(iter_events(split(rng, text, rng.choice([1, 3, 16, 200])), parser))
+        expected = json.loads(body)
+        assert events == expected["events"], f"caso {case}: eventos distintos"
+        assert parser.calendar == expected["calendar"], f"caso {case}: calendar distinto"
+        assert parser.count == len(events)
+    print(f"✅ Fuzzing: {cases} plan(es) troceados, eventos y calendar idénticos a json.loads.")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--fuzz", type=int, default=2000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--kb", type=int, nargs="+", default=[64, 256, 1024])
+    p.add_argument("--chunk", type=int, default=40, help="Caracteres por trozo del stream.")
+    args = p.parse_args()
+
+    fuzz(args.fuzz, args.seed)
+
+    print(f"\n{'KB':>6} {'eventos':>8} {'stream':>10} {'json.loads':>11}")
+    rng = random.Random(args.seed)
+    for kb in args.kb:
+        plan = make_plan(rng, 1)
+        while len(json.dumps(plan)) < kb * 1024:
+            plan["events"].extend(make_plan(rng, 200)["events"])
+        text = json.dumps(plan, ensure_ascii=False)
+        chunks = [text[i:i + args.chunk] for i in range(0, len(text), args.chunk)]
+        t0 = time.perf_counter()
+        events = list(iter_events(chunks))
+        streamed = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        json.loads(text)
+        whole = time.perf_counter() - t0
+        print(f"{kb:>6} {len(events):>8} {streamed * 1000:>8.1f}ms {whole * 1000:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark y comprobación: caché de respuestas de Gemini (llm_cache.ResponseCache) con un modelo simulado.
+
+    python benchmarks/bench_llm_cache.py --latency 0.5 --prompts 20
+
+Sin red ni google.generativeai: el módulo se sustituye por un GenerativeModel que tarda 'latency' segundos
+y cuenta las llamadas. Comprueba que:
+- un prompt repetido llama una sola vez a la API
+- refresh (--refresh en la CLI) vuelve a llamar y guarda la respuesta nueva
+- sin caché (--no-cache en la CLI) cada petición llama a la API y no se guarda nada
+- una entrada guardada hace más de max_age_days caduca aunque se haya seguido usando
+Después mide cuánto tardan 'prompts' peticiones repetidas dos veces con y sin caché.
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+from llm_cache import ResponseCache
+
+
+class StubModel:
+    """Lo que GeminiClient usa de genai.GenerativeModel."""
+    calls = 0
+    latency = 0.0
+
+    def __init__(self, model_name, generation_config=None):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, request_options=None):
+        StubModel.calls += 1
+        time.sleep(StubModel.latency)
+        return SimpleNamespace(text=json.dumps({"prompt": prompt, "call": StubModel.calls}))
+
+
+def _install_stub() -> None:
+    genai = ModuleType("google.generativeai")
+    genai.configure = lambda api_key: None
+    genai.GenerativeModel = StubModel
+    sys.modules["google.generativeai"] = genai
+
+
+def _calls(fn) -> int:
+    before = StubModel.calls
+    fn()
+    return StubModel.calls - before
+
+
+def _age(cache: ResponseCache, key: str, days: float) -> None:
+    """Retrasa la fecha de creación de una entrada sin tocar su marca de último uso."""
+    path = cache._path(key)
+    record = json.loads(path.read_text(encoding="utf-8"))
+    record["created"] -= days * 86400
+    path.write_text(json.dumps(record), encoding="utf-8")
+
+
+def check(tmp: Path) -> None:
+    from gemini_ia import GeminiClient
+    cache = ResponseCache(tmp / "check", max_age_days=1)
+    client = GeminiClient("stub", "gemini-2.5-pro", cache=cache)
+
+    first = client.generate_json("semana 1")
+    assert _calls(lambda: client.generate_json("semana 1")) == 0, "un prompt repetido no debe llamar a la API"
+    assert client.generate_json("semana 1") == first
+    assert _calls(lambda: client.generate_json("semana 2")) == 1, "un prompt nuevo debe llamar a la API"
+
+    assert _calls(lambda: client.generate_json("semana 1", refresh=True)) == 1, "refresh debe llamar a la API"
+    refreshed = client.generate_json("semana 1")
+    assert refreshed != first, "refresh debe guardar la respuesta nueva"
+
+    uncached = GeminiClient("stub", "gemini-2.5-pro", cache=None)
+    assert _calls(lambda: [uncached.generate_json("semana 3") for _ in range(2)]) == 2, "sin caché siempre se llama"
+    assert cache.get(client._cache_key("semana 3")) is None, "sin caché no se guarda nada"
+
+    key = client._cache_key("semana 1")
+    _age(cache, key, 2)
+    assert _calls(lambda: client.generate_json("semana 1")) == 1, "una entrada caducada (por antigüedad) debe pedirse otra vez"
+    _age(cache, client._cache_key("semana 2"), 2)
+    cache.evict()
+    assert not cache._path(client._cache_key("semana 2")).exists(), "evict debe borrar las entradas caducadas"
+    print("✅ Caché: repetido, refresh, sin caché y caducidad correctos.")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--latency", type=float, default=0.5, help="Segundos por llamada simulada a Gemini.")
+    p.add_argument("--prompts", type=int, default=20)
+    args = p.parse_args()
+    _install_stub()
+    from gemini_ia import GeminiClient
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check(Path(tmp))
+        StubModel.latency = args.latency
+        print(f"\n{'caché':<8} {'llamadas':>9} {'total':>9}")
+        for name, cache in (("no", None), ("sí", ResponseCache(Path(tmp) / "bench"))):
+            client = GeminiClient("stub", "gemini-2.5-pro", cache=cache)
+            t0 = time.perf_counter()
+            calls = _calls(lambda: [client.generate_json(f"semana {i}") for _ in range(2) for i in range(args.prompts)])
+            print(f"{name:<8} {calls:>9} {time.perf_counter() - t0:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
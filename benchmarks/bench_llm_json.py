@@ -0,0 +1,140 @@
+"""
+Benchmark y fuzzing: extracción del plan de la salida del modelo (llm_json.extract_plan) frente a la
+limpieza anterior (replace encadenados + re.search(r"\\{.*\\}\\s*$")).
+
+    python benchmarks/bench_llm_json.py --mb 1 4 16
+    python benchmarks/bench_llm_json.py --fuzz 5000 --seed 7
+
+Benchmark: planes de varios MB envueltos en ruido típico del modelo (saludo, fence ```json y comentario final)
+con descripciones que contienen llaves, comillas escapadas y objetos anidados. Para cada tamaño se mide:
+- limpio: sin texto detrás del JSON
+- ruido: con un comentario final sin llaves, donde la regex antigua retrocede desde cada '{'. Solo se mide
+  hasta --old-max MB porque el coste crece con el cuadrado del tamaño.
+La columna "antiguo ok" indica si la limpieza anterior devolvía el plan intacto.
+
+Fuzzing: planes aleatorios con strings hostiles, ruido alrededor (con llaves y comillas sueltas), fences y la
+variante con todas las llaves dobladas. Siempre debe salir el plan original. Si el plan se trunca o se rompe,
+debe salir un ValueError y nunca otra excepción ni un cuelgue.
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import re
+import time
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+import llm_json
+from llm_json import extract_plan
+
+HOSTILE = ['{', '}', '}}', '{{', '"', '\\', '\\"', '\\n', '```', '{"a": 1}', 'ñ', '💼', ' ', ':', ',', '[', ']']
+
+
+def old_clean(raw: str):
+    """La limpieza de ics_utils.read_clean_json antes de llm_json (para comparar)."""
+    raw = raw.strip()
+    raw = (raw.lstrip("﻿").replace("```json", "").replace("```JSON", "").replace("```", "")
+           .replace("Claro,", "").replace("Aquí tienes", ""))
+    raw = raw.replace("{{", "{").replace("}}", "}")
+    m = re.search(r"\{.*\}\s*$", raw, re.DOTALL)
+    if not m:
+        raise ValueError("sin objeto")
+    return json.loads(m.group(0))
+
+
+def _text(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice(HOSTILE) if rng.random() < 0.3 else rng.choice("abcdefgh áé ") for _ in range(n))
+
+
+def make_plan(rng: random.Random, events: int, hostile: bool = True):
+    out = []
+    for i in range(events):
+        day, hour = 3 + i % 7, 8 + i % 12
+        ev = {"summary": f"Evento {i}", "start": f"2025-11-{day:02d}T{hour:02d}:00:00",
+              "end": f"2025-11-{day:02d}T{hour:02d}:30:00"}
+        if hostile:
+            ev["description"] = _text(rng, rng.randint(0, 40))
+            if rng.random() < 0.2:
+                ev["meta"] = {"nested": {"deep": [1, {"x": "}}"}]}}
+        out.append(ev)
+    return {"calendar": {"name": "Plan", "timezone": "Europe/Madrid"}, "events": out}
+
+
+def wrap(rng: random.Random, body: str) -> str:
+    prefix = rng.choice(["", "Claro, aquí tienes el plan:\n", "Plan {semana}: \"borrador\n", "{ver abajo}\n"])
+    suffix = rng.choice(["", "\n", "\nEspero que te sirva.", "\nSi quieres cambios {dímelo}.", "\n\"}"])
+    if rng.random() < 0.5:
+        body = f"```json\n{body}\n```"
+    return prefix + body + suffix
+
+
+def fuzz(cases: int, seed: int) -> None:
+    rng = random.Random(seed)
+    ok = errors = 0
+    for case in range(cases):
+        doubled = rng.random() < 0.1
+        # Con las llaves dobladas los textos no llevan llaves: dentro de un string no se puede saber cuáles eran
+        plan = make_plan(rng, rng.randint(0, 8), hostile=not doubled)
+        body = json.dumps(plan, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+        if doubled:
+            body = body.replace("{", "{{").replace("}", "}}")  # el modelo copia las llaves del prompt
+        text = wrap(rng, body)
+        assert extract_plan(text) == plan, f"caso {case}: plan distinto\n{text[:500]}"
+        ok += 1
+
+        # Roto o truncado: siempre ValueError (o, por casualidad, un plan válido), nunca otra cosa
+        broken = text[:rng.randint(0, len(text))] if rng.random() < 0.5 else text.replace(":", "", 1)
+        try:
+            extract_plan(broken)
+        except ValueError:
+            errors += 1
+    print(f"fuzz: {ok} planes recuperados intactos, {errors} entradas rotas rechazadas con ValueError")
+
+
+def _time(fn, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--mb", type=float, nargs="+", default=[1, 4, 16])
+    p.add_argument("--old-max", type=float, default=1, help="MB máximos para medir la regex antigua con ruido.")
+    p.add_argument("--fuzz", type=int, default=2000)
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"backend JSON: {'orjson' if llm_json.orjson else 'json'}")
+    print(f"{'MB':>6} {'eventos':>8} {'nuevo limpio':>13} {'nuevo ruido':>12} {'antiguo limpio':>15} "
+          f"{'antiguo ruido':>14} {'antiguo ok':>11}")
+    for mb in args.mb:
+        per_event = len(json.dumps(make_plan(random.Random(0), 200)["events"])) / 200
+        plan = make_plan(rng, int(mb * 1024 * 1024 / per_event))
+        body = "Claro, aquí tienes el plan:\n```json\n" + json.dumps(plan, ensure_ascii=False, indent=1) + "\n```"
+        noisy = body + "\nEspero que te sirva, cualquier cambio me dices." * 20
+
+        assert extract_plan(body) == plan and extract_plan(noisy) == plan
+        new_clean, new_noisy = _time(extract_plan, body), _time(extract_plan, noisy)
+        try:
+            old_ok = "sí" if old_clean(body) == plan else "corrompe"
+        except (ValueError, json.JSONDecodeError):
+            old_ok = "falla"
+        old_clean_s = _time(lambda t: _safe(old_clean, t), body)
+        old_noisy = f"{_time(lambda t: _safe(old_clean, t), noisy):>13.2f}s" if mb <= args.old_max else f"{'-':>14}"
+        print(f"{mb:>6} {len(plan['events']):>8} {new_clean:>12.3f}s {new_noisy:>11.3f}s {old_clean_s:>14.3f}s "
+              f"{old_noisy} {old_ok:>11}")
+
+    fuzz(args.fuzz, args.seed)
+
+
+def _safe(fn, *args):
+    try:
+        return fn(*args)
+    except (ValueError, json.JSONDecodeError):
+        return None
+
+
+if __name__ == "__main__":
+    main()
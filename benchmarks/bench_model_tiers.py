@@ -0,0 +1,113 @@
+"""
+Benchmark: modelos por niveles con cambio de modelo por validación y cobertura (hedging) al p95.
+
+    python benchmarks/bench_model_tiers.py --calls 100 --scale 0.005
+
+Simula tres niveles con la latencia (lognormal) y la tasa de planes con solapes de cada modelo; 'scale'
+convierte los segundos simulados en reales para que la prueba sea rápida. Las respuestas se comprueban con
+la validación de verdad (model_tiers.plan_check). Compara:
+- solo pro: lo que había antes, un único modelo
+- niveles: flash-lite → flash → pro subiendo solo si la respuesta no pasa
+- niveles + cobertura: además se lanza el siguiente nivel si el actual supera su p95
+Para cada estrategia: latencia media y p95 (en segundos simulados), planes válidos y llamadas a cada modelo
+(el coste). Las latencias de cada modelo vienen de una pasada previa de calentamiento, como el histórico
+que se guarda en [model] stats.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import copy
+import io
+import json
+import random
+import threading
+import time
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+from model_tiers import TieredClient, TierStats, _p95, plan_check
+
+# modelo: (mediana en s, sigma lognormal, probabilidad de plan con solapes)
+MODELS = {
+    "gemini-2.5-flash-lite": (12.0, 0.6, 0.35),
+    "gemini-2.5-flash": (25.0, 0.5, 0.15),
+    "gemini-2.5-pro": (70.0, 0.4, 0.03),
+}
+TRABAJO = {"2025-11-05": "13:00 - 15:30"}
+
+
+def _plan(overlap: bool) -> str:
+    events = [{"summary": "💼 Trabajo", "start": "2025-11-05T13:00:00", "end": "2025-11-05T15:30:00"},
+              {"summary": "📚 Estudio — Redes", "start": "2025-11-05T09:00:00", "end": "2025-11-05T10:45:00"}]
+    if overlap:
+        events.append({"summary": "📚 Estudio — Álgebra", "start": "2025-11-05T10:00:00", "end": "2025-11-05T11:00:00"})
+    return "Claro:\n" + json.dumps({"calendar": {"name": "Plan"}, "events": events}, ensure_ascii=False)
+
+
+class FakeModel:
+    """Lo que TieredClient usa de GeminiClient, con latencia y fallos simulados."""
+
+    def __init__(self, name: str, seed: int, scale: float):
+        self.model_name = name
+        self.median, self.sigma, self.bad = MODELS[name]
+        self.rng = random.Random(f"{name}-{seed}")
+        self.scale = scale
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def cached(self, prompt: str):
+        return None
+
+    def generate_json(self, prompt: str, refresh: bool = False) -> str:
+        with self._lock:
+            self.calls += 1
+            latency = self.rng.lognormvariate(0, self.sigma) * self.median
+            bad = self.rng.random() < self.bad
+        time.sleep(latency * self.scale)
+        return _plan(bad)
+
+
+def run(models, calls: int, hedge: bool, stats: TierStats, scale: float):
+    """(latencia media, p95, planes válidos) en segundos simulados."""
+    client = TieredClient(models, stats=stats, hedge=hedge)
+    check = plan_check(TRABAJO)
+    latencies, valid = [], 0
+    for i in range(calls):
+        t0 = time.perf_counter()
+        text = client.generate_json(f"prompt {i}", check=check)
+        latencies.append((time.perf_counter() - t0) / scale)
+        valid += check(text) is None
+    return sum(latencies) / calls, _p95(latencies), valid
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--calls", type=int, default=100)
+    p.add_argument("--scale", type=float, default=0.005, help="Segundos reales por segundo simulado.")
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args()
+
+    # Calentamiento: historial de latencias por modelo, como el que se guarda en [model] stats
+    warm = TierStats()
+    for name in MODELS:
+        model = FakeModel(name, -1, args.scale)
+        for _ in range(20):
+            t0 = time.perf_counter()
+            model.generate_json("warm")
+            warm.record(name, "ok", time.perf_counter() - t0)
+    print("p95 de calentamiento: " + ", ".join(f"{m} {warm.p95(m) / args.scale:.0f}s" for m in MODELS))
+
+    print(f"\n{'estrategia':<22} {'media':>9} {'p95':>9} {'válidos':>11}  llamadas por modelo")
+    for name, tiers, hedge in (("solo pro", ["gemini-2.5-pro"], False),
+                               ("niveles", list(MODELS), False),
+                               ("niveles + cobertura", list(MODELS), True)):
+        models = [FakeModel(m, args.seed, args.scale) for m in tiers]
+        stats = TierStats()
+        stats.data = copy.deepcopy(warm.data)
+        with contextlib.redirect_stdout(io.StringIO()):  # sin los avisos de cambio de nivel
+            mean, p95, valid = run(models, args.calls, hedge, stats, args.scale)
+        used = " · ".join(f"{m.model_name.removeprefix('gemini-2.5-')} {m.calls}" for m in models)
+        print(f"{name:<22} {mean:>8.1f}s {p95:>8.1f}s {valid:>5}/{args.calls:<5}  {used}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: renderizado del prompt con la plantilla compilada frente a leer el fichero y encadenar tres
+.replace en cada llamada (render_prompt anterior), y tramos que salen con el presupuesto de tokens.
+
+    python benchmarks/bench_prompt.py --renders 2000 --days 7 14 28 56
+
+La primera tabla renderiza el mismo rango 'renders' veces (como plan-range con muchas semanas) y comprueba
+que ambos dan el mismo texto. La segunda muestra, para cada modelo y longitud de rango, cuántas llamadas
+se harían y los tokens estimados del prompt y de la salida de cada tramo (sin red: estimación local).
+"""
+from __future__ import annotations
+import argparse
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+from prompt import MODEL_LIMITS, TokenBudget, build_bloque_trabajo, build_prompts, render_prompt
+
+TEMPLATE = Path(__file__).resolve().parents[1] / "prompts" / "prompt_es.txt"
+SHIFTS = ["Libranza", "13:00 - 15:30", "13:30 - 22:00", "14:30 - 22:00"]
+
+
+def old_render(template_path: Path, semana_inicio: str, semana_final: str, trabajo) -> str:
+    """render_prompt antes de compilar la plantilla (para comparar)."""
+    tpl = template_path.read_text(encoding="utf-8")
+    return (tpl.replace("{SEMANA_INICIO}", semana_inicio)
+               .replace("{SEMANA_FINAL}", semana_final)
+               .replace("{BLOQUE_TRABAJO}", build_bloque_trabajo(trabajo)))
+
+
+def make_range(days: int):
+    first = date(2025, 11, 3)
+    trabajo = {(first + timedelta(days=d)).isoformat(): SHIFTS[d % len(SHIFTS)] for d in range(days + 1)}
+    return first.isoformat(), (first + timedelta(days=days - 1)).isoformat(), trabajo
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--renders", type=int, default=2000)
+    p.add_argument("--days", type=int, nargs="+", default=[7, 14, 28, 56])
+    args = p.parse_args()
+
+    inicio, final, trabajo = make_range(7)
+    assert render_prompt(TEMPLATE, inicio, final, trabajo) == old_render(TEMPLATE, inicio, final, trabajo)
+    timings = {}
+    for name, fn in (("antes", old_render), ("compilada", render_prompt)):
+        t0 = time.perf_counter()
+        for _ in range(args.renders):
+            fn(TEMPLATE, inicio, final, trabajo)
+        timings[name] = (time.perf_counter() - t0) / args.renders * 1e6
+    print(f"render ({args.renders}x): antes {timings['antes']:.1f}µs · compilada {timings['compilada']:.1f}µs "
+          f"({timings['antes'] / timings['compilada']:.1f}x)")
+
+    print(f"\n{'modelo':<22} {'días':>5} {'llamadas':>9} {'prompt':>8} {'salida/tramo':>13} {'salida útil':>12}")
+    for model in MODEL_LIMITS:
+        budget = TokenBudget.from_settings({}, model)
+        for days in args.days:
+            inicio, final, trabajo = make_range(days)
+            prompts = build_prompts(TEMPLATE, inicio, final, trabajo, budget)
+            longest = max((date.fromisoformat(p.semana_final) - date.fromisoformat(p.semana_inicio)).days + 1
+                          for p in prompts)
+            print(f"{model:<22} {days:>5} {len(prompts):>9} {max(p.tokens for p in prompts):>8} "
+                  f"{longest * budget.tokens_per_day:>13} {budget.output_tokens:>12}")
+
+
+if __name__ == "__main__":
+    main()
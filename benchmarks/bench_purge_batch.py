@@ -0,0 +1,55 @@
+"""
+Benchmark: purga evento a evento vs batch contra un doble local de la API de Calendar.
+
+    python benchmarks/bench_purge_batch.py --events 500 --workers 4
+    python benchmarks/bench_purge_batch.py --throttle 0.02 --server-errors 0.02
+
+Compara idas y vueltas HTTP y tiempo total; los 429/503 se reintentan solo para los elementos afectados.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import time
+
+from fake_calendar import FakeCalendarAPI
+import purge
+from ratelimit import RateLimiter
+
+CALENDARS = {"ESTUDIOS": "estudios", "TRABAJO": "trabajo", "RUTINAS": "rutinas", "MEJORA": "mejora", "DEFAULT": "primary"}
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--events", type=int, default=500, help="Eventos por calendario.")
+    p.add_argument("--rtt", type=float, default=0.05)
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--qps", type=float, default=1000.0, help="Ritmo del limitador (1000 = sin limitar).")
+    p.add_argument("--throttle", type=float, default=0.0)
+    p.add_argument("--server-errors", type=float, default=0.0)
+    args = p.parse_args()
+
+    total = args.events * len(CALENDARS)
+    results = []
+    for label, batch in (("individual", False), ("batch", True)):
+        api = FakeCalendarAPI(args.rtt, args.throttle, args.server_errors)
+        for cal_id in CALENDARS.values():
+            api.seed(cal_id, args.events)
+        purge.service_factory = lambda *_: (lambda: api)
+        limiter = RateLimiter(qps=args.qps, max_qps=args.qps)
+
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            purge.purge_events(CALENDARS, "2025-11-01", dry_run=False, limiter=limiter,
+                               workers=args.workers, batch=batch)
+        results.append((label, time.perf_counter() - t0, api))
+
+    for label, dt, api in results:
+        print(f"{label:<12} {dt:8.2f}s  {total / dt:8.1f} ev/s  {api.round_trips:6d} round trips  "
+              f"{api.throttled:4d} 429  {api.failed:4d} 5xx  {api.inserted:5d} restantes")
+    (_, t_ind, a_ind), (_, t_batch, a_batch) = results
+    print(f"round trips: x{a_ind.round_trips / a_batch.round_trips:.1f} menos, tiempo: x{t_ind / t_batch:.1f}")
+
+
+if __name__ == "__main__":
+    main()
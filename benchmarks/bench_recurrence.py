@@ -0,0 +1,132 @@
+"""
+Benchmark: compactación de rutinas diarias en series RRULE y expansión local de las reglas.
+
+    python benchmarks/bench_recurrence.py --weeks 1 4 52
+
+Genera semanas como las que escribe el modelo: las rutinas ("Desayuno", "Pausa activa"…) repetidas cada
+día como eventos sueltos, un bloque de lunes a viernes, otro de lunes/miércoles/viernes y estudio que cambia
+cada día. Mide compact_plan y expand_events, y comprueba que expandir el plan compactado devuelve
+exactamente los mismos eventos concretos que el original (nada se pierde ni se duplica). Lo mismo tras el
+viaje de ida y vuelta por el .ics: write_ics (json-to-ics) y lectura con _build_insert_items (import-ics).
+Con --rules compara además expand_rrule con dateutil sobre reglas aleatorias del subconjunto soportado
+(INTERVAL, BYDAY, COUNT y UNTIL, también reglas largas que pasan de LIMIT_DAYS).
+"""
+from __future__ import annotations
+import argparse
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+from google_calendar import _build_insert_items
+from ics_utils import write_ics
+from recurrence import DAYS, _offsets, compact_plan, expand_events, expand_rrule
+from routing import Router
+
+ROUTINES = [("☕ Desayuno", "08:00", 30), ("🧘‍♂️ Pausa activa", "11:00", 15), ("🍝 Almuerzo", "14:00", 60),
+            ("🌙 Descanso", "22:30", 30)]
+WEEKDAYS = [("🇬🇧 Inglés", "19:00", 45)]
+MWF = [("🏃 Ejercicio", "07:00", 40)]
+STUDY = ["Redes", "Bases de datos", "Sistemas operativos", "Estadística", "Programación", "Álgebra", "Repaso"]
+
+
+def make_plan(weeks: int):
+    events = []
+    monday = datetime(2025, 11, 3)
+    for d in range(7 * weeks):
+        day = monday + timedelta(days=d)
+
+        def add(summary, hhmm, minutes):
+            start = datetime.combine(day.date(), datetime.strptime(hhmm, "%H:%M").time())
+            events.append({"summary": summary, "start": start.isoformat(),
+                           "end": (start + timedelta(minutes=minutes)).isoformat()})
+
+        for r in ROUTINES:
+            add(*r)
+        if day.weekday() < 5:
+            for r in WEEKDAYS:
+                add(*r)
+        if day.weekday() in (0, 2, 4):
+            for r in MWF:
+                add(*r)
+        add(f"📚 Estudio — {STUDY[d % len(STUDY)]}", "16:00", 120)
+    return {"calendar": {"timezone": "Europe/Madrid"}, "events": events}
+
+
+def _concrete(events):
+    return Counter((ev["summary"], ev["start"], ev["end"]) for ev in expand_events(events))
+
+
+def _imported(data) -> list:
+    """Eventos tal y como los insertaría import-ics a partir del .ics que escribe json-to-ics."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "plan.ics"
+        write_ics(data, path, "Europe/Madrid")
+        items = _build_insert_items(path, "Europe/Madrid", Router({}))
+    events = []
+    for _, body, _ in items:
+        ev = {"summary": body["summary"], "start": body["start"]["dateTime"][:19], "end": body["end"]["dateTime"][:19]}
+        rrules = [r.removeprefix("RRULE:") for r in body.get("recurrence", []) if r.startswith("RRULE:")]
+        if rrules:
+            ev["rrule"] = rrules[0]
+        events.append(ev)
+    return events
+
+
+def compare_dateutil(rules: int, seed: int) -> None:
+    from dateutil.rrule import rrulestr
+    rng = random.Random(seed)
+    for _ in range(rules):
+        parts = [f"FREQ={rng.choice(['DAILY', 'WEEKLY'])}"]
+        if rng.random() < 0.5:
+            parts.append(f"INTERVAL={rng.randint(1, 5)}")
+        if rng.random() < 0.5:
+            parts.append("BYDAY=" + ",".join(rng.sample(DAYS, rng.randint(1, 4))))
+        end = rng.random()
+        if end < 0.7:
+            parts.append(f"COUNT={rng.randint(1, 120)}")
+        if end > 0.4:
+            parts.append(f"UNTIL={rng.randint(2026, 2028)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}T235959")
+        rule = ";".join(parts)
+        start = datetime(2025, 11, rng.randint(1, 28), rng.randint(6, 22))
+        expected = list(rrulestr(f"RRULE:{rule};WKST=MO", dtstart=start))
+        assert expand_rrule(rule, start) == expected, f"{rule} desde {start}: no coincide con dateutil"
+    print(f"✅ {rules} reglas aleatorias iguales que dateutil.")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--weeks", type=int, nargs="+", default=[1, 4, 52])
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--rules", type=int, default=2000, help="Reglas aleatorias a comparar con dateutil (0 = ninguna).")
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args()
+
+    if args.rules:
+        compare_dateutil(args.rules, args.seed)
+
+    print(f"{'semanas':>7} {'antes':>7} {'después':>8} {'series':>7} {'compactar':>10} {'expandir':>9}")
+    for weeks in args.weeks:
+        data = make_plan(weeks)
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            compacted, stats = compact_plan(data)
+        compact_ms = (time.perf_counter() - t0) / args.repeat * 1000
+
+        _offsets.cache_clear()
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            expanded = _concrete(compacted["events"])
+        expand_ms = (time.perf_counter() - t0) / args.repeat * 1000
+
+        assert expanded == _concrete(data["events"]), "la expansión del plan compactado no coincide con el original"
+        assert _concrete(_imported(compacted)) == expanded, "import-ics pierde eventos de las series del .ics"
+        print(f"{weeks:>7} {stats.before:>7} {stats.after:>8} {stats.series:>7} {compact_ms:>8.1f}ms {expand_ms:>7.1f}ms")
+    print(f"reglas distintas en caché: {_offsets.cache_info().currsize}")
+
+
+if __name__ == "__main__":
+    main()
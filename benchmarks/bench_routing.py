@@ -0,0 +1,71 @@
+"""
+Benchmark: enrutado de títulos a calendarios.
+
+    python benchmarks/bench_routing.py --summaries 100000
+
+Compara el enrutado anterior (búsqueda de subcadenas en cada llamada) con routing.Router:
+la expresión compilada sin memoizar (un recorrido por título) y con la memoización por título.
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+from routing import Router
+
+CALENDARS = {"ESTUDIOS": "estudios", "TRABAJO": "trabajo", "RUTINAS": "rutinas", "MEJORA": "mejora", "DEFAULT": "primary"}
+
+TITLES = [
+    "💼 Trabajo", "🚗 Preparación y desplazamiento al trabajo", "📚 Estudio — Álgebra lineal",
+    "📚 Estudio — Redes", "💻 Mejora profesional", "🇬🇧 Inglés", "☕ Desayuno", "🍝 Almuerzo", "🍽️ Cena",
+    "🍎 Comer algo ligero", "🧘‍♂️ Pausa activa", "🥗 Pausa larga", "😴 Descanso", "😌 Descanso breve",
+    "🏃‍♂️ Ejercicio matutino", "🌿 Bloque libre planificado", "Reunión con el equipo", "🌀 Rutina de noche",
+]
+
+
+def legacy_pick(summary: str, calendars: dict) -> str:
+    """El enrutado por subcadenas que había antes de routing.Router."""
+    title = (summary or "").lower().strip()
+    if "estudio" in title or "📚" in title:
+        return calendars.get("ESTUDIOS", "primary")
+    if "trabajo" in title or "💼" in title:
+        return calendars.get("TRABAJO", "primary")
+    if "rutina" in title or "🌀" in title:
+        return calendars.get("RUTINAS", "primary")
+    if "mejora" in title or "⚙️" in title:
+        return calendars.get("MEJORA", "primary")
+    return calendars.get("DEFAULT", "primary")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--summaries", type=int, default=100_000)
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args()
+
+    rng = random.Random(args.seed)
+    summaries = [rng.choice(TITLES) for _ in range(args.summaries)]
+    router = Router(CALENDARS)
+
+    runs = [
+        ("subcadenas (antes)", lambda s: legacy_pick(s, CALENDARS)),
+        ("regex compilada", router._route),
+        ("regex memoizada", router.route),
+    ]
+    print(f"{'modo':<20} {'tiempo':>9} {'títulos/s':>12}")
+    for label, fn in runs:
+        t0 = time.perf_counter()
+        for s in summaries:
+            fn(s)
+        elapsed = time.perf_counter() - t0
+        print(f"{label:<20} {elapsed:>8.3f}s {len(summaries) / elapsed:>12,.0f}")
+
+    # Diferencias de categoría respecto al enrutado anterior (títulos exactos del prompt)
+    changed = [(t, legacy_pick(t, CALENDARS), router.route(t)[1]) for t in TITLES if legacy_pick(t, CALENDARS) != router.route(t)[1]]
+    for title, before, after in changed:
+        print(f"   ↪ {title!r}: {before} → {after}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: latencia de la primera llamada a la API con el service de siempre y con el persistente.
+
+    python benchmarks/bench_service_warm.py --handshake 0.15 --rtt 0.03 --imports 4
+
+Un servidor HTTP/1.1 local con keep-alive hace de API de Calendar; cada conexión nueva paga --handshake
+(TCP + TLS con Google) y cada petición --rtt.
+- build() por llamada: lo que hacía ensure_api_auth en cada importación (service y conexión nuevos)
+- persistente: google_calendar.service_factory, con el discovery parseado una vez y la sesión reutilizada
+--imports simula varias importaciones en la misma ejecución (p.ej. plan-range con varias semanas).
+"""
+from __future__ import annotations
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+import google_calendar as gcal
+
+
+def make_server(handshake: float, rtt: float):
+    stats = {"connections": 0, "requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            stats["connections"] += 1
+            time.sleep(handshake)
+            super().setup()
+
+        def do_GET(self):
+            stats["requests"] += 1
+            time.sleep(rtt)
+            body = json.dumps({"items": [], "nextSyncToken": "t"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--handshake", type=float, default=0.15, help="Coste de abrir conexión (s).")
+    p.add_argument("--rtt", type=float, default=0.03, help="Coste de cada petición (s).")
+    p.add_argument("--imports", type=int, default=4, help="Importaciones en la misma ejecución.")
+    args = p.parse_args()
+
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build_from_document
+
+    server, stats = make_server(args.handshake, args.rtt)
+    doc = dict(gcal._discovery_document(), rootUrl=f"http://127.0.0.1:{server.server_port}/")
+    gcal._DISCOVERY["calendar"] = doc
+    creds = Credentials(token="bench")
+
+    def first_call(service) -> float:
+        t0 = time.perf_counter()
+        service.events().list(calendarId="primary", maxResults=1).execute()
+        return time.perf_counter() - t0
+
+    # Antes: cada importación construía un service nuevo (discovery + sesión HTTP nueva)
+    stats.update(connections=0, requests=0)
+    t0 = time.perf_counter()
+    old_first = [first_call(build_from_document(json.dumps(doc), credentials=creds)) for _ in range(args.imports)]
+    old_total, old_conns = time.perf_counter() - t0, stats["connections"]
+
+    # Ahora: un service por hilo durante toda la ejecución, con la conexión viva
+    stats.update(connections=0, requests=0)
+    get_service = gcal.per_thread_services(creds)
+    t0 = time.perf_counter()
+    new_first = [first_call(get_service()) for _ in range(args.imports)]
+    new_total, new_conns = time.perf_counter() - t0, stats["connections"]
+    server.shutdown()
+
+    print(f"{'modo':<22} {'1ª llamada':>10} {'siguientes':>11} {'total':>8} {'conexiones':>11}")
+    for label, firsts, total, conns in (("build() por llamada", old_first, old_total, old_conns),
+                                        ("persistente", new_first, new_total, new_conns)):
+        rest = sum(firsts[1:]) / max(1, len(firsts) - 1)
+        print(f"{label:<22} {firsts[0] * 1000:>8.0f}ms {rest * 1000:>9.0f}ms {total:>7.2f}s {conns:>11}")
+
+
+if __name__ == "__main__":
+    main()
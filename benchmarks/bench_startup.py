@@ -0,0 +1,156 @@
+"""
+Benchmark: coste de importación al arrancar cada comando de la CLI (python -X importtime).
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --check      # sale con código 1 si algún comando pasa su presupuesto
+
+Cada comando se ejecuta de verdad (cli.py en un intérprete nuevo) contra una configuración de prueba en
+un directorio temporal: la respuesta de Gemini ya está en la caché y el token de Calendar es de mentira.
+Un audit hook corta el proceso en la primera conexión de red, así que se mide todo lo que el comando
+importa hasta llegar a la API sin llamarla. Se suma el tiempo de importación (sin lo que ya carga el propio
+intérprete ni el arranque del script) y se compara con BUDGET_MS.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src" / "CalendarIA"
+sys.path.insert(0, str(SRC))
+
+# Presupuesto de importación por comando (ms, mejor de --runs ejecuciones)
+BUDGET_MS = {
+    "generate-json": 1600,
+    "json-to-ics": 250,
+    "validate": 250,
+    "import-ics": 700,
+    "plan": 2000,
+    "plan-range": 2000,
+    "purge": 600,
+}
+COMMAND_ARGS = {"purge": ["--since", "2025-11-01"]}
+
+MODEL = "gemini-2.5-pro"
+WEEK = {"semana_inicio": "2025-11-05", "semana_final": "2025-11-07",
+        "trabajo": {"2025-11-05": "Libranza", "2025-11-06": "13:00 - 15:30", "2025-11-07": "Libranza"}}
+PLAN = {"calendar": {"name": "Plan"}, "events": [
+    {"summary": "💼 Trabajo", "start": "2025-11-06T13:00:00", "end": "2025-11-06T15:30:00"},
+    {"summary": "📚 Estudio — Redes", "start": "2025-11-05T09:00:00", "end": "2025-11-05T10:45:00"},
+]}
+
+# Prólogo común: lo que cuesta aquí también está en la línea base y no se cuenta
+PRELUDE = f"import runpy, sys; sys.path.insert(0, {str(SRC)!r})\n"
+RUN = """
+class Offline(BaseException):
+    pass
+
+def _no_network(event, args):
+    if event in ("socket.getaddrinfo", "socket.connect"):
+        raise Offline(event)
+
+sys.argv = [{cli!r}] + {argv!r}
+sys.addaudithook(_no_network)
+try:
+    runpy.run_path({cli!r}, run_name="__main__")
+except Offline:
+    pass
+"""
+
+
+def stub_config(tmp: Path) -> List[str]:
+    """Configuración de prueba en tmp; devuelve los argumentos comunes de la CLI."""
+    from ics_utils import write_ics
+    from llm_cache import ResponseCache, cache_key
+    from prompt import TokenBudget, build_prompts
+
+    (tmp / "calendars.yaml").write_text('DEFAULT: "primary"\n', encoding="utf-8")
+    (tmp / "schedule.yaml").write_text(json.dumps(WEEK), encoding="utf-8")  # JSON es YAML válido
+    settings = {"model": {"name": MODEL}, "cache": {"dir": str(tmp / "cache")},
+                "output": {"base_name": "plan", "json": "plan.json", "ics": "plan.ics"}}
+    (tmp / "settings.toml").write_text(
+        "".join(f"[{section}]\n" + "".join(f"{k} = {json.dumps(v)}\n" for k, v in values.items())
+                for section, values in settings.items()), encoding="utf-8")
+
+    # Respuesta de Gemini en la caché para el prompt exacto que construirá la CLI
+    template = ROOT / "prompts" / "prompt_es.txt"
+    cache = ResponseCache(tmp / "cache")
+    for p in build_prompts(template, WEEK["semana_inicio"], WEEK["semana_final"], WEEK["trabajo"],
+                           TokenBudget.from_settings(settings, MODEL)):
+        cache.put(cache_key(MODEL, p.text, {}), json.dumps(PLAN, ensure_ascii=False), model=MODEL)
+
+    # Entradas de json-to-ics, validate e import-ics
+    stem = f"plan{WEEK['semana_inicio']}_{WEEK['semana_final']}"
+    (tmp / f"{stem}.json").write_text(json.dumps(PLAN, ensure_ascii=False), encoding="utf-8")
+    write_ics(PLAN, tmp / f"{stem}.ics", "Europe/Madrid")
+
+    # Token válido de mentira: los comandos de Calendar llegan hasta la primera petición
+    from google.oauth2.credentials import Credentials
+    (tmp / "secrets").mkdir()
+    token = Credentials(token="stub", expiry=datetime.utcnow() + timedelta(days=1))
+    (tmp / "secrets" / "token.pickle").write_bytes(pickle.dumps(token))
+
+    return ["--calendars", "calendars.yaml", "--schedule", "schedule.yaml", "--settings", "settings.toml"]
+
+
+def importtime(tmp: Path, argv: List[str]) -> Tuple[float, Dict[str, float]]:
+    """(ms totales, ms por paquete de primer nivel) de ejecutar cli.py con argv en un proceso limpio."""
+    env = dict(os.environ, GOOGLE_API_KEY="stub", GOOGLE_CLIENT_SECRETS_FILE="secrets/calendar.json",
+               GOOGLE_TOKEN_PICKLE_FILE="secrets/token.pickle", PYTHONWARNINGS="ignore")
+    code = PRELUDE + RUN.format(cli=str(SRC / "cli.py"), argv=argv)
+    baseline = _top_level(subprocess.run([sys.executable, "-X", "importtime", "-c", PRELUDE],
+                                         capture_output=True, text=True).stderr)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=tmp, env=env)
+    if proc.returncode:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise SystemExit(f"❌ {argv[0]} falló con la configuración de prueba:\n" + "\n".join(errors[-10:]))
+    costs = {name: us / 1000 for name, us in _top_level(proc.stderr).items() if name not in baseline}
+    return sum(costs.values()), costs
+
+
+def _top_level(stderr: str) -> Dict[str, int]:
+    """Módulos importados directamente (sin sangría) → microsegundos acumulados."""
+    out: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            out[name.strip()] = int(cumulative)
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--check", action="store_true", help="Falla si algún comando supera su presupuesto.")
+    args = p.parse_args()
+
+    over = []
+    with tempfile.TemporaryDirectory() as tmp:
+        common = stub_config(Path(tmp))
+        print(f"{'comando':<14} {'ms':>7} {'presup.':>8}  más pesados")
+        for command, budget in BUDGET_MS.items():
+            argv = [command] + common + COMMAND_ARGS.get(command, [])
+            total, costs = min((importtime(Path(tmp), argv) for _ in range(max(1, args.runs))), key=lambda r: r[0])
+            heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in sorted(costs.items(), key=lambda kv: -kv[1])[:3])
+            flag = "" if total <= budget else "  ⚠️"
+            if flag:
+                over.append(command)
+            print(f"{command:<14} {total:>7.0f} {budget:>8}  {heaviest}{flag}")
+
+    if args.check and over:
+        print(f"❌ Fuera de presupuesto: {', '.join(over)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: validación del plan con columnas NumPy (orden + barrido) frente al doble bucle por parejas.
+
+    python benchmarks/bench_validation.py --events 1000 10000 100000
+
+Genera un plan de varios meses de bloques encadenados (como un plan semanal con sus RRULE expandidas),
+con un porcentaje de eventos desplazados para provocar solapes y turnos de trabajo en días alternos.
+El doble bucle solo se mide hasta --naive-max eventos.
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+from validation import validate_plan
+
+TITLES = ["📚 Estudio — Redes", "☕ Desayuno", "🧘‍♂️ Pausa activa", "🇬🇧 Inglés", "💻 Mejora profesional", "🍝 Almuerzo"]
+
+
+def make_plan(n: int, jitter: float, seed: int):
+    rng = random.Random(seed)
+    events, trabajo = [], {}
+    t = datetime(2025, 1, 1, 8, 0)
+    while len(events) < n:
+        day = t.date().isoformat()
+        if t.hour == 8 and t.minute == 0 and t.toordinal() % 2:
+            trabajo[day] = "13:00 - 15:30"
+        if day in trabajo and t.hour == 13 and t.minute == 0:
+            end = t + timedelta(minutes=150)
+            events.append({"summary": "💼 Trabajo", "start": t.isoformat(), "end": end.isoformat()})
+        else:
+            end = t + timedelta(minutes=30)
+            shift = timedelta(minutes=rng.choice((-20, 10))) if rng.random() < jitter else timedelta(0)
+            events.append({"summary": rng.choice(TITLES), "start": (t + shift).isoformat(), "end": (end + shift).isoformat()})
+        t = end if end.hour < 23 else datetime.combine(end.date() + timedelta(days=1), datetime.min.time()).replace(hour=8)
+    return events, trabajo
+
+
+def naive_overlaps(events) -> int:
+    spans = [(datetime.fromisoformat(ev["start"]), datetime.fromisoformat(ev["end"])) for ev in events]
+    found = 0
+    for i in range(len(spans)):
+        for j in range(i + 1, len(spans)):
+            if spans[i][0] < spans[j][1] and spans[j][0] < spans[i][1]:
+                found += 1
+    return found
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--events", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    p.add_argument("--jitter", type=float, default=0.02, help="Fracción de eventos desplazados (solapes).")
+    p.add_argument("--naive-max", type=int, default=5000)
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args()
+
+    print(f"{'eventos':>8} {'columnas':>10} {'doble bucle':>12} {'solapes':>8} {'choques':>8} {'huecos':>7}")
+    for n in args.events:
+        events, trabajo = make_plan(n, args.jitter, args.seed)
+        t0 = time.perf_counter()
+        report = validate_plan(events, trabajo)
+        fast = time.perf_counter() - t0
+        naive = "-"
+        if n <= args.naive_max:
+            t0 = time.perf_counter()
+            assert naive_overlaps(events) == report.overlap_count
+            naive = f"{time.perf_counter() - t0:.3f}s"
+        print(f"{n:>8} {fast:>9.3f}s {naive:>12} {report.overlap_count:>8} {report.conflict_count:>8} {len(report.gaps[0]):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Doble local de la API de Calendar (googleapiclient) para los benchmarks.
+
+Cada ida y vuelta HTTP cuesta `rtt` segundos; una petición batch cuenta como una sola.
+`throttle` y `server_errors` son las fracciones de llamadas que devuelven 429 y 503.
+serve_http() publica el mismo doble como servidor REST local para los clientes HTTP reales.
+"""
+from __future__ import annotations
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import _path  # noqa: F401  (añade src/CalendarIA al sys.path)
+from googleapiclient.errors import HttpError
+
+
+def _error(status: int) -> HttpError:
+    return HttpError(SimpleNamespace(status=status, reason="Fake error"), b"{}")
+
+
+class FakeRequest:
+    def __init__(self, api: "FakeCalendarAPI", action):
+        self.api = api
+        self.action = action
+
+    def result(self):
+        roll = random.random()
+        with self.api.lock:
+            if roll < self.api.throttle:
+                self.api.throttled += 1
+                raise _error(429)
+            if roll < self.api.throttle + self.api.server_errors:
+                self.api.failed += 1
+                raise _error(503)
+            return self.action()
+
+    def execute(self):
+        with self.api.lock:
+            self.api.round_trips += 1
+        time.sleep(self.api.rtt)
+        return self.result()
+
+
+class FakeBatch:
+    def __init__(self, api: "FakeCalendarAPI", callback):
+        self.api = api
+        self.callback = callback
+        self.calls = []
+
+    def add(self, request, request_id=None):
+        self.calls.append((request_id, request))
+
+    def execute(self):
+        with self.api.lock:
+            self.api.round_trips += 1
+        time.sleep(self.api.rtt)
+        for request_id, request in self.calls:
+            try:
+                self.callback(request_id, request.result(), None)
+            except HttpError as e:
+                self.callback(request_id, None, e)
+
+
+class FakeCalendarAPI:
+    def __init__(self, rtt: float = 0.08, throttle: float = 0.0, server_errors: float = 0.0, page_size: int = 250):
+        self.rtt = rtt
+        self.throttle = throttle
+        self.server_errors = server_errors
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.calendars = {}
+        self.round_trips = 0
+        self.throttled = 0
+        self.failed = 0
+        self._next_id = 0
+
+    def seed(self, calendar_id: str, n: int) -> None:
+        for i in range(n):
+            self._insert(calendar_id, {"summary": f"Evento {i}",
+                                       "start": {"dateTime": "2025-11-05T08:00:00+01:00"}})
+
+    def _insert(self, calendar_id: str, body: dict) -> dict:
+        self._next_id += 1
+        ev = {"id": f"ev{self._next_id}", **body}
+        self.calendars.setdefault(calendar_id, {})[ev["id"]] = ev
+        return ev
+
+    def _delete(self, calendar_id: str, event_id: str) -> str:
+        if self.calendars.get(calendar_id, {}).pop(event_id, None) is None:
+            raise _error(410)
+        return ""
+
+    def _list(self, calendar_id: str, page_token=None) -> dict:
+        # El token es el último id devuelto: estable aunque se borre mientras se pagina
+        ids = sorted(self.calendars.get(calendar_id, {}), key=lambda k: int(k[2:]))
+        if page_token:
+            ids = [k for k in ids if int(k[2:]) > int(page_token)]
+        page = ids[:self.page_size]
+        result = {"items": [self.calendars[calendar_id][k] for k in page]}
+        if len(ids) > self.page_size:
+            result["nextPageToken"] = page[-1][2:]
+        return result
+
+    def events(self):
+        return SimpleNamespace(
+            insert=lambda calendarId, body: FakeRequest(self, lambda: self._insert(calendarId, body)),
+            delete=lambda calendarId, eventId: FakeRequest(self, lambda: self._delete(calendarId, eventId)),
+            list=lambda calendarId, pageToken=None, **kw: FakeRequest(self, lambda: self._list(calendarId, pageToken)),
+        )
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    @property
+    def inserted(self) -> int:
+        return sum(len(evs) for evs in self.calendars.values())
+
+
+def serve_http(api: FakeCalendarAPI, retry_after: Optional[float] = None):
+    """
+    Expone el doble como API REST de Calendar (HTTP/1.1 con keep-alive) en 127.0.0.1 para los clientes reales
+    (googleapiclient o httpx). Devuelve (servidor, URL base terminada en /calendar/v3/).
+    Los errores simulados salen como respuestas 429/503 (con Retry-After si se indica).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _route(self) -> Tuple[str, Optional[str], Dict[str, str]]:
+            url = urlsplit(self.path)
+            parts = [unquote(p) for p in url.path.split("/") if p]
+            # calendar/v3/calendars/{calendarId}/events[/{eventId}]
+            event_id = parts[5] if len(parts) > 5 else None
+            return parts[3], event_id, {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        def _send(self, status: int, payload: Optional[dict] = None, headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload).encode() if payload is not None else b""
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _run(self, action):
+            try:
+                result = FakeRequest(api, action).execute()
+            except HttpError as e:
+                status = e.resp.status
+                extra = {"Retry-After": str(retry_after)} if status == 429 and retry_after is not None else {}
+                self._send(status, {"error": {"code": status, "message": "Fake error"}}, extra)
+                return
+            if result == "":
+                self._send(204)
+            else:
+                self._send(200, result)
+
+        def do_GET(self):
+            cal_id, _, query = self._route()
+            self._run(lambda: api._list(cal_id, query.get("pageToken")))
+
+        def do_POST(self):
+            cal_id, _, _ = self._route()
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            self._run(lambda: api._insert(cal_id, body))
+
+        def do_DELETE(self):
+            cal_id, event_id, _ = self._route()
+            self._run(lambda: api._delete(cal_id, event_id))
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/calendar/v3/"
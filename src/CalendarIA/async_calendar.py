@@ -0,0 +1,242 @@
+from __future__ import annotations
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+import metrics
+from checkpoint import RETRY_ROUNDS, Entry, ImportJournal, keyed, report_failed, retry_pause
+from purge import LIST_FIELDS, PREVIEW_MAX, _should_delete
+from ratelimit import RETRYABLE, RateLimiter, retry_after
+
+"""
+* Backend asyncio (httpx) para importar y purgar contra la API REST de Calendar, alternativo a googleapiclient.
+* Un solo cliente con pool de conexiones keep-alive (HTTP/2 si está instalado 'h2') y un semáforo que limita
+  las peticiones en vuelo; el ritmo lo sigue marcando el mismo RateLimiter que el camino síncrono.
+* Mismos reintentos que el camino síncrono: 403/429 siempre (respetando Retry-After) y 5xx solo en la purga.
+"""
+
+API_ROOT = "https://www.googleapis.com/calendar/v3/"
+DEFAULT_IN_FLIGHT = 16
+
+
+class CalendarHTTPError(Exception):
+    """Error HTTP de la API; expone status_code y resp (cabeceras) como HttpError para http_status/retry_after."""
+
+    def __init__(self, status: int, headers: httpx.Headers, text: str):
+        super().__init__(f"<HttpError {status}: {text[:200]}>")
+        self.status_code = status
+        self.resp = headers
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _events_path(calendar_id: str, event_id: Optional[str] = None) -> str:
+    path = f"calendars/{quote(calendar_id, safe='')}/events"
+    return f"{path}/{quote(event_id, safe='')}" if event_id else path
+
+
+class AsyncCalendarClient:
+    def __init__(self, creds, limiter: RateLimiter, *, max_in_flight: int = DEFAULT_IN_FLIGHT,
+                 base_url: str = API_ROOT, http2: bool = True, timeout: float = 60.0):
+        self.creds = creds
+        self.limiter = limiter
+        self.max_in_flight = max(1, max_in_flight)
+        self.base_url = base_url
+        self.http2 = http2 and _http2_available()
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._auth_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncCalendarClient":
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        self._client = httpx.AsyncClient(base_url=self.base_url, http2=self.http2, limits=limits,
+                                         timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._client.aclose()
+
+    async def _authorization(self, force_refresh: bool = False) -> Dict[str, str]:
+        async with self._auth_lock:
+            if force_refresh or not self.creds.valid:
+                from google.auth.transport.requests import Request
+                await asyncio.to_thread(self.creds.refresh, Request())
+        return {"Authorization": f"Bearer {self.creds.token}"}
+
+    async def request(self, method: str, path: str, *, params: Optional[Dict[str, Any]] = None,
+                      body: Optional[dict] = None, retry_5xx: bool = False, indent: str = "   ",
+                      op: str = "api") -> dict:
+        attempt = 0
+        refreshed = False
+        slept = 0.0
+        t0 = time.perf_counter()
+        while True:
+            async with self._semaphore:
+                await asyncio.sleep(self.limiter.reserve())
+                headers = await self._authorization()
+                try:
+                    resp = await self._client.request(method, path, params=params, json=body, headers=headers)
+                    error = None if resp.is_success else CalendarHTTPError(resp.status_code, resp.headers, resp.text)
+                except httpx.TransportError as e:
+                    error = e
+            if error is None:
+                self.limiter.on_success()
+                metrics.METRICS.api_call(op, time.perf_counter() - t0, "ok", attempt, slept)
+                return resp.json() if resp.content else {}
+
+            status = getattr(error, "status_code", None)
+            if status == 401 and not refreshed:
+                refreshed = True
+                await self._authorization(force_refresh=True)
+                continue
+            if attempt < self.limiter.max_retries:
+                if status in RETRYABLE:
+                    attempt += 1
+                    delay = self.limiter.on_throttle(attempt, retry_after(error))
+                    print(f"{indent}⏳ Rate limit ({status}). Reintento {attempt} en {delay:.1f}s…")
+                elif retry_5xx and (status is None or status >= 500):
+                    attempt += 1
+                    delay = self.limiter.backoff(attempt)
+                else:
+                    metrics.METRICS.api_call(op, time.perf_counter() - t0, status or "error", attempt, slept)
+                    raise error
+                self.limiter.record_sleep(delay)
+                slept += delay
+                await asyncio.sleep(delay)
+                continue
+            metrics.METRICS.api_call(op, time.perf_counter() - t0, status or "error", attempt, slept)
+            raise error
+
+    async def insert(self, calendar_id: str, body: dict) -> dict:
+        return await self.request("POST", _events_path(calendar_id), body=body, op="events.insert")
+
+    async def delete(self, calendar_id: str, event_id: str) -> None:
+        await self.request("DELETE", _events_path(calendar_id, event_id), retry_5xx=True, indent="      ",
+                           op="events.delete")
+
+    async def iter_events(self, calendar_id: str, time_min: str, fields: str = LIST_FIELDS) -> AsyncIterator[dict]:
+        params = {"timeMin": time_min, "maxResults": 2500, "singleEvents": "true", "orderBy": "startTime",
+                  "fields": fields}
+        while True:
+            result = await self.request("GET", _events_path(calendar_id), params=params, op="events.list")
+            for ev in result.get("items", []) or []:
+                yield ev
+            if not result.get("nextPageToken"):
+                break
+            params = dict(params, pageToken=result["nextPageToken"])
+
+
+async def _drain(queue: asyncio.Queue, worker, workers: int) -> List[Any]:
+    """Lanza 'workers' consumidores de la cola y devuelve sus resultados cuando la cola se cierra (None)."""
+    async def _consume():
+        done = []
+        while (item := await queue.get()) is not None:
+            done.append(await worker(item))
+        await queue.put(None)  # despierta al siguiente consumidor
+        return done
+
+    results = await asyncio.gather(*(_consume() for _ in range(workers)))
+    return [r for chunk in results for r in chunk]
+
+
+async def _import(items: Iterable[Tuple[str, dict, str]], creds, limiter: RateLimiter,
+                  max_in_flight: int, base_url: str, journal: Optional[ImportJournal]) -> int:
+    async with AsyncCalendarClient(creds, limiter, max_in_flight=max_in_flight, base_url=base_url) as client:
+        async def _insert(entry: Entry):
+            key, (cal_id, body, display_key) = entry
+            try:
+                created = await client.insert(cal_id, body)
+            except Exception as e:
+                return entry, e
+            if journal:
+                journal.record(key, created.get("id"))
+            print(f"   ✔️ [{display_key}] {body['summary']}")
+            return None
+
+        async def _send(entries: List[Entry]):
+            queue: asyncio.Queue = asyncio.Queue(maxsize=client.max_in_flight * 2)
+
+            async def _produce():
+                for entry in entries:
+                    await queue.put(entry)
+                await queue.put(None)
+
+            results, _ = await asyncio.gather(_drain(queue, _insert, client.max_in_flight), _produce())
+            return [r for r in results if r is not None]
+
+        # Lo que falla va a la cola de reintentos y se vuelve a pasar al final, como en el camino síncrono
+        failed = await _send(keyed(items, journal))
+        for round_ in range(1, RETRY_ROUNDS + 1):
+            if not failed:
+                break
+            await asyncio.sleep(retry_pause(limiter, round_, len(failed)))
+            failed = await _send([entry for entry, _ in failed])
+    return report_failed(failed)
+
+
+def import_items(items: Iterable[Tuple[str, dict, str]], creds, limiter: RateLimiter, *,
+                 max_in_flight: int = DEFAULT_IN_FLIGHT, base_url: str = API_ROOT,
+                 journal: Optional[ImportJournal] = None) -> int:
+    """Inserta (calendarId, body, etiqueta) como google_calendar._import_sequential; devuelve los errores."""
+    return asyncio.run(_import(items, creds, limiter, max_in_flight, base_url, journal))
+
+
+async def _purge_calendar(client: AsyncCalendarClient, calendar_id: str, time_min_iso: str,
+                          prefixes: Optional[Tuple[str, ...]], dry_run: bool) -> Tuple[List[str], int, int, int, int]:
+    """Igual que purge._purge_calendar: se borra según se pagina, con 'max_in_flight' borrados a la vez."""
+    preview: List[str] = []
+    found = matched = 0
+    queue: asyncio.Queue = asyncio.Queue(maxsize=client.max_in_flight * 2)
+
+    async def _produce():
+        nonlocal found, matched
+        try:
+            async for ev in client.iter_events(calendar_id, time_min_iso):
+                found += 1
+                if not _should_delete(ev, prefixes):
+                    continue
+                matched += 1
+                if len(preview) < PREVIEW_MAX:
+                    start = ev.get('start', {}).get('dateTime', ev.get('start', {}).get('date', ''))
+                    preview.append(f"   - {start}  {ev.get('summary','(sin título)')}")
+                if not dry_run:
+                    await queue.put(ev["id"])
+        finally:
+            await queue.put(None)
+
+    async def _delete(event_id: str) -> bool:
+        try:
+            await client.delete(calendar_id, event_id)
+            return True
+        except Exception as e:
+            print(f"      ❌ Error: {e}")
+            return False
+
+    results, _ = await asyncio.gather(_drain(queue, _delete, client.max_in_flight), _produce())
+    borrados = sum(results)
+    return preview, found, matched, borrados, (matched - borrados) if not dry_run else 0
+
+
+async def _purge(calendars: Dict[str, str], time_min_iso: str, prefixes, dry_run: bool, creds,
+                 limiter: RateLimiter, max_in_flight: int, base_url: str):
+    async with AsyncCalendarClient(creds, limiter, max_in_flight=max_in_flight, base_url=base_url) as client:
+        results = await asyncio.gather(*(_purge_calendar(client, cal_id, time_min_iso, prefixes, dry_run)
+                                         for cal_id in calendars.values()))
+    return dict(zip(calendars, results))
+
+
+def purge_calendars(calendars: Dict[str, str], time_min_iso: str, prefixes: Optional[Tuple[str, ...]],
+                    dry_run: bool, creds, limiter: RateLimiter, *, max_in_flight: int = DEFAULT_IN_FLIGHT,
+                    base_url: str = API_ROOT) -> Dict[str, Tuple[List[str], int, int, int, int]]:
+    """Todos los calendarios a la vez sobre el mismo cliente; nombre → resultado como purge._purge_calendar."""
+    return asyncio.run(_purge(calendars, time_min_iso, prefixes, dry_run, creds, limiter, max_in_flight, base_url))
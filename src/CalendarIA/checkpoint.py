@@ -0,0 +1,119 @@
+from __future__ import annotations
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+"""
+* Diario de importación: fichero append-only con una línea 'clave<TAB>eventId' por evento ya creado.
+* Cada importación lo escribe según avanza; si se corta o falla, --resume lo relee y solo se envía
+  lo que falta (fallar en el evento 140 de 150 cuesta 10 llamadas al reanudar, no 150).
+* La clave es calendario + título + inicio; los eventos idénticos repetidos se numeran por orden (~2, ~3…).
+* Una línea a medio escribir (corte a mitad) se ignora al leer.
+"""
+
+# Pasadas extra sobre la cola de fallidos antes de darlos por perdidos
+RETRY_ROUNDS = 1
+
+Item = Tuple[str, dict, str]
+Entry = Tuple[Optional[str], Item]
+
+
+def item_key(calendar_id: str, body: dict) -> str:
+    start = body["start"].get("dateTime") or body["start"].get("date", "")
+    raw = f"{calendar_id}\x1f{body.get('summary', '')}\x1f{start}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+class ImportJournal:
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = Path(path)
+        self.done: Dict[str, str] = self._read(self.path) if resume else {}
+        self.skipped = 0
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Sin --resume se empieza de cero: el diario solo describe la importación en curso
+        self._fh = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, str]:
+        done: Dict[str, str] = {}
+        if not path.exists():
+            return done
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                if not line.endswith("\n"):
+                    break
+                key, _, event_id = line.rstrip("\n").partition("\t")
+                if key and event_id:
+                    done[key] = event_id
+        return done
+
+    def pending(self, items: Iterable[Item]) -> List[Tuple[str, Item]]:
+        """(clave, item) de lo que aún no está en el diario; se puede llamar varias veces (streaming)."""
+        out = []
+        for item in items:
+            key = item_key(item[0], item[1])
+            n = self._seen[key] = self._seen.get(key, 0) + 1
+            if n > 1:
+                key = f"{key}~{n}"
+            if key in self.done:
+                self.skipped += 1
+            else:
+                out.append((key, item))
+        return out
+
+    def record(self, key: Optional[str], event_id: Optional[str]) -> None:
+        if key is None or not event_id:
+            return
+        with self._lock:
+            self.done[key] = event_id
+            self._fh.write(f"{key}\t{event_id}\n")
+            self._fh.flush()
+
+    def report(self) -> Optional[str]:
+        if not self.skipped:
+            return None
+        return f"⏭️ {self.skipped} evento(s) ya importados según {self.path.name} (--resume): no se reenvían."
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+                self._fh.close()
+
+    def __enter__(self) -> "ImportJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def keyed(items: Iterable[Item], journal: Optional[ImportJournal]) -> List[Entry]:
+    """Items pendientes con su clave; sin diario se envía todo (clave None)."""
+    return journal.pending(items) if journal else [(None, item) for item in items]
+
+
+def retry_pause(limiter, round_: int, pending: int, indent: str = "   ") -> float:
+    """Espera antes de otra pasada por la cola de reintentos; la registra y la devuelve (el que llama duerme)."""
+    delay = limiter.backoff(round_)
+    print(f"{indent}🔁 Cola de reintentos: {pending} elemento(s), nuevo intento en {delay:.1f}s…")
+    limiter.record_sleep(delay)
+    metrics.inc("sleep_seconds", delay, kind="backoff")
+    return delay
+
+
+def report_failed(failed: List[Tuple[Entry, Any]], indent: str = "   ") -> int:
+    for (_, (_, body, display_key)), error in failed:
+        print(f"{indent}❌ [{display_key}] {body['summary']}: {error}")
+    return len(failed)
+
+
+def journal_path(output: Path) -> Path:
+    """Diario junto a la salida de la semana (plan_x.ics → plan_x.journal)."""
+    return Path(output).with_suffix(".journal")
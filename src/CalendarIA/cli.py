@@ -2,22 +2,48 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 from config import Settings, ROOT
-from prompt import render_prompt
-from gemini_ia import GeminiClient
-from ics_utils import json_to_ics
-from routing import pick_calendar_id
-import google_calendar as gcal
-from purge import purge_events
+from routing import Router
+
+# Cada comando importa solo lo que usa (Gemini, las librerías de Google, NumPy… pesan más que muchos
+# comandos enteros); benchmarks/bench_startup.py mide lo que cuesta arrancar cada uno.
+COMMANDS = ["generate-json", "json-to-ics", "validate", "import-ics", "plan", "plan-range", "purge"]
 
 def main():
     p = argparse.ArgumentParser(prog="uned-planner")
-    p.add_argument("command", choices=["generate-json", "json-to-ics", "import-ics", "plan", "purge"], help="Acción a ejecutar")
+    p.add_argument("command", choices=COMMANDS,
+                   help="Acción a ejecutar")
     p.add_argument("--calendars", default=str(ROOT/"config/calendars.yaml"))
     p.add_argument("--schedule", default=str(ROOT/"config/schedule.yaml"))
     p.add_argument("--settings", default=str(ROOT/"config/settings.toml"))
     p.add_argument("--prompt", default=str(ROOT/"prompts/prompt_es.txt"))
     p.add_argument("--json-out", default=None)
     p.add_argument("--ics-out", default=None)
+    p.add_argument("--no-cache", dest="cache", action="store_false", default=True,
+                   help="No usa la caché local de respuestas de Gemini.")
+    p.add_argument("--refresh", action="store_true",
+                   help="Ignora la respuesta cacheada y vuelve a llamar a Gemini (guarda la nueva).")
+    p.add_argument("--stream", action="store_true",
+                   help="Recibe la respuesta de Gemini en streaming; en 'plan' importa cada evento según llega.")
+    p.add_argument("--concurrency", type=int, default=None,
+                   help="plan-range: llamadas a Gemini en paralelo (por defecto [model] concurrency o 3).")
+    p.add_argument("--sync", action="store_true",
+                   help="Importa sin duplicar: compara con lo ya importado y solo crea/actualiza/borra lo necesario.")
+    p.add_argument("--batch", action="store_true",
+                   help="Agrupa inserciones (import-ics/plan) o borrados (purge) en peticiones batch de la API de Calendar.")
+    p.add_argument("--backend", choices=["sync", "async"], default="sync",
+                   help="Cliente de Calendar para importar/purgar: googleapiclient (sync) o httpx+asyncio (async). "
+                        "La importación en streaming (--stream) usa siempre el sync.")
+    p.add_argument("--in-flight", type=int, default=16,
+                   help="--backend async: peticiones simultáneas como máximo.")
+    p.add_argument("--strict", action="store_true",
+                   help="Si la validación encuentra solapes o choques con los turnos, no genera el .ics ni importa "
+                        "(en plan-range, de esa semana). En 'plan' no admite --stream.")
+    p.add_argument("--no-compact", dest="compact", action="store_false", default=True,
+                   help="No agrupa los bloques repetidos cada día en eventos recurrentes (RRULE).")
+    p.add_argument("--resume", action="store_true",
+                   help="Reanuda una importación cortada: salta los eventos que ya registra el diario (.journal).")
+    p.add_argument("--metrics-out", default=None,
+                   help="Al terminar escribe las métricas de la ejecución: JSON si acaba en .json, si no Prometheus.")
 
     # --- args específicos para purge ---
     p.add_argument("--since", help="Fecha/tiempo ISO para purga (UTC). Ej: 2025-11-04 o 2025-11-04T00:00:00Z")
@@ -27,25 +53,106 @@ def main():
                    help="Modo simulación (por defecto True).")
     p.add_argument("--no-dry-run", dest="dry_run", action="store_false",
                    help="Desactiva simulación: borra de verdad.")
+    p.add_argument("--owned", action="store_true",
+                   help="Solo eventos creados por CalendarIA con --sync (según el índice local de [output] index).")
+    p.add_argument("--workers", type=int, default=1,
+                   help="Hilos para listar y borrar en paralelo (comparten el mismo ritmo de llamadas).")
 
     args = p.parse_args()
+    if args.backend == "async" and (args.sync or args.batch or args.owned):
+        raise SystemExit("❌ --backend async no es compatible con --sync, --batch ni --owned.")
+    if args.resume and args.sync:
+        raise SystemExit("❌ --resume no hace falta con --sync: la sincronización ya no duplica eventos.")
+    if args.strict and args.stream and args.command == "plan":
+        # Con --stream cada evento se importa según llega, antes de poder validar el plan completo
+        raise SystemExit("❌ --strict no es compatible con 'plan --stream': la importación empieza antes de validar.")
+
+    if not args.metrics_out:
+        return _run(args)
+    import metrics
+    try:
+        with metrics.span("run", command=args.command):
+            _run(args)
+    finally:
+        metrics.METRICS.write(Path(args.metrics_out))
+        print(metrics.METRICS.summary())
+        print(f"📊 Métricas guardadas en {args.metrics_out}")
+
+
+def _budget(conf, client):
+    """Presupuesto de tokens del nivel más limitado: cualquier modelo de la lista puede acabar respondiendo."""
+    from prompt import TokenBudget
+    return min((TokenBudget.from_settings(conf.settings, m) for m in client.models), key=lambda b: b.days_per_call)
 
+
+def _run_range(args, conf, router, compact, max_gap, outputs):
+    """plan-range: cada semana del schedule con su JSON/ICS y, si hay fallos, código de salida 1."""
+    from ics_utils import plan_bodies
+    from llm_cache import ResponseCache
+    from checkpoint import journal_path
+    from model_tiers import TieredClient, plan_check
+    from plan_range import plan_range
+    from validation import validate_plan
+    from ratelimit import RateLimiter
+    import google_calendar as gcal
+    cache = ResponseCache.from_settings(conf.settings, ROOT) if args.cache else None
+    client = TieredClient.from_settings(conf.settings, conf.google_api_key, cache, ROOT)
+    limiter = RateLimiter.from_settings(conf.settings)
+    failed = plan_range(
+        conf.weeks(), Path(args.prompt), client, outputs, conf.timezone,
+        concurrency=args.concurrency or conf.settings["model"].get("concurrency", 3),
+        refresh=args.refresh,
+        compact=compact,
+        budget=_budget(conf, client),
+        checks=lambda week: plan_check(week["trabajo"], router, max_gap),
+        validate=lambda week, data: validate_plan(data.get("events", []), week["trabajo"], router,
+                                                  max_gap_minutes=max_gap),
+        strict=args.strict,
+        import_plan=lambda week, data: gcal.import_bodies_to_google(
+            plan_bodies(data, conf.timezone, conf.timezone), conf.calendars, router, conf, batch=args.batch,
+            sync=args.sync, limiter=limiter, backend=args.backend, in_flight=args.in_flight,
+            journal=journal_path(outputs(week)[1]), resume=args.resume),
+    )
+    if cache:
+        print(cache.report())
+    if len(client.tiers) > 1:
+        print(client.report())
+    if failed:
+        raise SystemExit(1)
+
+
+def _run(args):
     conf = Settings(Path(args.calendars), Path(args.schedule), Path(args.settings))
 
-    semana_inicio = conf.schedule["semana_inicio"]
-    semana_final = conf.schedule["semana_final"]
-    trabajo = conf.schedule["trabajo"]
+    # Reglas de calendario compiladas una vez para toda la ejecución
+    router = Router.from_settings(conf.settings, conf.calendars)
+
+    # Validación: también decide si la respuesta de un modelo vale o se pasa al siguiente de [model] tiers
+    max_gap = conf.settings.get("validation", {}).get("max_gap_minutes", 10)
+
+    # Mínimo de repeticiones para compactar bloques idénticos en una serie RRULE (None = no compactar)
+    recurrence = conf.settings.get("recurrence", {})
+    compact = recurrence.get("min_occurrences", 2) if args.compact and recurrence.get("compact", True) else None
 
     # Salidas
     name_out = conf.settings["output"]["base_name"]
-    json_out = Path(args.json_out or conf.settings["output"]["json"]) \
-    .with_name(f"{name_out}{semana_inicio}_{semana_final}.json")
-    ics_out = Path(args.ics_out or conf.settings["output"]["ics"]) \
-    .with_name(f"{name_out}{semana_inicio}_{semana_final}.ics")
+
+    def _outputs(week):
+        inicio, final = week["semana_inicio"], week["semana_final"]
+        return (Path(args.json_out or conf.settings["output"]["json"]).with_name(f"{name_out}{inicio}_{final}.json"),
+                Path(args.ics_out or conf.settings["output"]["ics"]).with_name(f"{name_out}{inicio}_{final}.ics"))
 
     if args.command == "purge":
+        from purge import purge_events
+        from ratelimit import RateLimiter
         if not args.since:
             raise SystemExit("❌ Debes indicar --since (YYYY-MM-DD o ISO completo).")
+        index = None
+        if args.owned:
+            from sync_index import SyncIndex
+            index = SyncIndex.from_settings(conf.settings)
+            if index is None:
+                raise SystemExit("❌ --owned necesita 'index' en la sección [output] de settings.toml.")
         # Usa los calendarios del YAML; si quieres filtrar, puedes pasar otro dict aquí
         purge_events(
             calendars=conf.calendars,
@@ -53,21 +160,109 @@ def main():
             prefixes=tuple(args.prefix) if args.prefix else None,
             dry_run=args.dry_run,
             client_secrets=conf.google_client_secrets,
+            limiter=RateLimiter.from_settings(conf.settings),
+            workers=args.workers,
+            batch=args.batch,
+            index=index,
+            backend=args.backend,
+            in_flight=args.in_flight,
         )
         return
 
+    if args.command == "plan-range":
+        return _run_range(args, conf, router, compact, max_gap, _outputs)
+
+    # El resto de comandos trabajan sobre una sola semana (la primera si el schedule trae una lista)
+    week = conf.weeks()[0]
+    semana_inicio, semana_final, trabajo = week["semana_inicio"], week["semana_final"], week["trabajo"]
+    json_out, ics_out = _outputs(week)
+    # Diario de la importación de esta semana, para --resume
+    from checkpoint import journal_path
+    journal = journal_path(ics_out)
+
+    streamed = 0
+    # Eventos que no se pudieron importar: con alguno el proceso acaba con código 1 (para cron y scripts)
+    failed = 0
     if args.command in ("generate-json", "plan"):
-        prompt_text = render_prompt(Path(args.prompt), semana_inicio, semana_final, trabajo)
-        #print(prompt_text)
-        client = GeminiClient(conf.google_api_key, conf.settings["model"]["name"])
-        json_out.write_text(client.generate_json(prompt_text), encoding="utf-8")
+        from prompt import build_prompts
+        from gemini_ia import generate_plan, merge_plans
+        from llm_cache import ResponseCache
+        from model_tiers import TieredClient, plan_check
+        cache = ResponseCache.from_settings(conf.settings, ROOT) if args.cache else None
+        client = TieredClient.from_settings(conf.settings, conf.google_api_key, cache, ROOT)
+        # Si la semana no cabe en la salida del modelo se pide en varios tramos
+        prompts = [p.text for p in build_prompts(Path(args.prompt), semana_inicio, semana_final, trabajo,
+                                                 _budget(conf, client), client.count_tokens)]
+        if args.stream:
+            from json_stream import EventStreamParser, iter_events
+            parser = EventStreamParser()
+            texts = []
+
+            def _chunks():
+                # Los tramos llegan uno tras otro por el mismo parser; cada respuesta se guarda para unirlas
+                for prompt_text in prompts:
+                    parts = []
+                    for chunk in client.stream_text(prompt_text, refresh=args.refresh):
+                        parts.append(chunk)
+                        yield chunk
+                    texts.append("".join(parts))
+
+            events = iter_events(_chunks(), parser)
+            if args.command == "plan" and not args.sync:
+                # La importación arranca con el primer evento completo, sin esperar al final de la respuesta
+                from ics_utils import event_bodies
+                import google_calendar as gcal
+                streamed, failed = gcal.import_event_stream(event_bodies(events, conf.timezone, parser), router, conf,
+                                                            batch=args.batch, journal=journal, resume=args.resume)
+            else:
+                for ev in events:
+                    print(f"   📝 {ev.get('summary', '(sin título)')}")
+            json_out.write_text(parser.text.strip() if len(texts) == 1 else merge_plans(texts), encoding="utf-8")
+        else:
+            # Sin stream cada respuesta se valida y, si no pasa, se pide al siguiente modelo de [model] tiers
+            json_out.write_text(generate_plan(client, prompts, refresh=args.refresh,
+                                              check=plan_check(trabajo, router, max_gap)), encoding="utf-8")
         print(f"✅ JSON generado: {json_out}")
+        if cache:
+            print(cache.report())
+        if len(client.tiers) > 1 and not args.stream:
+            print(client.report())
+
+    data = None
+    if args.command in ("json-to-ics", "validate", "plan"):
+        # El JSON se lee una sola vez: de él salen la validación, el .ics y los bodies de la importación
+        from ics_utils import read_clean_json
+        from validation import validate_plan
+        data = read_clean_json(json_out)
+        report = validate_plan(data.get("events", []), trabajo, router, max_gap_minutes=max_gap)
+        print(report.summary())
+        if args.command == "validate":
+            return
+        if args.strict and not report.ok:
+            raise SystemExit("❌ Plan no válido (--strict): corrige el JSON o vuelve a generarlo.")
+        if compact:
+            from recurrence import compact_plan
+            data, compaction = compact_plan(data, compact)
+            print(compaction.report())
 
     if args.command in ("json-to-ics", "plan"):
-        json_to_ics(json_out, ics_out, conf.timezone)
+        from ics_utils import write_ics
+        write_ics(data, ics_out, conf.timezone)
         print(f"✅ ICS generado: {ics_out}")
-    if args.command in ("import-ics", "plan"):
-        gcal.import_ics_to_google(ics_out, conf.calendars, conf.timezone, pick_calendar_id, conf)
+    # Si el stream no dio ningún evento (p.ej. el modelo escapó las llaves) se importa el plan completo
+    if args.command == "plan" and not streamed:
+        from ics_utils import plan_bodies
+        import google_calendar as gcal
+        failed = gcal.import_bodies_to_google(plan_bodies(data, conf.timezone, conf.timezone), conf.calendars, router,
+                                              conf, batch=args.batch, sync=args.sync, backend=args.backend,
+                                              in_flight=args.in_flight, journal=journal, resume=args.resume)
+    if args.command == "import-ics":
+        import google_calendar as gcal
+        failed = gcal.import_ics_to_google(ics_out, conf.calendars, conf.timezone, router, conf,
+                                           batch=args.batch, sync=args.sync, backend=args.backend,
+                                           in_flight=args.in_flight, journal=journal, resume=args.resume)
+    if failed:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
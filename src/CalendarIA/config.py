@@ -2,18 +2,24 @@ from __future__ import annotations
 import os
 import json
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 import yaml
-from dotenv import load_dotenv
 import tomllib
 ROOT = Path(__file__).resolve().parents[2]
-load_dotenv(ROOT / ".env")
+
+
+def load_env(path: Path = ROOT / ".env") -> None:
+    """Carga el .env en os.environ. Se llama al crear Settings, no al importar el módulo."""
+    from dotenv import load_dotenv
+    load_dotenv(path)
+
 
 class Settings:
     def __init__(self,
                  calendars_path: Path,
                  schedule_path : Path,
                  settings_path: Path):
+        load_env()
         self.timezone = os.getenv("TIMEZONE", "Europe/Madrid")
         self.lang = os.getenv("LANG", "es")
         self.google_api_key = os.getenv("GOOGLE_API_KEY", "")
@@ -24,6 +30,20 @@ class Settings:
         self.schedule = self._read_yaml(schedule_path)
         self.settings = self._read_toml(settings_path)
 
+    def weeks(self) -> List[Dict[str, Any]]:
+        """
+        Rangos a planificar. El schedule admite una sola semana (semana_inicio/semana_final/trabajo
+        en la raíz) o una lista 'semanas' donde cada elemento lleva sus propias claves.
+        """
+        if self.schedule.get("semanas"):
+            return [
+                {"semana_inicio": str(w["semana_inicio"]), "semana_final": str(w["semana_final"]),
+                 "trabajo": {str(k): str(v) for k, v in (w.get("trabajo") or {}).items()}}
+                for w in self.schedule["semanas"]
+            ]
+        return [{"semana_inicio": self.schedule["semana_inicio"], "semana_final": self.schedule["semana_final"],
+                 "trabajo": self.schedule["trabajo"]}]
+
     @staticmethod
     def _read_yaml(p: Path) -> Dict[str, Any]:
         with open(p, "r", encoding="utf-8") as fh:
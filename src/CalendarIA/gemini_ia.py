@@ -1,13 +1,112 @@
 from __future__ import annotations
-import google.generativeai as genai
+import json
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import metrics
+from llm_cache import ResponseCache, cache_key
 
 class GeminiClient:
-    def __init__(self, api_key: str, model_name: str = "gemini-2.5-pro"):
+    def __init__(self, api_key: str, model_name: str = "gemini-2.5-pro",
+                 cache: Optional[ResponseCache] = None, generation_config: Optional[Dict[str, Any]] = None,
+                 timeout: Optional[float] = None):
         if not api_key:
             raise ValueError("GOOGLE_API_KEY no configurada")
+        import google.generativeai as genai  # carga pesada: solo cuando de verdad se va a llamar al modelo
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
+        self.generation_config = generation_config or {}
+        self.model = genai.GenerativeModel(model_name, generation_config=self.generation_config or None)
+        self.cache = cache
+        # Tope por llamada: la API corta la petición con DeadlineExceeded
+        self.request_options = {"timeout": timeout} if timeout else None
+
+    def _cache_key(self, prompt: str) -> Optional[str]:
+        return cache_key(self.model_name, prompt, self.generation_config) if self.cache else None
+
+    def count_tokens(self, prompt: str) -> int:
+        """Tokens del prompt según la API; sin conexión (o si falla) se usa la estimación local."""
+        try:
+            tokens = self.model.count_tokens(prompt).total_tokens
+        except Exception as e:
+            from prompt import estimate_tokens
+            print(f"   ⚠️ count_tokens no disponible ({type(e).__name__}); se usa la estimación local.")
+            return estimate_tokens(prompt)
+        metrics.inc("gemini_count_tokens", model=self.model_name)
+        return tokens
+
+    def cached(self, prompt: str) -> Optional[str]:
+        """Respuesta guardada en la caché para este prompt, si la hay."""
+        key = self._cache_key(prompt)
+        text = self.cache.get(key) if key else None
+        if text is not None:
+            metrics.inc("gemini_cache_hits", model=self.model_name)
+        return text
+
+    def generate_json(self, prompt: str, refresh: bool = False) -> str:
+        """Devuelve la respuesta del modelo; con caché, un prompt ya visto no vuelve a llamar a la API."""
+        cached = None if refresh else self.cached(prompt)
+        if cached is not None:
+            return cached
+
+        # Sin stream el primer token llega con la respuesta completa: TTFT = total
+        key = self._cache_key(prompt)
+        t0 = time.perf_counter()
+        resp = self.model.generate_content(prompt, request_options=self.request_options)
+        text = (resp.text or "").strip()
+        elapsed = time.perf_counter() - t0
+        metrics.observe("gemini_ttft", elapsed, model=self.model_name, stream="no")
+        metrics.observe("gemini_total", elapsed, model=self.model_name, stream="no")
+        if key and text:
+            self.cache.put(key, text, model=self.model_name)
+        return text
+
+    def stream_text(self, prompt: str, refresh: bool = False) -> Iterator[str]:
+        """Como generate_json pero devolviendo los trozos según llegan (stream=True)."""
+        cached = None if refresh else self.cached(prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        # Solo cuenta el tiempo esperando a Gemini, no lo que tarda el consumidor entre trozo y trozo
+        key = self._cache_key(prompt)
+        parts = []
+        waited = 0.0
+        t0 = time.perf_counter()
+        chunks = iter(self.model.generate_content(prompt, stream=True, request_options=self.request_options))
+        while True:
+            chunk = next(chunks, None)
+            waited += time.perf_counter() - t0
+            if chunk is None:
+                break
+            text = chunk.text or ""
+            if not parts:
+                metrics.observe("gemini_ttft", waited, model=self.model_name, stream="yes")
+            parts.append(text)
+            yield text
+            t0 = time.perf_counter()
+        metrics.observe("gemini_total", waited, model=self.model_name, stream="yes")
+        full = "".join(parts).strip()
+        if key and full:
+            self.cache.put(key, full, model=self.model_name)
+
+
+def merge_plans(texts: Sequence[str]) -> str:
+    """Un único JSON con los eventos de las respuestas de cada tramo (y el 'calendar' de la primera)."""
+    from llm_json import extract_plan
+    plans = [extract_plan(text, source=f"la respuesta del tramo {i}") for i, text in enumerate(texts, 1)]
+    merged = dict(plans[0], events=[ev for plan in plans for ev in plan["events"]])
+    return json.dumps(merged, ensure_ascii=False, indent=2)
+
 
-    def generate_json(self, prompt: str) -> str:
-        resp = self.model.generate_content(prompt)
-        return (resp.text or "").strip()
\ No newline at end of file
+def generate_plan(client, prompts: List[str], refresh: bool = False,
+                  check: Optional[Callable[[str], Optional[str]]] = None) -> str:
+    """
+    Respuesta para un rango: la del único prompt tal cual o, si se partió en tramos, su unión.
+    check solo lo admite TieredClient (valida cada respuesta y cambia de modelo si no pasa).
+    """
+    generate = client.generate_json if check is None else partial(client.generate_json, check=check)
+    if len(prompts) == 1:
+        return generate(prompts[0], refresh=refresh)
+    return merge_plans([generate(p, refresh=refresh) for p in prompts])
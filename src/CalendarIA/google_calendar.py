@@ -1,98 +1,429 @@
 from __future__ import annotations
-import time, random
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from zoneinfo import ZoneInfo
-from ics import Calendar as ICSCalendar
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.errors import HttpError
 import pickle
 
+import metrics
+from checkpoint import RETRY_ROUNDS, Entry, ImportJournal, keyed, report_failed, retry_pause
 from config import Settings
+from ratelimit import RateLimiter, RETRYABLE, http_status, retry_after
+from routing import Router
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Las librerías de Google (discovery, OAuth) se importan dentro de las funciones que las usan:
+# cargarlas cuesta más que muchos comandos enteros y no todos los caminos llegan a necesitarlas.
 
-def ensure_api_auth(client_secrets: Path, token_pickle: Path) -> any:
+# La API de Calendar acepta como máximo 50 llamadas por petición batch
+BATCH_MAX = 50
+
+# Renovar el token si le queda menos que esto (google-auth solo lo hace a menos de ~4 min)
+REFRESH_MARGIN = timedelta(minutes=10)
+HTTP_TIMEOUT = 60
+
+# Líneas del VEVENT que la API recibe tal cual en body["recurrence"]
+RECURRENCE_PROPS = ("RRULE", "EXRULE", "RDATE", "EXDATE")
+
+_LOCK = threading.Lock()
+_DISCOVERY: Dict[str, dict] = {}
+_FACTORIES: Dict[Tuple[str, str], Callable[[], any]] = {}
+
+
+def _save_credentials(creds, token_path: Path) -> None:
+    """Escritura atómica del token: un corte a mitad nunca deja un pickle corrupto."""
+    token_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=token_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump(creds, fh)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, token_path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _expires_soon(creds, margin: timedelta = REFRESH_MARGIN) -> bool:
+    # google-auth guarda expiry como datetime UTC sin zona
+    return bool(creds.expiry) and creds.expiry - datetime.now(ZoneInfo("UTC")).replace(tzinfo=None) < margin
+
+
+def load_credentials(client_secrets: Path, token_pickle: Path) -> any:
+    """
+    Carga el token, lo renueva si caduca en menos de REFRESH_MARGIN (para que no lo haga a mitad de
+    una importación o purga larga) y lo guarda de forma atómica si ha cambiado.
+    Sin refresh_token un token aún válido se usa tal cual: solo se abre el navegador cuando ya no sirve.
+    """
+    from google.auth.transport.requests import Request
     token_path = Path(token_pickle)
-    creds = pickle.load(open(token_path, "rb")) if token_path.exists() else None
+    creds = None
+    with metrics.span("auth", step="load"):
+        if token_path.exists():
+            with open(token_path, "rb") as fh:
+                creds = pickle.load(fh)
 
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+    if not creds or not creds.valid or (creds.refresh_token and _expires_soon(creds)):
+        if creds and creds.refresh_token:
+            with metrics.span("auth", step="refresh"):
+                creds.refresh(Request())
         else:
-            flow = InstalledAppFlow.from_client_secrets_file(str(client_secrets), SCOPES)
-            creds = flow.run_local_server(port=0)
-        pickle.dump(creds, open(token_path, "wb"))
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            with metrics.span("auth", step="oauth"):
+                flow = InstalledAppFlow.from_client_secrets_file(str(client_secrets), SCOPES)
+                creds = flow.run_local_server(port=0)
+        _save_credentials(creds, token_path)
 
-    return build("calendar", "v3", credentials=creds)
+    return creds
 
 
-def import_ics_to_google(ics_path: Path, calendars: Dict[str, str], timezone: str, pick_calendar_id, cfg: Settings) -> None:
-    service = ensure_api_auth(Path(cfg.google_client_secrets), cfg.google_token_pickle)
+def _discovery_document() -> dict:
+    """Documento de discovery de Calendar v3: el que trae googleapiclient (sin red), parseado una vez por proceso."""
+    with _LOCK:
+        if "calendar" not in _DISCOVERY:
+            from googleapiclient.discovery_cache import get_static_doc
+            _DISCOVERY["calendar"] = json.loads(get_static_doc("calendar", "v3"))
+        return _DISCOVERY["calendar"]
+
+
+def build_service(creds, http=None) -> any:
+    """
+    Service de Calendar sobre una sesión httplib2 autorizada propia (keep-alive entre llamadas).
+    AuthorizedHttp renueva el token por su cuenta si la API responde 401.
+    """
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.discovery import build_from_document
+    with metrics.span("auth", step="service"):
+        authorized = AuthorizedHttp(creds, http=http or httplib2.Http(timeout=HTTP_TIMEOUT))
+        return build_from_document(_discovery_document(), http=authorized)
+
+
+def service_factory(client_secrets: Path, token_pickle: Path) -> Callable[[], any]:
+    """
+    Autentica una vez por proceso y devuelve una función que da un service por hilo.
+    El transporte httplib2 de googleapiclient no es thread-safe, así que cada worker necesita el suyo;
+    dentro de un hilo se reutiliza el mismo service (y su conexión) durante toda la ejecución.
+    """
+    key = (str(Path(client_secrets).resolve()), str(Path(token_pickle).resolve()))
+    with _LOCK:
+        factory = _FACTORIES.get(key)
+    if factory is not None:
+        return factory
+
+    get_service = per_thread_services(load_credentials(client_secrets, token_pickle))
+    with _LOCK:
+        return _FACTORIES.setdefault(key, get_service)
+
+
+def per_thread_services(creds) -> Callable[[], any]:
+    local = threading.local()
 
+    def get_service():
+        if getattr(local, "service", None) is None:
+            local.service = build_service(creds)
+        return local.service
+
+    return get_service
+
+
+def ensure_api_auth(client_secrets: Path, token_pickle: Path) -> any:
+    """Service del hilo actual; varias importaciones en la misma ejecución comparten auth y conexión."""
+    return service_factory(client_secrets, token_pickle)()
+
+
+def _build_insert_items(ics_path: Path, timezone: str, router: Router) -> List[Tuple[str, dict, str]]:
+    """Lee el .ics y devuelve (calendarId, body, etiqueta) por evento. Solo para .ics externos (import-ics)."""
+    from ics import Calendar as ICSCalendar  # solo hace falta al importar un .ics
     ics_text = Path(ics_path).read_text(encoding="utf-8")
     calendar = ICSCalendar(ics_text)
-    events = list(calendar.events)
-
     z = ZoneInfo(timezone)
-    base_interval = 1.0
 
-    for ev in events:
+    items = []
+    for ev in calendar.events:
         summary = ev.name or "(sin título)"
-        dt_start = ev.begin.astimezone(z) if ev.begin.tzinfo else ev.begin.replace(tzinfo=z)
-        dt_end   = ev.end.astimezone(z)   if ev.end.tzinfo   else ev.end.replace(tzinfo=z)
-
-        body = {
-            "summary": summary,
-            "start": {"dateTime": dt_start.isoformat(), "timeZone": timezone},
-            "end":   {"dateTime": dt_end.isoformat(),   "timeZone": timezone},
-        }
-
-        def _infer_cal_key(summary: str) -> str:
-            t = (summary or "").lower()
-            if "estudio" in t or "📚" in t:
-                return "ESTUDIOS"
-            if "trabajo" in t or "💼" in t:
-                return "TRABAJO"
-            if "rutina" in t or "🌀" in t:
-                return "RUTINAS"
-            if "mejora" in t or "⚙️" in t:
-                return "MEJORA"
-            return "DEFAULT"
-        target_cal_id = pick_calendar_id(summary, calendars)
-
-
-        if not target_cal_id or target_cal_id.strip() == "":
-            target_cal_id = "primary"
-        attempt = 0
-        while True:
+        if ev.all_day:
+            # VALUE=DATE: ics lo da como medianoche UTC; a la API va solo la fecha, sin moverla de zona
+            body = {
+                "summary": summary,
+                "start": {"date": ev.begin.date().isoformat()},
+                "end":   {"date": ev.end.date().isoformat()},
+            }
+        else:
+            dt_start = ev.begin.astimezone(z) if ev.begin.tzinfo else ev.begin.replace(tzinfo=z)
+            dt_end   = ev.end.astimezone(z)   if ev.end.tzinfo   else ev.end.replace(tzinfo=z)
+            body = {
+                "summary": summary,
+                "start": {"dateTime": dt_start.isoformat(), "timeZone": timezone},
+                "end":   {"dateTime": dt_end.isoformat(),   "timeZone": timezone},
+            }
+        # ics no interpreta la recurrencia y la deja en 'extra'; sin esto una serie compactada llega como un solo evento
+        recurrence = [str(line) for line in ev.extra if line.name in RECURRENCE_PROPS]
+        if recurrence:
+            body["recurrence"] = recurrence
+
+        items.append(_insert_item(body, router))
+    return items
+
+
+def _insert_item(body: dict, router: Router) -> Tuple[str, dict, str]:
+    target_cal_id = router.route(body["summary"])[1]
+    return target_cal_id, body, router.label(body["summary"])
+
+
+def _send_sequential(service, entries: List[Entry], limiter: RateLimiter,
+                     journal: Optional[ImportJournal]) -> List[Tuple[Entry, Exception]]:
+    """Inserta uno a uno; lo que falla no corta la importación, se devuelve como (entrada, error)."""
+    failed = []
+    for entry in entries:
+        key, (target_cal_id, body, display_key) = entry
+        try:
+            created = limiter.call(lambda: service.events().insert(calendarId=target_cal_id, body=body).execute(),
+                                   op="events.insert")
+        except Exception as e:
+            failed.append((entry, e))
+            continue
+        if journal:
+            journal.record(key, (created or {}).get("id"))
+        print(f"   ✔️ [{display_key}] {body['summary']}")
+    return failed
+
+
+def _retry_queue(failed: List[Tuple[Entry, Exception]], send: Callable[[List[Entry]], list],
+                 limiter: RateLimiter) -> int:
+    """Vuelve a pasar los fallidos RETRY_ROUNDS veces al final; devuelve cuántos siguen fallando."""
+    for round_ in range(1, RETRY_ROUNDS + 1):
+        if not failed:
+            break
+        time.sleep(retry_pause(limiter, round_, len(failed)))
+        failed = send([entry for entry, _ in failed])
+    return report_failed(failed)
+
+
+def _import_sequential(service, items: List[Tuple[str, dict, str]], limiter: RateLimiter,
+                       journal: Optional[ImportJournal] = None) -> int:
+    def send(entries):
+        return _send_sequential(service, entries, limiter, journal)
+
+    return _retry_queue(send(keyed(items, journal)), send, limiter)
+
+
+def run_batch(service, calls, limiter: RateLimiter, retry_5xx: bool = False, indent: str = "   ",
+              on_ok: Optional[Callable[[str, dict], None]] = None):
+    """
+    Ejecuta llamadas en peticiones batch de hasta BATCH_MAX.
+    - calls: lista de (clave, request_factory); la factory construye la petición de nuevo en cada reintento
+    - Solo se reenvían los elementos que fallaron con 403/429 (y 5xx si retry_5xx).
+    - on_ok: se llama con (clave, respuesta) en cuanto cada elemento termina bien (p.ej. para el diario).
+    - Si falla el batch entero, sus elementos sin respuesta quedan como errores con esa excepción.
+    Devuelve (ok, errores): dict clave→respuesta y dict clave→excepción.
+    """
+    ok: Dict[str, dict] = {}
+    errors: Dict[str, Exception] = {}
+    pending = list(calls)
+    attempt = 0
+
+    while pending:
+        retry = []
+        hints = []
+        factories = dict(pending)
+
+        def _callback(request_id, response, exception):
+            status = http_status(exception)
+            metrics.inc("api_calls", op="batch.item", status=status or ("ok" if exception is None else "error"))
+            if exception is None:
+                ok[request_id] = response
+                if on_ok:
+                    on_ok(request_id, response)
+            elif attempt < limiter.max_retries and (status in RETRYABLE or (retry_5xx and status and status >= 500)):
+                retry.append((request_id, factories[request_id]))
+                if status in RETRYABLE:
+                    hints.append(retry_after(exception))
+            else:
+                errors[request_id] = exception
+
+        for i in range(0, len(pending), BATCH_MAX):
+            chunk = pending[i:i + BATCH_MAX]
+            limiter.acquire(len(chunk))
+            batch = service.new_batch_http_request(callback=_callback)
+            for key, factory in chunk:
+                batch.add(factory(), request_id=key)
+            done = len(ok)
             try:
-                # === solo para el print ===
-                cal_key = _infer_cal_key(summary)
-                mapped_id = (calendars or {}).get(cal_key, "")
-                fell_to_primary = (not mapped_id or not str(mapped_id).strip())
-                # si no inferimos nada y estás en primary: muestra PRIMARY
-                display_key = (
-                    f"{cal_key}{'→PRIMARY' if fell_to_primary else ''}"
-                    if cal_key else ("PRIMARY" if target_cal_id == "primary" else "DESCONOCIDO")
-                )
-                # ==========================
-
-                service.events().insert(calendarId=target_cal_id, body=body).execute()
-                print(f"   ✔️ [{display_key}] {summary}")
-                break
-            except HttpError as e:
-                status = getattr(e, "status_code", None) or (e.resp.status if hasattr(e, "resp") else None)
-                if status in (403, 429) and attempt < 6:
-                    attempt += 1
-                    sleep_s = min(64, 2 ** attempt) + random.uniform(0, 0.8)
-                    print(f"   ⏳ Rate limit ({status}). Reintento {attempt} en {sleep_s:.1f}s…")
-                    time.sleep(sleep_s)
-                else:
-                    raise
-            time.sleep(base_interval + random.uniform(0, 0.4))
-
-    print("✅ Importación a Google Calendar completada.")
\ No newline at end of file
+                with metrics.span("api_call", op="batch"):
+                    batch.execute()
+            except Exception as e:
+                # Fallo del batch entero (red, HttpError del propio batch): lo que quedó sin respuesta
+                # se da por fallido y sigue al siguiente batch; quien llama decide si lo reintenta
+                metrics.inc("api_calls", op="batch", status=http_status(e) or "error")
+                retried = {key for key, _ in retry}
+                lost = [key for key, _ in chunk if key not in ok and key not in errors and key not in retried]
+                for key in lost:
+                    errors[key] = e
+                print(f"{indent}⚠️ Batch de {len(chunk)} fallido ({type(e).__name__}): {len(lost)} elemento(s) sin respuesta.")
+            limiter.on_success(len(ok) - done)
+
+        if retry:
+            attempt += 1
+            if hints:
+                # Solo los 403/429 cuentan como limitación y frenan el ritmo; los 5xx solo esperan
+                known = [h for h in hints if h is not None]
+                sleep_s = limiter.on_throttle(attempt, max(known) if known else None, count=len(hints))
+            else:
+                sleep_s = limiter.backoff(attempt)
+            print(f"{indent}⏳ Reintentando {len(retry)} elemento(s) (intento {attempt}) en {sleep_s:.1f}s…")
+            metrics.inc("api_retries", len(retry), op="batch.item")
+            metrics.inc("sleep_seconds", sleep_s, kind="backoff")
+            limiter.sleep(sleep_s)
+        pending = retry
+
+    return ok, errors
+
+
+def _send_batched(service, entries: List[Entry], limiter: RateLimiter,
+                  journal: Optional[ImportJournal]) -> List[Tuple[Entry, Exception]]:
+    # Agrupa por calendario destino para que cada batch vaya a un único calendario en lo posible
+    ordered = sorted(enumerate(entries), key=lambda p: p[1][1][0])
+
+    def _insert_factory(cal_id: str, body: dict):
+        return lambda: service.events().insert(calendarId=cal_id, body=body)
+
+    def _done(request_id: str, response: dict):
+        # Se anota según llega cada batch: un corte a mitad solo pierde el batch en vuelo
+        key, (_, body, display_key) = entries[int(request_id)]
+        if journal:
+            journal.record(key, (response or {}).get("id"))
+        print(f"   ✔️ [{display_key}] {body['summary']}")
+
+    calls = [(str(idx), _insert_factory(cal_id, body)) for idx, (_, (cal_id, body, _)) in ordered]
+    ok, errors = run_batch(service, calls, limiter, on_ok=_done)
+    return [(entry, errors.get(str(idx))) for idx, entry in ordered if str(idx) not in ok]
+
+
+def _import_batched(service, items: List[Tuple[str, dict, str]], limiter: RateLimiter,
+                    journal: Optional[ImportJournal] = None) -> int:
+    def send(entries):
+        return _send_batched(service, entries, limiter, journal)
+
+    return _retry_queue(send(keyed(items, journal)), send, limiter)
+
+
+def import_ics_to_google(ics_path: Path, calendars: Dict[str, str], timezone: str, router: Router, cfg: Settings,
+                         *, batch: bool = False, sync: bool = False, limiter: Optional[RateLimiter] = None,
+                         backend: str = "sync", in_flight: int = 16, journal: Optional[Path] = None,
+                         resume: bool = False) -> int:
+    """Importa los eventos de un .ics; devuelve cuántos siguen fallando tras la cola de reintentos."""
+    return _import_items(_build_insert_items(ics_path, timezone, router), calendars, cfg,
+                  batch=batch, sync=sync, limiter=limiter, backend=backend, in_flight=in_flight,
+                  journal=journal, resume=resume)
+
+
+def import_bodies_to_google(bodies: Iterable[dict], calendars: Dict[str, str], router: Router, cfg: Settings,
+                            *, batch: bool = False, sync: bool = False, limiter: Optional[RateLimiter] = None,
+                            backend: str = "sync", in_flight: int = 16, journal: Optional[Path] = None,
+                            resume: bool = False) -> int:
+    """Como import_ics_to_google pero con los bodies ya construidos en memoria (ics_utils.plan_bodies)."""
+    return _import_items([_insert_item(body, router) for body in bodies], calendars, cfg,
+                  batch=batch, sync=sync, limiter=limiter, backend=backend, in_flight=in_flight,
+                  journal=journal, resume=resume)
+
+
+def _open_journal(journal: Optional[Path], resume: bool):
+    return ImportJournal(journal, resume) if journal else nullcontext()
+
+
+def _report_import(failed: int, total: int, log: Optional[ImportJournal]) -> None:
+    if log and log.report():
+        print(log.report())
+    if failed:
+        hint = f" Relanza con --resume para enviar solo lo que falta ({log.path.name})." if log else ""
+        print(f"⚠️ Importación completada con {failed} error(es) de {total} eventos.{hint}")
+    else:
+        print("✅ Importación a Google Calendar completada.")
+
+
+def _import_items(items: List[Tuple[str, dict, str]], calendars: Dict[str, str], cfg: Settings,
+                  *, batch: bool, sync: bool, limiter: Optional[RateLimiter],
+                  backend: str = "sync", in_flight: int = 16, journal: Optional[Path] = None,
+                  resume: bool = False) -> int:
+    """
+    - journal: diario de la importación (checkpoint.ImportJournal); con resume se salta lo que ya registra.
+      Con sync no se usa: la sincronización ya compara con lo que hay en el calendario.
+    - Los errores no cortan la importación: van a la cola de reintentos y se cuentan al final.
+    Devuelve cuántos eventos siguen fallando (0 = importación completa).
+    """
+    limiter = limiter or RateLimiter.from_settings(cfg.settings)
+    if backend == "async" and (sync or batch):
+        raise ValueError("El backend async no admite --sync ni --batch.")
+
+    if sync:
+        from sync import sync_items  # sync depende de este módulo
+        from sync_index import SyncIndex
+        service = ensure_api_auth(Path(cfg.google_client_secrets), cfg.google_token_pickle)
+        index = SyncIndex.from_settings(cfg.settings)
+        try:
+            failed = sync_items(service, items, calendars, limiter, batch=batch, index=index)
+        finally:
+            if index is not None:
+                index.close()
+        print(limiter.report())
+        if failed:
+            print(f"⚠️ Sincronización completada con {failed} error(es).")
+        else:
+            print("✅ Importación a Google Calendar completada.")
+        return failed
+
+    with _open_journal(journal, resume) as log:
+        if backend == "async":
+            # httpx + asyncio: 'in_flight' inserciones a la vez sobre un pool de conexiones (sin batch ni sync)
+            from async_calendar import import_items
+            creds = load_credentials(Path(cfg.google_client_secrets), cfg.google_token_pickle)
+            failed = import_items(items, creds, limiter, max_in_flight=in_flight, journal=log)
+        else:
+            service = ensure_api_auth(Path(cfg.google_client_secrets), cfg.google_token_pickle)
+            failed = (_import_batched if batch else _import_sequential)(service, items, limiter, log)
+        print(limiter.report())
+        _report_import(failed, len(items), log)
+    return failed
+
+
+def import_event_stream(bodies: Iterable[dict], router: Router, cfg: Settings,
+                        *, batch: bool = False, limiter: Optional[RateLimiter] = None,
+                        journal: Optional[Path] = None, resume: bool = False) -> Tuple[int, int]:
+    """
+    Inserta eventos según van llegando (p.ej. mientras Gemini aún genera).
+    Devuelve (eventos procesados, eventos que siguen fallando tras la cola de reintentos).
+    En modo batch se agrupan de BATCH_MAX en BATCH_MAX conforme se completan; los fallidos se
+    reintentan al final del stream para no frenarlo.
+    """
+    service = ensure_api_auth(Path(cfg.google_client_secrets), cfg.google_token_pickle)
+    limiter = limiter or RateLimiter.from_settings(cfg.settings)
+    send_one = _send_batched if batch else _send_sequential
+
+    def send(entries):
+        return send_one(service, entries, limiter, log)
+
+    total = 0
+    failed: list = []
+    pending: List[Tuple[str, dict, str]] = []
+    with _open_journal(journal, resume) as log:
+        for body in bodies:
+            pending.append(_insert_item(body, router))
+            total += 1
+            if len(pending) >= (BATCH_MAX if batch else 1):
+                failed += send(keyed(pending, log))
+                pending = []
+        if pending:
+            failed += send(keyed(pending, log))
+
+        failures = _retry_queue(failed, send, limiter)
+        print(limiter.report())
+        _report_import(failures, total, log)
+    return total, failures
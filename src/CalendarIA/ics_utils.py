@@ -1,104 +1,180 @@
 from __future__ import annotations
-import re, json
+from itertools import islice
 from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
-from icalendar import Calendar as ICalCalendar, Event as ICalEvent
+
+import metrics
+from llm_json import extract_plan
+from recurrence import compact_plan, rrule_text
+
+"""
+* El JSON del plan se lee una vez y de él salen, en memoria, los bodies de la API de Calendar
+  (plan_bodies) y el .ics (write_ics), que es solo una salida más.
+* El .ics se escribe línea a línea con un serializador mínimo (RFC 5545: escapado de TEXT,
+  plegado a 75 octetos, CRLF), sin construir un árbol de componentes.
+"""
 
 TZ_FALLBACK = "Europe/Madrid"
 
+@metrics.timed("json_clean")
 def read_clean_json(path: Path) -> dict:
-    raw = path.read_text(encoding="utf-8", errors="replace").strip()
-    if not raw:
+    """Plan del fichero de salida del modelo: se ignora el texto de alrededor y se valida la estructura."""
+    raw = path.read_text(encoding="utf-8", errors="replace")
+    if not raw.strip():
         raise ValueError(f"El archivo JSON '{path}' está vacío.")
-
-    # Limpieza de fences/ruido comunes
-    raw = (raw.lstrip("\ufeff")
-              .replace("```json", "")
-              .replace("```JSON", "")
-              .replace("```", "")
-              .replace("Claro,", "")
-              .replace("Aquí tienes", ""))
-
-    # Reemplaza dobles llaves por simples (por si el modelo las ha escapado)
-    raw = raw.replace("{{", "{").replace("}}", "}")
-
-    # Extrae el último bloque con llaves (por si el modelo antepone texto)
-    m = re.search(r"\{.*\}\s*$", raw, re.DOTALL)
-    if not m:
-        raise ValueError(f"No se encontró un objeto JSON válido en {path}.\nPrimeras líneas:\n{raw[:300]}")
-    cleaned = m.group(0)
-
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"❌ JSON inválido en {path}: {e}\nFragmento:\n{cleaned[:400]}")
+    return extract_plan(raw, source=str(path))
 
 def parse_local(dt: str, tzname: str) -> datetime:
     return datetime.fromisoformat(dt).replace(tzinfo=ZoneInfo(tzname))
 
 
-def json_to_ics(json_path: Path, ics_path: Path, tz_fallback: str = TZ_FALLBACK) -> None:
-    data = read_clean_json(json_path)
-    tzname = data.get("calendar", {}).get("timezone", tz_fallback)
-    prodid = data.get("calendar", {}).get("prodid", "-//Plan//GenAI//ES")
-
-    cal = ICalCalendar()
-    cal.add("prodid", prodid)
-    cal.add("version", "2.0")
-    cal.add("calscale", "GREGORIAN")
-    cal.add("method", "PUBLISH")
-
-
-    now_utc = datetime.now(timezone.utc)
-
-
+def event_body(evj: dict, tzname: str, timezone_out: str) -> dict:
+    """
+    Body de la API de Calendar para un evento del JSON del plan, sin pasar por el .ics.
+    Mismo formato que la importación desde .ics: horas locales de 'tzname' expresadas en 'timezone_out',
+    o solo fechas ({"date": ...}, fin exclusivo como DTEND;VALUE=DATE) en los eventos de día completo.
+    """
+    if evj.get("all_day", False):
+        body = {
+            "summary": evj.get("summary") or "(sin título)",
+            "start": {"date": datetime.fromisoformat(evj["start"]).date().isoformat()},
+            "end":   {"date": datetime.fromisoformat(evj["end"]).date().isoformat()},
+        }
+        if evj.get("rrule"):
+            body["recurrence"] = [f"RRULE:{rrule_text(evj['rrule'])}"]
+        return body
+    z = ZoneInfo(timezone_out)
+    dt_start = parse_local(evj["start"], tzname).astimezone(z)
+    dt_end = parse_local(evj["end"], tzname).astimezone(z)
+    body = {
+        "summary": evj.get("summary") or "(sin título)",
+        "start": {"dateTime": dt_start.isoformat(), "timeZone": timezone_out},
+        "end":   {"dateTime": dt_end.isoformat(),   "timeZone": timezone_out},
+    }
+    if evj.get("rrule"):
+        # La API expande la serie con la hora de pared de start.timeZone, como el RRULE del .ics
+        body["recurrence"] = [f"RRULE:{rrule_text(evj['rrule'])}"]
+    return body
+
+
+def event_bodies(events: Iterable[dict], timezone_out: str, parser=None) -> Iterator[dict]:
+    """
+    Convierte un flujo de eventos JSON en bodies de la API.
+    Si se pasa el EventStreamParser, la zona horaria se toma de su "calendar" en cuanto llega.
+    """
+    for evj in events:
+        tzname = ((parser.calendar if parser else None) or {}).get("timezone", timezone_out)
+        yield event_body(evj, tzname, timezone_out)
+
+
+def plan_timezone(data: Dict[str, Any], tz_fallback: str = TZ_FALLBACK) -> str:
+    return (data.get("calendar") or {}).get("timezone", tz_fallback)
+
+
+@metrics.timed("bodies_build")
+def plan_bodies(data: Dict[str, Any], timezone_out: str, tz_fallback: str = TZ_FALLBACK) -> List[dict]:
+    """Bodies de la API para todos los eventos del plan ya cargado, sin pasar por el .ics."""
+    tzname = plan_timezone(data, tz_fallback)
+    return [event_body(evj, tzname, timezone_out) for evj in data.get("events", [])]
+
+
+def _ics_text(value: Any) -> str:
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """Pliega a 75 octetos por línea sin partir caracteres UTF-8 (las continuaciones empiezan por espacio)."""
+    if len(line) <= 18 or len(line.encode("utf-8")) <= 75:
+        return line
+    parts, current, size, limit = [], [], 0, 75
+    for ch in line:
+        n = len(ch.encode("utf-8"))
+        if size + n > limit:
+            parts.append("".join(current))
+            current, size, limit = [], 0, 74
+        current.append(ch)
+        size += n
+    parts.append("".join(current))
+    return "\r\n ".join(parts)
+
+
+def _ics_datetime(value: datetime) -> str:
+    """Hora local de pared en formato básico (20251106T130000); la zona va aparte en TZID."""
+    return value.replace(microsecond=0).isoformat().replace("-", "").replace(":", "")
+
+
+def iter_ics_lines(data: Dict[str, Any], tz_fallback: str = TZ_FALLBACK) -> Iterator[str]:
+    """Líneas (ya plegadas, sin CRLF) del VCALENDAR del plan, validando cada evento según sale."""
+    tzname = plan_timezone(data, tz_fallback)
+    prodid = (data.get("calendar") or {}).get("prodid", "-//Plan//GenAI//ES")
+    dtstamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    yield "BEGIN:VCALENDAR"
+    yield "VERSION:2.0"
+    yield _fold(f"PRODID:{prodid}")
+    yield "CALSCALE:GREGORIAN"
+    yield "METHOD:PUBLISH"
     for i, evj in enumerate(data.get("events", []), 1):
         for k in ("summary", "start", "end"):
             if k not in evj:
                 raise ValueError(f"Evento #{i} sin '{k}'")
-        ev = ICalEvent()
-        ev.add("summary", evj["summary"])
-        if evj.get("description"): ev.add("description", evj["description"])
-        if evj.get("location"): ev.add("location", evj["location"])
-
-
+        yield "BEGIN:VEVENT"
+        yield _fold(f"SUMMARY:{_ics_text(evj['summary'])}")
         if evj.get("all_day", False):
             s = datetime.fromisoformat(evj["start"]).date()
             e = datetime.fromisoformat(evj["end"]).date()
-            ev.add("dtstart", s); ev.add("dtend", e)
+            yield f"DTSTART;VALUE=DATE:{s.isoformat().replace('-', '')}"
+            yield f"DTEND;VALUE=DATE:{e.isoformat().replace('-', '')}"
         else:
-            dtstart = parse_local(evj["start"], tzname)
-            dtend = parse_local(evj["end"], tzname)
+            # Misma zona para ambos: basta con la hora de pared (como parse_local, se ignora un offset explícito)
+            dtstart = datetime.fromisoformat(evj["start"]).replace(tzinfo=None)
+            dtend = datetime.fromisoformat(evj["end"]).replace(tzinfo=None)
             if dtend <= dtstart:
                 raise ValueError(f"Evento #{i} tiene end <= start")
-            ev.add("dtstart", dtstart); ev.add("dtend", dtend)
-
-        ev.add("uid", f"uned-plan-{i}")
-        ev.add("dtstamp", now_utc)
-        if evj.get("rrule"): ev.add("rrule", evj["rrule"])
-        cal.add_component(ev)
-
-    ics_path.write_bytes(cal.to_ical())
-
-def resolve_calendar(summary: str, calendars: dict[str, str]) -> tuple[str, str]:
-    title = (summary or "").lower().strip()
-
-    if "estudio" in title or "📚" in title:
-        key = "ESTUDIOS"
-    elif "trabajo" in title or "💼" in title:
-        key = "TRABAJO"
-    elif "rutina" in title or "🌀" in title:
-        key = "RUTINAS"
-    elif "mejora" in title or "⚙️" in title:
-        key = "MEJORA"
-    else:
-        key = "DEFAULT"
-
-    cal_id = calendars.get(key) or "primary"
-    if not str(cal_id).strip():
-        cal_id = "primary"
-    # si cayó en primary pero no existe DEFAULT explícito, loguea como PRIMARY
-    if cal_id == "primary" and key == "DEFAULT" and "DEFAULT" not in calendars:
-        key = "PRIMARY"
-    return key, cal_id
+            yield f"DTSTART;TZID={tzname}:{_ics_datetime(dtstart)}"
+            yield f"DTEND;TZID={tzname}:{_ics_datetime(dtend)}"
+        yield f"DTSTAMP:{dtstamp}"
+        yield f"UID:uned-plan-{i}"
+        if evj.get("rrule"):
+            yield _fold(f"RRULE:{rrule_text(evj['rrule'])}")
+        if evj.get("description"):
+            yield _fold(f"DESCRIPTION:{_ics_text(evj['description'])}")
+        if evj.get("location"):
+            yield _fold(f"LOCATION:{_ics_text(evj['location'])}")
+        yield "END:VEVENT"
+    yield "END:VCALENDAR"
+
+
+@metrics.timed("ics_build")
+def write_ics(data: Dict[str, Any], ics_path: Path, tz_fallback: str = TZ_FALLBACK) -> None:
+    """Escribe el .ics en streaming; si un evento no es válido no se deja un fichero a medias."""
+    tmp = ics_path.with_name(ics_path.name + ".tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as fh:
+            lines = iter_ics_lines(data, tz_fallback)
+            while True:
+                chunk = list(islice(lines, 4096))
+                if not chunk:
+                    break
+                fh.write("\r\n".join(chunk))
+                fh.write("\r\n")
+        tmp.replace(ics_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def json_to_ics(json_path: Path, ics_path: Path, tz_fallback: str = TZ_FALLBACK,
+                compact: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Convierte el JSON del plan en .ics y devuelve el plan cargado para reutilizarlo sin volver a leerlo.
+    - compact: mínimo de repeticiones para agrupar bloques idénticos en una serie RRULE (None = no compactar).
+    """
+    data = read_clean_json(json_path)
+    if compact:
+        data, compaction = compact_plan(data, compact)
+        print(f"   {compaction.report()}")
+    write_ics(data, ics_path, tz_fallback)
+    return data
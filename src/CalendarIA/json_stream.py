@@ -0,0 +1,110 @@
+from __future__ import annotations
+import json
+from typing import Iterable, Iterator, List, Optional
+
+"""
+* Parser incremental para la salida de Gemini en streaming.
+* Recibe trozos de texto y devuelve cada objeto de "events" en cuanto se cierra su llave,
+  sin esperar a que termine la respuesta. También guarda el objeto "calendar".
+* Es un autómata de un solo recorrido: cada carácter se mira una vez, respetando strings y escapes.
+  Todo lo anterior a la primera '{' (fences, "Claro, aquí tienes…") se ignora.
+* Solo se guarda en el búfer lo que aún puede hacer falta (el objeto o string en curso); el texto completo
+  se une una vez, al pedirlo. Así el coste sigue siendo lineal aunque la respuesta llegue en miles de trozos.
+"""
+
+
+class EventStreamParser:
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._buf = ""              # texto aún no descartado; los índices de abajo son relativos a él
+        self.calendar: Optional[dict] = None
+        self.count = 0
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string = ""
+        self._key = ""
+        self._events_depth = -1     # profundidad dentro del array "events"
+        self._capture_start = -1    # inicio del objeto que se está capturando
+        self._capture_kind = ""
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Añade un trozo y devuelve los eventos completados con él."""
+        self._chunks.append(chunk)
+        self._buf += chunk
+        out: List[dict] = []
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = buf[self._string_start + 1:i]
+            elif c == '"':
+                if self._depth > 0:
+                    self._in_string = True
+                    self._string_start = i
+            elif c == ":":
+                if self._depth == 1:
+                    self._key = self._last_string
+            elif self._depth == 0 and c != "{":
+                pass  # ruido fuera del objeto JSON
+            elif c == "{" or c == "[":
+                if c == "[" and self._depth == 1 and self._key == "events":
+                    self._events_depth = self._depth + 1
+                elif c == "{" and self._capture_start < 0:
+                    if self._depth == self._events_depth:
+                        self._capture_start, self._capture_kind = i, "event"
+                    elif self._depth == 1 and self._key == "calendar":
+                        self._capture_start, self._capture_kind = i, "calendar"
+                self._depth += 1
+            elif c == "}" or c == "]":
+                self._depth -= 1
+                if c == "]" and self._depth == 1 and self._events_depth > 0:
+                    self._events_depth = -1
+                elif c == "}" and self._capture_start >= 0 and self._depth in (1, self._events_depth):
+                    fragment = buf[self._capture_start:i + 1]
+                    try:
+                        obj = json.loads(fragment)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"❌ Evento JSON inválido en el stream: {e}\nFragmento:\n{fragment[:400]}")
+                    if self._capture_kind == "event":
+                        out.append(obj)
+                        self.count += 1
+                    else:
+                        self.calendar = obj
+                    self._capture_start = -1
+            i += 1
+        # Se descarta lo ya recorrido salvo el objeto que se está capturando o el string abierto
+        keep = [i] + [start for start in (self._capture_start,) if start >= 0]
+        if self._in_string:
+            keep.append(self._string_start)
+        cut = min(keep)
+        self._buf = buf[cut:]
+        self._pos = i - cut
+        if self._capture_start >= 0:
+            self._capture_start -= cut
+        self._string_start -= cut
+        return out
+
+    @property
+    def text(self) -> str:
+        """Todo lo recibido hasta ahora."""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+
+def iter_events(chunks: Iterable[str], parser: Optional[EventStreamParser] = None) -> Iterator[dict]:
+    """Convierte un flujo de trozos de texto en un flujo de eventos ya parseados."""
+    parser = parser or EventStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
@@ -0,0 +1,121 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+"""
+* Caché en disco de las respuestas de Gemini, direccionada por contenido:
+  clave = sha256(modelo, sha256(prompt), configuración de generación).
+* Un prompt idéntico con el mismo modelo y configuración no vuelve a llamar a la API.
+* Se expulsan las entradas guardadas hace más de max_age_days (aunque se sigan usando) y, por tamaño,
+  las menos usadas recientemente (mtime = último uso).
+"""
+
+# 'created' va al principio del registro: la expulsión lo lee sin cargar la respuesta entera
+_CREATED = re.compile(rb'^\{"created": ([0-9.]+)')
+
+
+def cache_key(model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    payload = json.dumps([model_name, prompt_hash, generation_config or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, directory: Path, max_bytes: int = 50 * 1024 * 1024, max_age_days: float = 30):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any], root: Path) -> "ResponseCache":
+        """Construye la caché con la sección [cache] de settings.toml (rutas relativas a root)."""
+        conf = (settings or {}).get("cache", {})
+        directory = Path(conf.get("dir", ".cache/gemini"))
+        return cls(directory if directory.is_absolute() else root / directory,
+                   max_bytes=int(conf.get("max_mb", 50) * 1024 * 1024),
+                   max_age_days=conf.get("max_age_days", 30))
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+            if time.time() - record.get("created", path.stat().st_mtime) > self.max_age:
+                path.unlink(missing_ok=True)
+                raise FileNotFoundError(path)
+            text = record["text"]
+        except (FileNotFoundError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # marca de uso para la expulsión LRU
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str, **meta: Any) -> None:
+        record = json.dumps({"created": time.time(), "text": text, **meta}, ensure_ascii=False)
+        # Escritura atómica: otra ejecución nunca ve un fichero a medias
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(record)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self) -> int:
+        """Borra entradas caducadas y, si se pasa de max_bytes, las menos usadas. Devuelve cuántas."""
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in self.directory.glob("*.json"):
+            try:
+                st = path.stat()
+                # mtime >= created: si el último uso ya es antiguo no hace falta abrir el fichero
+                expired = now - st.st_mtime > self.max_age or now - self._created(path) > self.max_age
+            except FileNotFoundError:
+                continue  # otro hilo la acaba de expulsar
+            if expired:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    @staticmethod
+    def _created(path: Path) -> float:
+        with open(path, "rb") as fh:
+            m = _CREATED.match(fh.read(64))
+        if m:
+            return float(m.group(1))
+        try:  # entradas escritas con otro orden de claves
+            return float(json.loads(path.read_text(encoding="utf-8"))["created"])
+        except (ValueError, KeyError):
+            return path.stat().st_mtime
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        ratio = (100.0 * self.hits / lookups) if lookups else 0.0
+        return f"🗃️ Caché Gemini: {self.hits} acierto(s), {self.misses} fallo(s) ({ratio:.0f}% aciertos)."
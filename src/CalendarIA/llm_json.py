@@ -0,0 +1,148 @@
+from __future__ import annotations
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import orjson  # opcional: bastante más rápido que json con respuestas grandes
+except ImportError:
+    orjson = None
+
+"""
+* Extracción del plan JSON de la respuesta del modelo, en tiempo lineal y sin retroceso.
+* Camino rápido: lo que va de la primera '{' a la última '}' se parsea directamente (orjson si está
+  instalado). Así se cubre el ruido de alrededor sin llaves: fences, "Claro, aquí tienes…", comentarios finales.
+* Si eso falla, se usa JSONDecoder.raw_decode desde cada '{'. Es un único recorrido en C que encuentra el
+  objeto balanceado más externo respetando strings y escapes y devuelve dónde acaba. Si el objeto no es el
+  plan, se sigue tras él. Como mucho se prueban MAX_CANDIDATES.
+* Solo si ningún candidato vale se deshacen las llaves dobles ({{ }}). Se hace desde el primer '{{' y siempre
+  fuera de los strings, así que nunca se toca un JSON válido con objetos anidados.
+* Antes de devolver el plan se comprueba la estructura calendar/events.
+"""
+
+MAX_CANDIDATES = 8
+MAX_SCHEMA_ERRORS = 5
+
+_DECODER = json.JSONDecoder()
+# Un string JSON completo (o sin cerrar hasta el final) o una llave doble; el patrón desenrollado no retrocede
+_DOUBLED = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"?|\{\{|\}\}', re.DOTALL)
+
+
+def loads(text: str) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # json da un error con línea y columna (y admite NaN o enteros enormes)
+    return json.loads(text)
+
+
+def _undouble(text: str) -> str:
+    return _DOUBLED.sub(lambda m: m.group()[0] if m.group() in ("{{", "}}") else m.group(), text)
+
+
+def find_object(text: str, pos: int = 0) -> Tuple[Any, int, int]:
+    """(objeto, inicio, fin) del primer valor JSON que empieza en la primera '{' desde 'pos'."""
+    start = text.find("{", pos)
+    if start < 0:
+        raise ValueError("sin '{'")
+    obj, end = _DECODER.raw_decode(text, start)
+    return obj, start, end
+
+
+def _is_datetime(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def schema_errors(data: Any) -> List[str]:
+    """Problemas de estructura del plan (vacía si es válido); como mucho MAX_SCHEMA_ERRORS."""
+    if not isinstance(data, dict):
+        return [f"se esperaba un objeto y llegó {type(data).__name__}"]
+    errors: List[str] = []
+    calendar = data.get("calendar")
+    if calendar is not None and not isinstance(calendar, dict):
+        errors.append("'calendar' no es un objeto")
+    elif calendar and "timezone" in calendar and not isinstance(calendar["timezone"], str):
+        errors.append("'calendar.timezone' no es un texto")
+    events = data.get("events")
+    if not isinstance(events, list):
+        errors.append("falta la lista 'events'")
+        return errors
+    for i, ev in enumerate(events, 1):
+        if len(errors) >= MAX_SCHEMA_ERRORS:
+            break
+        if not isinstance(ev, dict):
+            errors.append(f"evento #{i} no es un objeto")
+            continue
+        if not isinstance(ev.get("summary"), str):
+            errors.append(f"evento #{i} sin 'summary'")
+        for k in ("start", "end"):
+            if not _is_datetime(ev.get(k)):
+                errors.append(f"evento #{i}: '{k}' falta o no es una fecha ISO ({ev.get(k)!r})")
+        if "all_day" in ev and not isinstance(ev["all_day"], bool):
+            errors.append(f"evento #{i}: 'all_day' no es true/false")
+        if ev.get("rrule") is not None and not isinstance(ev["rrule"], (str, dict)):
+            errors.append(f"evento #{i}: 'rrule' no es un texto")
+    return errors[:MAX_SCHEMA_ERRORS]
+
+
+def _candidates(text: str) -> Iterator[Tuple[Any, Optional[Exception], str]]:
+    """(objeto, error, fragmento) de cada candidato, de izquierda a derecha."""
+    first, last = text.find("{"), text.rfind("}")
+    if first < 0 or last < first:
+        return
+    try:
+        yield loads(text[first:last + 1]), None, ""
+    except json.JSONDecodeError:
+        pass
+    pos = first
+    for _ in range(MAX_CANDIDATES):
+        try:
+            obj, start, end = find_object(text, pos)
+        except json.JSONDecodeError as e:
+            yield None, e, text[e.pos - 200 if e.pos > 200 else 0:e.pos + 200]
+            pos = text.find("{", e.pos if e.pos > pos else pos + 1)
+            if pos < 0:
+                return
+            continue
+        except ValueError:
+            return
+        yield obj, None, ""
+        pos = end
+
+
+def _attempts(text: str) -> Iterator[str]:
+    yield text
+    doubled = text.find("{{")
+    if doubled >= 0:
+        # Solo se construye si el texto original no tenía un plan válido
+        yield _undouble(text[doubled:])
+
+
+def extract_plan(text: str, source: str = "la respuesta") -> Dict[str, Any]:
+    """Plan (calendar/events) contenido en la salida del modelo; ValueError con el motivo si no lo hay."""
+    error: Optional[Exception] = None
+    fragment = ""
+    for attempt in _attempts(text):
+        for data, err, context in _candidates(attempt):
+            if err is not None:
+                # Se informa del error más avanzado: el del candidato que más se parecía al plan
+                if error is None or err.pos > error.pos:
+                    error, fragment = err, context
+                continue
+            if isinstance(data, dict) and "events" in data:
+                problems = schema_errors(data)
+                if problems:
+                    details = "\n   - ".join(problems)
+                    raise ValueError(f"❌ Plan con estructura inválida en {source}:\n   - {details}")
+                return data
+    if error is not None:
+        raise ValueError(f"❌ JSON inválido en {source}: {error}\nFragmento:\n{fragment[:400]}")
+    raise ValueError(f"No se encontró un objeto JSON válido en {source}.\nPrimeras líneas:\n{text[:300]}")
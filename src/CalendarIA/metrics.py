@@ -0,0 +1,160 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+"""
+* Métricas de la ejecución: tramos cronometrados (spans) y contadores, en memoria y thread-safe.
+* Se registran siempre (el coste es un perf_counter y un append) y solo se escriben con --metrics-out:
+  JSON si el fichero acaba en .json, texto de Prometheus en cualquier otro caso.
+* Tramos: prompt_render, gemini_ttft/gemini_total, json_clean, validation, ics_build, auth, api_call…
+  Contadores: api_calls (por operación y estado), api_retries y sleep_seconds (pacing vs backoff).
+"""
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _prom_labels(labels: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ""
+
+    def esc(v: str) -> str:
+        return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: Dict[Key, List[float]] = {}
+        self._counters: Dict[Key, float] = {}
+        self.started = time.time()
+
+    @contextmanager
+    def span(self, name: str, **labels: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def timed(self, name: str, **labels: Any) -> Callable[[Callable], Callable]:
+        """Decorador: cada llamada a la función es un tramo 'name'."""
+        def decorate(fn: Callable) -> Callable:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        with self._lock:
+            self._spans.setdefault(_key(name, labels), []).append(seconds)
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        with self._lock:
+            key = _key(name, labels)
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def api_call(self, op: str, seconds: float, status: Any, retries: int = 0, slept: float = 0.0) -> None:
+        """Una llamada lógica a una API: latencia total (con reintentos), estado final, reintentos y espera."""
+        self.observe("api_call", seconds, op=op)
+        self.inc("api_calls", op=op, status=status)
+        if retries:
+            self.inc("api_retries", retries, op=op)
+        if slept:
+            self.inc("sleep_seconds", slept, kind="backoff")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = {k: sorted(v) for k, v in self._spans.items()}
+            counters = dict(self._counters)
+        return {
+            "started": self.started,
+            "duration": time.time() - self.started,
+            "spans": [
+                {"name": name, "labels": dict(labels), "count": len(values), "sum": sum(values),
+                 "min": values[0], "max": values[-1], "p50": _quantile(values, 0.5), "p95": _quantile(values, 0.95)}
+                for (name, labels), values in sorted(spans.items())
+            ],
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+        }
+
+    def to_prometheus(self) -> str:
+        snap = self.snapshot()
+        lines = ["# TYPE calendaria_span_seconds summary"]
+        for s in snap["spans"]:
+            labels = tuple(sorted(dict(s["labels"], span=s["name"]).items()))
+            for q in ("p50", "p95"):
+                lines.append(f"calendaria_span_seconds{_prom_labels(labels, quantile=f'0.{q[1:]}')} {s[q]:.6f}")
+            lines.append(f"calendaria_span_seconds_sum{_prom_labels(labels)} {s['sum']:.6f}")
+            lines.append(f"calendaria_span_seconds_count{_prom_labels(labels)} {s['count']}")
+        for name in sorted({c["name"] for c in snap["counters"]}):
+            lines.append(f"# TYPE calendaria_{name}_total counter")
+            for c in (c for c in snap["counters"] if c["name"] == name):
+                labels = tuple(sorted(c["labels"].items()))
+                lines.append(f"calendaria_{name}_total{_prom_labels(labels)} {c['value']:g}")
+        lines.append("# TYPE calendaria_run_seconds gauge")
+        lines.append(f"calendaria_run_seconds {snap['duration']:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        path = Path(path)
+        if path.suffix.lower() == ".json":
+            path.write_text(json.dumps(self.snapshot(), indent=2, ensure_ascii=False), encoding="utf-8")
+        else:
+            path.write_text(self.to_prometheus(), encoding="utf-8")
+
+    def summary(self) -> str:
+        """
+        Una línea con dónde se fue el tiempo: LLM, API, esperas por ritmo y por reintentos.
+        Con hilos o peticiones en paralelo los tiempos de API y espera son sumas y pueden superar el total.
+        """
+        snap = self.snapshot()
+
+        def total(name: str, **labels: str) -> float:
+            return sum(s["sum"] for s in snap["spans"] if s["name"] == name
+                       and all(s["labels"].get(k) == v for k, v in labels.items()))
+
+        def counter(name: str, **labels: str) -> float:
+            return sum(c["value"] for c in snap["counters"] if c["name"] == name
+                       and all(c["labels"].get(k) == v for k, v in labels.items()))
+
+        return (f"📊 Tiempo: {snap['duration']:.1f}s total · Gemini {total('gemini_total'):.1f}s · "
+                f"API {total('api_call'):.1f}s (suma) en {counter('api_calls'):.0f} llamada(s) · "
+                f"espera por ritmo {counter('sleep_seconds', kind='pacing'):.1f}s · "
+                f"espera por reintentos {counter('sleep_seconds', kind='backoff'):.1f}s")
+
+
+# Registro de la ejecución actual, compartido por todos los módulos
+METRICS = Metrics()
+span = METRICS.span
+timed = METRICS.timed
+observe = METRICS.observe
+inc = METRICS.inc
@@ -0,0 +1,260 @@
+from __future__ import annotations
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from gemini_ia import GeminiClient
+from llm_cache import ResponseCache
+from llm_json import extract_plan
+
+"""
+* Modelos por niveles ([model] tiers): se pregunta primero al más rápido y barato y solo se sube al
+  siguiente si su respuesta no pasa la comprobación (esquema del plan y, con plan_check, solapes y
+  choques con los turnos). Si ninguno la pasa se usa el plan del nivel más alto que al menos se pudo leer.
+* Cada llamada tiene un tope de tiempo ([model] timeout). Cobertura (hedging): si un nivel tarda más que
+  su p95 histórico, se lanza ya el siguiente y gana la primera respuesta válida. Las llamadas descartadas
+  siguen en hilos daemon (su resultado se apunta en el histórico) y no retienen la salida del programa.
+* Latencias y resultados por modelo se guardan entre ejecuciones ([model] stats) para el p95 y para ver
+  qué orden conviene; en la ejecución actual van también a las métricas (gemini_tier, gemini_tier_calls).
+* El streaming no se puede validar antes de usarlo: va siempre al modelo de [model] name.
+"""
+
+# Devuelve None si la respuesta vale, un texto con el problema si se puede usar pero no pasa,
+# o lanza ValueError si ni siquiera hay un plan que leer
+Check = Callable[[str], Optional[str]]
+
+DEFAULT_TIMEOUT = 300.0
+# Latencias recordadas por modelo y mínimo para fiarse del p95 (sin histórico no hay cobertura)
+WINDOW = 50
+MIN_SAMPLES = 5
+
+
+def schema_check(text: str) -> Optional[str]:
+    extract_plan(text)  # ValueError si no hay plan o no cumple el esquema
+    return None
+
+
+def plan_check(trabajo: Dict[str, str], router=None, max_gap_minutes: float = 10) -> Check:
+    """Esquema + validate_plan: la respuesta pasa si no tiene solapes ni choques con los turnos."""
+    from validation import validate_plan  # NumPy: solo si de verdad se valida
+
+    def check(text: str) -> Optional[str]:
+        data = extract_plan(text)
+        report = validate_plan(data["events"], trabajo, router, max_gap_minutes=max_gap_minutes)
+        if report.ok:
+            return None
+        return f"{report.overlap_count} solape(s) y {report.conflict_count} choque(s) con turnos"
+    return check
+
+
+def _p95(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+def _is_timeout(e: Exception) -> bool:
+    return isinstance(e, TimeoutError) or "Deadline" in type(e).__name__ or "Timeout" in type(e).__name__
+
+
+def _submit(fn: Callable[..., Any], *args: Any) -> Future:
+    """Como pool.submit pero en un hilo daemon: una llamada descartada no bloquea el final del programa."""
+    fut: Future = Future()
+
+    def run():
+        if fut.set_running_or_notify_cancel():
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return fut
+
+
+class TierStats:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data: Dict[str, Dict[str, Any]] = {}
+        if path and path.exists():
+            try:
+                self.data = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                self.data = {}
+
+    def _entry(self, model: str) -> Dict[str, Any]:
+        return self.data.setdefault(model, {"latencies": [], "ok": 0, "invalid": 0, "error": 0, "timeout": 0})
+
+    def p95(self, model: str) -> Optional[float]:
+        with self._lock:
+            latencies = list(self._entry(model)["latencies"])
+        return _p95(latencies) if len(latencies) >= MIN_SAMPLES else None
+
+    def record(self, model: str, outcome: str, seconds: float, cached: bool = False) -> None:
+        """Resultado de una llamada: ok, invalid, error o timeout. Las respuestas de la caché no entran en el histórico."""
+        metrics.inc("gemini_tier_calls", model=model, outcome=outcome, cached="yes" if cached else "no")
+        if cached:
+            return
+        metrics.observe("gemini_tier", seconds, model=model)
+        with self._lock:
+            entry = self._entry(model)
+            entry[outcome] = entry.get(outcome, 0) + 1
+            entry["latencies"] = (entry["latencies"] + [round(seconds, 3)])[-WINDOW:]
+            self._save()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica, como la caché de respuestas
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(self.data, fh, indent=1)
+        os.replace(tmp, self.path)
+
+    def report(self, models: List[str]) -> str:
+        lines = ["🎚️ Modelos por niveles (histórico):"]
+        for level, model in enumerate(models, 1):
+            with self._lock:
+                entry = dict(self._entry(model))
+            total = sum(entry.get(k, 0) for k in ("ok", "invalid", "error", "timeout"))
+            p95 = self.p95(model)
+            rate = f"{entry['ok']}/{total} válidas ({100.0 * entry['ok'] / total:.0f}%)" if total else "sin llamadas"
+            lines.append(f"   {level}. {model}: {rate}, {entry.get('timeout', 0)} timeout(s), "
+                         f"p95 {f'{p95:.1f}s' if p95 is not None else '—'}")
+        return "\n".join(lines)
+
+
+class TieredClient:
+    """Misma interfaz que GeminiClient (generate_json, stream_text, count_tokens) sobre varios modelos."""
+
+    def __init__(self, tiers: List[GeminiClient], primary: Optional[GeminiClient] = None,
+                 stats: Optional[TierStats] = None, hedge: bool = True):
+        if not tiers:
+            raise ValueError("Hace falta al menos un modelo en [model] tiers")
+        self.tiers = tiers
+        self.primary = primary or tiers[-1]
+        self.stats = stats or TierStats()
+        self.hedge = hedge
+        self.model_name = self.primary.model_name
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any], api_key: str, cache: Optional[ResponseCache] = None,
+                      root: Optional[Path] = None) -> "TieredClient":
+        """Niveles de la sección [model] de settings.toml; sin 'tiers' queda un único nivel con 'name'."""
+        conf = (settings or {}).get("model", {})
+        name = conf.get("name", "gemini-2.5-pro")
+        names = list(conf.get("tiers") or [name])
+        timeout = conf.get("timeout", DEFAULT_TIMEOUT)
+        clients = {n: GeminiClient(api_key, n, cache=cache, timeout=timeout) for n in dict.fromkeys(names + [name])}
+        path = Path(conf["stats"]) if conf.get("stats") else None
+        if path and root and not path.is_absolute():
+            path = root / path
+        return cls([clients[n] for n in names], clients[name], TierStats(path), hedge=conf.get("hedge", True))
+
+    @property
+    def models(self) -> List[str]:
+        return [t.model_name for t in self.tiers]
+
+    def count_tokens(self, prompt: str) -> int:
+        return self.tiers[0].count_tokens(prompt)
+
+    def stream_text(self, prompt: str, refresh: bool = False):
+        return self.primary.stream_text(prompt, refresh=refresh)
+
+    def report(self) -> str:
+        return self.stats.report(self.models)
+
+    @staticmethod
+    def _ask(tier: GeminiClient, prompt: str, refresh: bool) -> Tuple[str, Optional[float]]:
+        """(respuesta, segundos de la llamada o None si salió de la caché)."""
+        text = None if refresh else tier.cached(prompt)
+        if text is not None:
+            return text, None
+        t0 = time.perf_counter()
+        text = tier.generate_json(prompt, refresh=True)
+        return text, time.perf_counter() - t0
+
+    def _settle(self, fut: Future, model: str, check: Check, started: float) -> Tuple[Optional[str], Optional[str], bool]:
+        """(respuesta, problema, se puede usar) de una llamada terminada; apunta el resultado en el histórico."""
+        try:
+            text, seconds = fut.result()
+        except Exception as e:
+            # Un timeout también cuenta como latencia: el p95 no debe olvidar las llamadas lentas
+            self.stats.record(model, "timeout" if _is_timeout(e) else "error", time.monotonic() - started)
+            return None, f"{type(e).__name__}: {e}", False
+        cached = seconds is None
+        try:
+            problem = check(text)
+        except ValueError as e:
+            self.stats.record(model, "invalid", seconds or 0.0, cached)
+            return text, str(e).splitlines()[0], False
+        self.stats.record(model, "ok" if problem is None else "invalid", seconds or 0.0, cached)
+        return text, problem, True
+
+    def generate_json(self, prompt: str, refresh: bool = False, check: Optional[Check] = None) -> str:
+        """
+        Respuesta del primer nivel que pasa 'check' (por defecto, solo el esquema del plan).
+        Se sube de nivel cuando uno falla o, con cobertura, cuando tarda más que su p95.
+        ValueError si ningún nivel devuelve un plan que se pueda leer.
+        """
+        check = check or schema_check
+        running: Dict[Future, int] = {}
+        started_at: Dict[int, float] = {}
+        flawed: Dict[int, Tuple[str, str]] = {}
+        reasons: List[str] = []
+
+        def start(level: int) -> None:
+            started_at[level] = time.monotonic()
+            running[_submit(self._ask, self.tiers[level], prompt, refresh)] = level
+
+        start(0)
+        try:
+            while running:
+                newest = max(running.values())
+                hedge_at = None
+                if self.hedge and newest + 1 < len(self.tiers):
+                    p95 = self.stats.p95(self.tiers[newest].model_name)
+                    hedge_at = None if p95 is None else started_at[newest] + p95
+                timeout = None if hedge_at is None else max(0.0, hedge_at - time.monotonic())
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    slow = self.tiers[newest].model_name
+                    metrics.inc("gemini_hedges", model=slow)
+                    print(f"   🎚️ {slow} tarda más que su p95: se pide también a {self.tiers[newest + 1].model_name}.")
+                    start(newest + 1)
+                    continue
+                for fut in done:
+                    level = running.pop(fut)
+                    model = self.tiers[level].model_name
+                    text, problem, usable = self._settle(fut, model, check, started_at[level])
+                    if text is not None and problem is None:
+                        if level:
+                            print(f"   🎚️ Plan de {model} (nivel {level + 1}).")
+                        return text
+                    reasons.append(f"{model}: {problem}")
+                    if usable:
+                        flawed[level] = (text, problem)
+                    # Se sube de nivel si el que falla es el más alto en marcha
+                    if level == max(started_at) and level + 1 < len(self.tiers):
+                        print(f"   🎚️ {model} no vale ({problem}): se pasa a {self.tiers[level + 1].model_name}.")
+                        start(level + 1)
+        finally:
+            # Las llamadas que quedan (ya con respuesta válida de otro nivel) se apuntan cuando terminen
+            for fut, level in running.items():
+                fut.add_done_callback(lambda f, m=self.tiers[level].model_name, t=started_at[level]:
+                                      self._settle(f, m, check, t))
+
+        if flawed:
+            level = max(flawed)
+            text, problem = flawed[level]
+            print(f"   ⚠️ Ningún modelo pasó la validación; se usa el plan de {self.tiers[level].model_name} ({problem}).")
+            return text
+        details = "\n   - ".join(reasons)
+        raise ValueError(f"❌ Ningún modelo devolvió un plan válido:\n   - {details}")
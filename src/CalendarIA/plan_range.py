@@ -0,0 +1,106 @@
+from __future__ import annotations
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from gemini_ia import generate_plan
+from ics_utils import read_clean_json, write_ics
+from prompt import TokenBudget, build_prompts
+from recurrence import compact_plan
+
+"""
+* Planificación de varias semanas de una vez (comando plan-range).
+* Los prompts se renderizan todos al principio y las llamadas a Gemini van en paralelo
+  con un tope de concurrencia; cada semana escribe su propio JSON/ICS.
+* Con presupuesto de tokens, una semana que no cabe en la salida del modelo se pide en tramos
+  (en la misma tarea) y sus eventos se unen en un solo JSON.
+* Cada semana se valida como en 'plan' antes de escribir su .ics; con strict una semana con solapes o
+  choques con los turnos cuenta como fallida y no se convierte ni se importa.
+* La importación (si se pide) se hace en el hilo principal según termina cada semana,
+  para que todas compartan el mismo ritmo de llamadas a Calendar.
+"""
+
+Week = Dict[str, Any]
+
+
+def _generate_week(client, prompt_texts: List[str], json_out: Path, ics_out: Path, timezone: str,
+                   refresh: bool, compact: Optional[int], check=None, validate=None,
+                   strict: bool = False) -> Tuple[float, Dict[str, Any], Any]:
+    t0 = time.perf_counter()
+    json_out.write_text(generate_plan(client, prompt_texts, refresh=refresh, check=check), encoding="utf-8")
+    data = read_clean_json(json_out)
+    # Se valida el plan tal cual (sin compactar), igual que 'plan'
+    report = validate(data) if validate else None
+    if strict and report is not None and not report.ok:
+        details = "\n".join(f"      {line}" for line in report.summary().splitlines())
+        raise ValueError(f"plan no válido (--strict), no se genera el .ics ni se importa.\n{details}")
+    compaction = None
+    if compact:
+        data, compaction = compact_plan(data, compact)
+    write_ics(data, ics_out, timezone)
+    return time.perf_counter() - t0, data, (report, compaction)
+
+
+def plan_range(weeks: List[Week], prompt_path: Path, client, outputs: Callable[[Week], Tuple[Path, Path]],
+               timezone: str, *, concurrency: int = 3, refresh: bool = False, compact: Optional[int] = None,
+               budget: Optional[TokenBudget] = None, checks: Optional[Callable[[Week], Callable]] = None,
+               validate: Optional[Callable[[Week, Dict[str, Any]], Any]] = None, strict: bool = False,
+               import_plan: Optional[Callable[[Week, Dict[str, Any]], Optional[int]]] = None) -> int:
+    """
+    Genera JSON + ICS de cada semana con hasta 'concurrency' llamadas a Gemini a la vez.
+    - outputs: semana → (json_out, ics_out)
+    - compact: mínimo de repeticiones para compactar bloques en series RRULE (None = no compactar)
+    - budget: presupuesto de tokens del modelo; las semanas que no caben se piden en tramos
+    - checks: semana → comprobación de la respuesta (model_tiers.plan_check) para cambiar de modelo si falla
+    - validate: (semana, plan) → informe de validation.validate_plan; con strict, un plan que no pasa hace
+      fallar la semana sin escribir su .ics ni importarla
+    - import_plan: si se da, se llama con la semana y su plan (JSON ya cargado) en cuanto está listo y
+      devuelve cuántos eventos no se pudieron importar; un error o algún evento sin importar cuenta como fallo
+      de la semana, pero no corta las demás
+    Devuelve el número de semanas que fallaron (al generarlas o al importarlas).
+    """
+    count = getattr(client, "count_tokens", None)
+    prompts = [[p.text for p in build_prompts(prompt_path, w["semana_inicio"], w["semana_final"], w["trabajo"],
+                                              budget, count)]
+               for w in weeks]
+    print(f"🗓️ Planificando {len(weeks)} semana(s) con hasta {concurrency} llamada(s) a Gemini en paralelo…")
+
+    t0 = time.perf_counter()
+    failed = 0
+    import_failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {
+            pool.submit(_generate_week, client, prompt_texts, *outputs(week), timezone, refresh, compact,
+                        checks(week) if checks else None,
+                        partial(validate, week) if validate else None, strict): week
+            for week, prompt_texts in zip(weeks, prompts)
+        }
+        for done, fut in enumerate(as_completed(futures), 1):
+            week = futures[fut]
+            label = f"{week['semana_inicio']} → {week['semana_final']}"
+            try:
+                elapsed, data, (report, compaction) = fut.result()
+            except Exception as e:
+                failed += 1
+                print(f"   ❌ [{done}/{len(weeks)}] {label}: {e}")
+                continue
+            json_out, ics_out = outputs(week)
+            print(f"   ✅ [{done}/{len(weeks)}] {label} en {elapsed:.1f}s → {ics_out}")
+            for text in ([report.summary()] if report else []) + ([compaction.report()] if compaction else []):
+                print("\n".join(f"      {line}" for line in text.splitlines()))
+            if import_plan:
+                try:
+                    missing = import_plan(week, data)
+                except Exception as e:
+                    import_failed += 1
+                    print(f"   ❌ {label}: importación fallida: {e}")
+                    continue
+                if missing:
+                    import_failed += 1
+
+    print(f"🏁 {len(weeks) - failed}/{len(weeks)} semana(s) generadas en {time.perf_counter() - t0:.1f}s.")
+    if import_failed:
+        print(f"⚠️ {import_failed} semana(s) no se importaron por completo.")
+    return failed + import_failed
@@ -1,9 +1,39 @@
 from __future__ import annotations
+import re
 from pathlib import Path
-from datetime import date
-from typing import Dict
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import metrics
+
+"""
+* Plantillas del prompt: se trocean una sola vez en textos fijos y huecos con nombre ({SEMANA_INICIO}…)
+  y se guardan compiladas por (ruta, fecha de modificación, tamaño). Renderizar es unir trozos.
+* Presupuesto de tokens: la salida de un plan crece con los días del rango y, con gemini-2.5-pro, se corta
+  al llegar al límite de salida (que comparte con el razonamiento del modelo). build_prompts parte el rango
+  en tramos que quepan y, si el prompt no cabe en la entrada, recorta los turnos a los días del tramo.
+* Los tokens del prompt se estiman en local (bytes / 4, por encima de lo real en español); solo cerca del
+  límite se pide la cuenta exacta a la API (count_tokens) si hay cliente.
+"""
 
 _DIAS = ["Lunes","Martes","Miércoles","Jueves","Viernes","Sábado","Domingo"]
+# {NOMBRE} en mayúsculas; las llaves dobles del esquema JSON ({{ … }}) no son huecos
+_SLOT = re.compile(r"\{([A-Z][A-Z_]*)\}")
+
+# Límites (entrada, salida) en tokens por modelo; la salida incluye el razonamiento en los 2.5
+MODEL_LIMITS = {
+    "gemini-2.5-pro": (1_048_576, 65_536),
+    "gemini-2.5-flash": (1_048_576, 65_536),
+    "gemini-2.5-flash-lite": (1_048_576, 65_536),
+}
+DEFAULT_LIMITS = (1_048_576, 8_192)
+# Salida reservada al razonamiento (presupuesto máximo de thinking de 2.5-pro)
+THINKING_TOKENS = 32_768
+# Un día de plan: ~25 eventos × ~80 tokens de JSON con emojis y sangría
+TOKENS_PER_DAY = 2_000
+# Por debajo de esta fracción del límite de entrada basta con la estimación local
+EXACT_COUNT_ABOVE = 0.8
 
 def _nombre_dia(fecha_iso: str) -> str:
     y, m, d = map(int, fecha_iso.split("-"))
@@ -21,11 +51,134 @@ def build_bloque_trabajo(trabajo: Dict[str, str]) -> str:
         parts.append(f" * {_nombre_dia(fecha)} {fecha}: {_normaliza_franja(franja)}")
     return "\n".join(parts)
 
+
+class Template:
+    def __init__(self, text: str):
+        # Posiciones pares: texto fijo; impares: nombre del hueco
+        self.parts = _SLOT.split(text)
+        self.slots = frozenset(self.parts[1::2])
+
+    def render(self, **values: str) -> str:
+        missing = self.slots - values.keys()
+        if missing:
+            raise ValueError(f"Faltan valores para la plantilla: {', '.join(sorted(missing))}")
+        parts = list(self.parts)
+        parts[1::2] = [values[name] for name in self.parts[1::2]]
+        return "".join(parts)
+
+
+@lru_cache(maxsize=16)
+def _compile(path: str, mtime_ns: int, size: int) -> Template:
+    return Template(Path(path).read_text(encoding="utf-8"))
+
+
+def load_template(template_path: Path) -> Template:
+    """Plantilla compilada; solo se vuelve a leer si el fichero cambia."""
+    st = template_path.stat()
+    return _compile(str(template_path), st.st_mtime_ns, st.st_size)
+
+
+@metrics.timed("prompt_render")
 def render_prompt(template_path: Path, semana_inicio: str, semana_final: str, trabajo: Dict[str, str]) -> str:
-    tpl = template_path.read_text(encoding="utf-8")
-    return (
-    tpl
-    .replace("{SEMANA_INICIO}", semana_inicio)
-    .replace("{SEMANA_FINAL}", semana_final)
-    .replace("{BLOQUE_TRABAJO}", build_bloque_trabajo(trabajo))
-    )
\ No newline at end of file
+    return load_template(template_path).render(SEMANA_INICIO=semana_inicio, SEMANA_FINAL=semana_final,
+                                               BLOQUE_TRABAJO=build_bloque_trabajo(trabajo))
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+class TokenBudget:
+    def __init__(self, max_input: int, max_output: int, thinking: int = THINKING_TOKENS,
+                 tokens_per_day: int = TOKENS_PER_DAY):
+        self.max_input = max_input
+        self.max_output = max_output
+        self.thinking = min(thinking, max_output // 2)
+        self.tokens_per_day = tokens_per_day
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any], model_name: str) -> "TokenBudget":
+        """Límites del modelo (MODEL_LIMITS) con lo que fije la sección [budget] de settings.toml."""
+        conf = (settings or {}).get("budget", {})
+        max_input, max_output = MODEL_LIMITS.get(model_name, DEFAULT_LIMITS)
+        return cls(conf.get("max_input_tokens", max_input), conf.get("max_output_tokens", max_output),
+                   thinking=conf.get("thinking_tokens", THINKING_TOKENS),
+                   tokens_per_day=conf.get("tokens_per_day", TOKENS_PER_DAY))
+
+    @property
+    def output_tokens(self) -> int:
+        """Salida disponible para el JSON del plan."""
+        return self.max_output - self.thinking
+
+    @property
+    def days_per_call(self) -> int:
+        return max(1, self.output_tokens // self.tokens_per_day)
+
+
+class Prompt(NamedTuple):
+    semana_inicio: str
+    semana_final: str
+    text: str
+    tokens: int
+
+
+def split_range(semana_inicio: str, semana_final: str, max_days: int) -> List[Tuple[str, str]]:
+    """Tramos consecutivos de como mucho max_days días, del mismo tamaño ±1 (14 días con tope 10 → 7 + 7)."""
+    first, last = date.fromisoformat(semana_inicio), date.fromisoformat(semana_final)
+    days = (last - first).days + 1
+    if days <= max_days:
+        return [(semana_inicio, semana_final)]
+    n = -(-days // max_days)
+    out = []
+    for i in range(n):
+        start = first + timedelta(days=days * i // n)
+        end = first + timedelta(days=days * (i + 1) // n - 1)
+        out.append((start.isoformat(), end.isoformat()))
+    return out
+
+
+def trim_trabajo(trabajo: Dict[str, str], semana_inicio: str, semana_final: str) -> Dict[str, str]:
+    """Turnos del tramo y del día siguiente (el descanso de la última noche depende de él)."""
+    until = (date.fromisoformat(semana_final) + timedelta(days=1)).isoformat()
+    return {k: v for k, v in trabajo.items() if semana_inicio <= str(k) <= until}
+
+
+def build_prompts(template_path: Path, semana_inicio: str, semana_final: str, trabajo: Dict[str, str],
+                  budget: Optional[TokenBudget] = None,
+                  count_tokens: Optional[Callable[[str], int]] = None) -> List[Prompt]:
+    """
+    Prompts para planificar el rango dentro del presupuesto: uno si cabe, si no uno por tramo.
+    - budget: None = un solo prompt sin comprobar nada (como render_prompt)
+    - count_tokens: cuenta exacta (GeminiClient.count_tokens) para cuando la estimación se acerca al límite
+    ValueError si ni recortando los turnos el prompt cabe en la entrada del modelo.
+    """
+    if budget is None:
+        text = render_prompt(template_path, semana_inicio, semana_final, trabajo)
+        return [Prompt(semana_inicio, semana_final, text, estimate_tokens(text))]
+
+    ranges = split_range(semana_inicio, semana_final, budget.days_per_call)
+    if len(ranges) > 1:
+        days = (date.fromisoformat(semana_final) - date.fromisoformat(semana_inicio)).days + 1
+        print(f"✂️ {semana_inicio} → {semana_final}: {days} días ≈ {days * budget.tokens_per_day} tokens de salida, "
+              f"más que los {budget.output_tokens} disponibles; se pide en {len(ranges)} tramos.")
+
+    prompts = []
+    for inicio, final in ranges:
+        # Con varios tramos cada prompt lleva solo sus turnos; con uno, el schedule tal cual salvo que no quepa
+        trimmed = len(ranges) > 1
+        shifts = trim_trabajo(trabajo, inicio, final) if trimmed else trabajo
+        while True:
+            text = render_prompt(template_path, inicio, final, shifts)
+            tokens = estimate_tokens(text)
+            if count_tokens and tokens > budget.max_input * EXACT_COUNT_ABOVE:
+                tokens = count_tokens(text)
+            if tokens <= budget.max_input or trimmed:
+                break
+            shifts, trimmed = trim_trabajo(trabajo, inicio, final), True
+            print(f"✂️ Prompt de {tokens} tokens > {budget.max_input}: se dejan solo los turnos de {inicio} → {final}.")
+        if tokens > budget.max_input:
+            raise ValueError(f"❌ El prompt de {inicio} → {final} ocupa {tokens} tokens y el modelo admite "
+                             f"{budget.max_input}: acorta la plantilla ({template_path}).")
+        metrics.inc("prompt_tokens", tokens)
+        prompts.append(Prompt(inicio, final, text, tokens))
+    return prompts
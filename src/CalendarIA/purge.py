@@ -1,15 +1,19 @@
 from __future__ import annotations
 from pathlib import Path
 from datetime import datetime, date, time, timezone
-import time as _time
-import random
-from typing import Dict, Iterable, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from googleapiclient.errors import HttpError
-from google_calendar import ensure_api_auth
+from google_calendar import BATCH_MAX, load_credentials, run_batch, service_factory
+from ratelimit import RateLimiter
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Solo lo que usa la purga: páginas más pequeñas que el recurso completo
+LIST_FIELDS = "items(id,summary,start),nextPageToken"
+PREVIEW_MAX = 10
+
 
 def _parse_since(since: str) -> datetime:
     """
@@ -26,17 +30,20 @@ def _parse_since(since: str) -> datetime:
     return datetime.combine(date(y, m, d), time(0, 0, 0, tzinfo=timezone.utc))
 
 
-def _iter_events_since(service, calendar_id: str, time_min_iso: str):
+def _iter_events_since(service, calendar_id: str, time_min_iso: str, limiter: Optional[RateLimiter] = None,
+                       fields: Optional[str] = LIST_FIELDS):
     next_page = None
     while True:
-        result = service.events().list(
+        request = service.events().list(
             calendarId=calendar_id,
             timeMin=time_min_iso,
             maxResults=2500,
             singleEvents=True,
             orderBy='startTime',
-            pageToken=next_page
-        ).execute()
+            pageToken=next_page,
+            fields=fields,
+        )
+        result = limiter.call(request.execute, op="events.list") if limiter else request.execute()
         items = result.get('items', []) or []
         for it in items:
             yield it
@@ -52,26 +59,101 @@ def _should_delete(ev: dict, prefixes: Optional[Tuple[str, ...]]) -> bool:
     return any(summary.startswith(p) for p in prefixes)
 
 
-def _delete_with_retries(service, calendar_id: str, event_id: str, max_retries: int = 6) -> bool:
-    attempt = 0
-    while True:
-        try:
-            service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
-            return True
-        except HttpError as e:
-            status = getattr(e, "status_code", None) or (e.resp.status if hasattr(e, "resp") else None)
-            if status in (403, 429) and attempt < max_retries:
-                attempt += 1
-                sleep_s = min(64, 2 ** attempt) + random.uniform(0, 0.8)
-                print(f"      ⏳ Rate limit ({status}). Reintento {attempt} en {sleep_s:.1f}s…")
-                _time.sleep(sleep_s)
+def _delete_with_retries(service, calendar_id: str, event_id: str, limiter: RateLimiter) -> bool:
+    try:
+        limiter.call(lambda: service.events().delete(calendarId=calendar_id, eventId=event_id).execute(),
+                     indent="      ", op="events.delete")
+        return True
+    except Exception as e:
+        print(f"      ❌ Error: {e}")
+        return False
+
+
+def _delete_task(get_service: Callable, calendar_id: str, limiter: RateLimiter) -> Callable[[str], bool]:
+    # Se resuelve el service dentro del worker: cada hilo usa el suyo
+    return lambda event_id: _delete_with_retries(get_service(), calendar_id, event_id, limiter)
+
+
+def _delete_batch(service, calendar_id: str, event_ids: List[str], limiter: RateLimiter) -> int:
+    """Borra hasta BATCH_MAX eventos en una sola petición batch; devuelve cuántos se borraron."""
+    def _delete_factory(event_id: str):
+        return lambda: service.events().delete(calendarId=calendar_id, eventId=event_id)
+
+    ok, errors = run_batch(service, [(eid, _delete_factory(eid)) for eid in event_ids], limiter,
+                            retry_5xx=True, indent="      ")
+    for eid, e in errors.items():
+        print(f"      ❌ Error ({eid}): {e}")
+    return len(ok)
+
+
+def _batch_task(get_service: Callable, calendar_id: str, limiter: RateLimiter) -> Callable[[List[str]], int]:
+    return lambda event_ids: _delete_batch(get_service(), calendar_id, event_ids, limiter)
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for it in items:
+        chunk.append(it)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bounded_map(pool: ThreadPoolExecutor, fn: Callable, items: Iterable, limit: int) -> Iterator:
+    """Como pool.map pero consumiendo 'items' bajo demanda: como mucho 'limit' tareas en vuelo."""
+    pending = deque()
+    for it in items:
+        pending.append(pool.submit(fn, it))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _purge_calendar(get_service: Callable, calendar_id: str, time_min_iso: str,
+                    prefixes: Optional[Tuple[str, ...]], dry_run: bool, limiter: RateLimiter,
+                    pool: ThreadPoolExecutor, in_flight: int,
+                    batch: bool = False, index=None) -> Tuple[List[str], int, int, int, int]:
+    """
+    Pagina → filtra → borra en streaming; en memoria solo hay una página y las tareas en vuelo.
+    Devuelve (vista previa, encontrados, coincidentes, borrados, errores).
+    """
+    preview: List[str] = []
+    found = 0
+    matched = 0
+
+    if index is not None:
+        # Solo lo que CalendarIA creó: el índice se pone al día (syncToken) y responde en local
+        index.refresh(get_service(), calendar_id, limiter)
+        source = index.iter_owned_since(calendar_id, time_min_iso)
+    else:
+        source = _iter_events_since(get_service(), calendar_id, time_min_iso, limiter)
+
+    def _matching_ids():
+        nonlocal found, matched
+        for ev in source:
+            found += 1
+            if not _should_delete(ev, prefixes):
                 continue
-            else:
-                print(f"      ❌ Error: {e}")
-                return False
-        except Exception as e:
-            print(f"      ❌ Error: {e}")
-            return False
+            matched += 1
+            if len(preview) < PREVIEW_MAX:
+                start = ev.get('start', {}).get('dateTime', ev.get('start', {}).get('date', ''))
+                preview.append(f"   - {start}  {ev.get('summary','(sin título)')}")
+            yield ev['id']
+
+    if dry_run:
+        for _ in _matching_ids():
+            pass
+        return preview, found, matched, 0, 0
+
+    if batch:
+        borrados = sum(_bounded_map(pool, _batch_task(get_service, calendar_id, limiter),
+                                    _chunked(_matching_ids(), BATCH_MAX), in_flight))
+    else:
+        borrados = sum(_bounded_map(pool, _delete_task(get_service, calendar_id, limiter), _matching_ids(), in_flight))
+    return preview, found, matched, borrados, matched - borrados
 
 
 def purge_events(
@@ -82,6 +164,12 @@ def purge_events(
     dry_run: bool = True,
     client_secrets: Path = Path("secrets/calendar.json"),
     token_pickle: Path = Path("secrets/token.pickle"),
+    limiter: Optional[RateLimiter] = None,
+    workers: int = 1,
+    batch: bool = False,
+    index=None,
+    backend: str = "sync",
+    in_flight: int = 16,
 ) -> None:
     """
     Borra eventos desde 'since' (UTC) en los calendarios indicados.
@@ -89,61 +177,67 @@ def purge_events(
     - since: ISO simple (YYYY-MM-DD) o ISO completo (…T…Z)
     - prefixes: iterable de prefijos de título; si se da, solo borra los que empiecen por alguno
     - dry_run: True = no borra, solo muestra
+    - limiter: control de ritmo compartido (por defecto uno con los valores de RateLimiter)
+    - workers: hilos para listar los calendarios en paralelo y borrar en paralelo dentro de cada uno
+    - batch: borra en peticiones batch de hasta BATCH_MAX eventos
+    - index: SyncIndex; si se da, solo se consideran los eventos creados por CalendarIA (sync)
+    - backend: "sync" (googleapiclient + hilos) o "async" (httpx, 'in_flight' peticiones a la vez)
+    Los eventos se procesan en streaming, página a página, sin cargar el calendario entero en memoria.
     """
     dt_since = _parse_since(since)
     time_min_iso = dt_since.isoformat().replace("+00:00", "Z")
 
-    service = ensure_api_auth(client_secrets, token_pickle)
+    if backend == "async" and (batch or index is not None):
+        raise ValueError("El backend async no admite batch ni el índice local (--owned).")
+    limiter = limiter or RateLimiter()
 
     print(f"⏳ Buscando y {'simulando borrado' if dry_run else 'borrando'} eventos desde {dt_since.date()} (UTC)")
     print("Calendarios destino:")
     for name, cal_id in calendars.items():
         print(f"— {name}: {cal_id}")
 
-    total_borrados = 0
-    total_errores = 0
-
     pref_tuple = tuple(prefixes) if prefixes else None
+    totals = [0, 0]
 
-    for name, cal_id in calendars.items():
+    def _report(name: str, result: Tuple[List[str], int, int, int, int]) -> None:
+        preview, found, matched, borrados, errores = result
         print(f"\n📚 Calendario: {name}")
-        # Listado
-        events = list(_iter_events_since(service, cal_id, time_min_iso))
-        print(f"   Encontrados {len(events)} eventos desde {dt_since.date()}.")
-
-        # Vista previa (hasta 10)
-        preview = 0
-        for ev in events:
-            if _should_delete(ev, pref_tuple):
-                start = ev.get('start', {}).get('dateTime', ev.get('start', {}).get('date', ''))
-                print(f"   - {start}  {ev.get('summary','(sin título)')}")
-                preview += 1
-                if preview >= 10:
-                    break
-        if len(events) - preview > 0:
-            print(f"   ... y {len(events)-preview} más (no listados).")
+        print(f"   Encontrados {found} eventos desde {dt_since.date()}, {matched} coinciden.")
+        for line in preview:
+            print(line)
+        if matched - len(preview) > 0:
+            print(f"   ... y {matched-len(preview)} más (no listados).")
 
         if dry_run:
             print("   🚫 DRY-RUN activo. No se borra nada.")
-            continue
-
-        print("   🚨 Borrando…")
-        borrados = 0
-        errores = 0
-        for ev in events:
-            if not _should_delete(ev, pref_tuple):
-                continue
-            ok = _delete_with_retries(service, cal_id, ev['id'])
-            if ok:
-                borrados += 1
-            else:
-                errores += 1
-            _time.sleep(0.2 + random.uniform(0, 0.2))  # pacing
+            return
 
         print(f"   ✅ {borrados} eliminados, {errores} con error.")
-        total_borrados += borrados
-        total_errores += errores
-
-    print(f"\n🏁 Resumen total: {total_borrados} borrados, {total_errores} con error(es).")
+        totals[0] += borrados
+        totals[1] += errores
+
+    if backend == "async":
+        from async_calendar import purge_calendars
+        results = purge_calendars(calendars, time_min_iso, pref_tuple, dry_run,
+                                  load_credentials(client_secrets, token_pickle), limiter, max_in_flight=in_flight)
+        for name in calendars:
+            _report(name, results[name])
+    else:
+        get_service = service_factory(client_secrets, token_pickle)
+        workers = max(1, workers)
+        with ThreadPoolExecutor(max_workers=min(workers, max(1, len(calendars)))) as cal_pool, \
+                ThreadPoolExecutor(max_workers=workers) as delete_pool:
+            # Cada calendario es un pipeline propio; los resultados se muestran en el orden del YAML
+            pipelines = {
+                name: cal_pool.submit(_purge_calendar, get_service, cal_id, time_min_iso, pref_tuple,
+                                      dry_run, limiter, delete_pool, workers * 2, batch, index)
+                for name, cal_id in calendars.items()
+            }
+            for name in calendars:
+                _report(name, pipelines[name].result())
+
+    print(f"\n🏁 Resumen total: {totals[0]} borrados, {totals[1]} con error(es).")
+    if not dry_run:
+        print(limiter.report())
     if dry_run:
         print("👉 Ejecuta con --no-dry-run para borrar de verdad.")
@@ -0,0 +1,166 @@
+from __future__ import annotations
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+
+"""
+* Control de ritmo compartido por la importación y la purga.
+* Token bucket cuyo ritmo se ajusta por AIMD: sube poco a poco mientras las
+  llamadas van bien y se reduce a la mitad con cada 403/429.
+* Si el servidor manda Retry-After se respeta y se pausa a todos los hilos.
+"""
+
+RETRYABLE = (403, 429)
+
+
+def http_status(e: Exception) -> Optional[int]:
+    return getattr(e, "status_code", None) or (e.resp.status if hasattr(e, "resp") else None)
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Segundos indicados por la cabecera Retry-After (segundos o fecha HTTP), si viene."""
+    headers = getattr(e, "resp", None)
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    def __init__(self,
+                 qps: float = 5.0,
+                 min_qps: float = 0.5,
+                 max_qps: float = 10.0,
+                 increase: float = 0.25,
+                 decrease: float = 0.5,
+                 burst: float = 1.0,
+                 max_retries: int = 6,
+                 max_backoff: float = 64.0):
+        self.qps = qps
+        self.min_qps = min_qps
+        self.max_qps = max_qps
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+
+        self.calls = 0
+        self.throttles = 0
+        self.slept = 0.0
+        self._first: Optional[float] = None
+        self._last: Optional[float] = None
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "RateLimiter":
+        """Construye el limitador a partir de la sección [rate_limit] de settings.toml."""
+        conf = dict((settings or {}).get("rate_limit", {}))
+        return cls(**conf)
+
+    def acquire(self, n: int = 1) -> None:
+        """Reserva n llamadas; bloquea lo necesario para no superar el ritmo actual."""
+        wait = self.reserve(n)
+        if wait > 0:
+            time.sleep(wait)
+
+    def reserve(self, n: int = 1) -> float:
+        """Como acquire pero sin dormir: devuelve los segundos a esperar (para el backend asyncio)."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.qps)
+            self._stamp = now
+            # Se paga a posteriori: un batch sale enseguida y la deuda frena a las llamadas siguientes
+            paused = self._paused_until - now
+            debt = -self._tokens / self.qps if self._tokens < 0 else 0.0
+            wait = max(paused, debt)
+            self._tokens -= n
+            self.calls += n
+            if self._first is None:
+                self._first = now
+            self._last = now + wait
+            self.slept += max(wait, 0.0)
+        if wait > 0:
+            # Espera por la pausa de un 403/429 (backoff) o por el ritmo del token bucket (pacing)
+            metrics.inc("sleep_seconds", wait, kind="backoff" if paused >= debt else "pacing")
+        return max(wait, 0.0)
+
+    def on_success(self, n: int = 1) -> None:
+        with self._lock:
+            self.qps = min(self.max_qps, self.qps + self.increase * n)
+
+    def backoff(self, attempt: int) -> float:
+        return min(self.max_backoff, 2 ** attempt) + random.uniform(0, 0.8)
+
+    def on_throttle(self, attempt: int, delay: Optional[float] = None, count: int = 1) -> float:
+        """Registra un 403/429, reduce el ritmo y devuelve cuánto esperar antes del reintento."""
+        if delay is None:
+            delay = self.backoff(attempt)
+        with self._lock:
+            self.throttles += count
+            self.qps = max(self.min_qps, self.qps * self.decrease)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def sleep(self, seconds: float) -> None:
+        self.record_sleep(seconds)
+        time.sleep(seconds)
+
+    def record_sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.slept += seconds
+
+    def call(self, fn: Callable[[], Any], indent: str = "   ", op: str = "api") -> Any:
+        """
+        Ejecuta fn respetando el ritmo y reintentando los 403/429; el resto de errores se propagan.
+        Cada llamada queda en metrics como 'op': latencia con reintentos, estado final, reintentos y espera.
+        """
+        attempt = 0
+        slept = 0.0
+        t0 = time.perf_counter()
+        while True:
+            self.acquire()
+            try:
+                result = fn()
+            except Exception as e:
+                status = http_status(e)
+                if status in RETRYABLE and attempt < self.max_retries:
+                    attempt += 1
+                    sleep_s = self.on_throttle(attempt, retry_after(e))
+                    print(f"{indent}⏳ Rate limit ({status}). Reintento {attempt} en {sleep_s:.1f}s…")
+                    self.sleep(sleep_s)
+                    slept += sleep_s
+                    continue
+                metrics.METRICS.api_call(op, time.perf_counter() - t0, status or "error", attempt, slept)
+                raise
+            self.on_success()
+            metrics.METRICS.api_call(op, time.perf_counter() - t0, "ok", attempt, slept)
+            return result
+
+    @property
+    def achieved_qps(self) -> float:
+        if self._first is None or self._last is None or self._last <= self._first:
+            return float(self.calls) if self.calls else 0.0
+        return self.calls / (self._last - self._first)
+
+    def report(self) -> str:
+        return (f"📈 Ritmo: {self.calls} llamadas, {self.achieved_qps:.2f} QPS conseguidas, "
+                f"{self.throttles} limitación(es) 403/429, {self.slept:.1f}s en espera "
+                f"(ritmo final {self.qps:.2f} QPS).")
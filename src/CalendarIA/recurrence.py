@@ -0,0 +1,221 @@
+from __future__ import annotations
+import json
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+"""
+* Reglas de recurrencia (RRULE) en local: compactación del plan y expansión a ocurrencias concretas.
+* El modelo suele escribir cada rutina diaria ("Desayuno", "Descanso"…) como un evento por día; compact_plan
+  agrupa los bloques idénticos (mismo título, hora, duración y resto de campos) y los sustituye por un único
+  evento con rrule, así el .ics y la importación mandan una serie en lugar de siete eventos.
+* expand_rrule genera las ocurrencias (para validar sobre eventos concretos). Solo se admite el subconjunto
+  que usa el plan: FREQ=DAILY|WEEKLY con INTERVAL, COUNT, UNTIL y BYDAY sin ordinales; lo demás da ValueError.
+  Los desplazamientos en días se cachean por (regla, día de la semana de inicio, horizonte).
+"""
+
+DAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MIN_OCCURRENCES = 2
+# Horizonte de expansión para reglas sin COUNT ni UNTIL (las demás se expanden enteras)
+LIMIT_DAYS = 366
+
+
+class Rule(NamedTuple):
+    freq: str
+    interval: int
+    count: Optional[int]
+    until: Optional[datetime]
+    byday: Tuple[int, ...]
+
+
+def rrule_text(rrule: Any) -> str:
+    """RRULE tal cual si viene como texto; si viene como objeto {"freq": "weekly", "count": 2} se compone."""
+    if isinstance(rrule, dict):
+        return ";".join(f"{k.upper()}={','.join(map(str, v)) if isinstance(v, list) else str(v).upper()}"
+                        for k, v in rrule.items())
+    return str(rrule).removeprefix("RRULE:")
+
+
+def _until(value: str) -> datetime:
+    # UNTIL=20251111 o 20251111T235959[Z]; se compara como hora local de pared, igual que el resto del plan
+    value = value.rstrip("Z")
+    fmt = "%Y%m%dT%H%M%S" if "T" in value else "%Y%m%d"
+    until = datetime.strptime(value, fmt)
+    return until if "T" in value else until.replace(hour=23, minute=59, second=59)
+
+
+@lru_cache(maxsize=1024)
+def parse_rrule(rule: str) -> Rule:
+    try:
+        parts = dict(p.split("=", 1) for p in rule.upper().removeprefix("RRULE:").split(";") if p)
+        freq = parts.get("FREQ")
+        if freq not in ("DAILY", "WEEKLY"):
+            raise ValueError(f"FREQ={freq} no soportada")
+        unknown = set(parts) - {"FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "WKST"}
+        if unknown:
+            raise ValueError(f"partes no soportadas: {', '.join(sorted(unknown))}")
+        byday = tuple(sorted(DAYS.index(d) for d in parts["BYDAY"].split(","))) if "BYDAY" in parts else ()
+        return Rule(freq, max(1, int(parts.get("INTERVAL", 1))),
+                    int(parts["COUNT"]) if "COUNT" in parts else None,
+                    _until(parts["UNTIL"]) if "UNTIL" in parts else None, byday)
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"RRULE no soportada '{rule}': {e}")
+
+
+@lru_cache(maxsize=4096)
+def _offsets(rule: str, weekday: int, horizon: int) -> Tuple[int, ...]:
+    """Días desde DTSTART de cada ocurrencia (hasta 'horizon' días), para un inicio en 'weekday' (0 = lunes)."""
+    r = parse_rrule(rule)
+    out: List[int] = []
+
+    def full() -> bool:
+        return r.count is not None and len(out) >= r.count
+
+    if r.freq == "DAILY":
+        day = 0
+        while day <= horizon and not full():
+            if not r.byday or (weekday + day) % 7 in r.byday:
+                out.append(day)
+            day += r.interval
+    else:
+        # Semanas de lunes a domingo (WKST=MO) desde la de DTSTART, saltando 'interval' semanas
+        days = r.byday or (weekday,)
+        week_start = -weekday
+        while week_start <= horizon and not full():
+            for d in days:
+                off = week_start + d
+                if 0 <= off <= horizon and not full():
+                    out.append(off)
+            week_start += 7 * r.interval
+    return tuple(out)
+
+
+def expand_rrule(rule: str, dtstart: datetime, limit_days: int = LIMIT_DAYS) -> List[datetime]:
+    """
+    Ocurrencias de 'rule' a partir de dtstart (incluida si encaja en la regla).
+    limit_days solo recorta las reglas sin COUNT ni UNTIL, que no terminan nunca.
+    """
+    r = parse_rrule(rule)
+    if r.until is not None:
+        horizon = (r.until.date() - dtstart.date()).days
+        if r.count is not None:
+            horizon = min(horizon, r.count * r.interval * 7)
+    elif r.count is not None:
+        # Cada periodo (interval días o semanas) da al menos una ocurrencia o ninguna nunca: con esto basta
+        horizon = r.count * r.interval * 7
+    else:
+        horizon = limit_days
+    occurrences = [dtstart + timedelta(days=off) for off in _offsets(rule, dtstart.weekday(), max(horizon, -1))]
+    return [o for o in occurrences if r.until is None or o <= r.until]
+
+
+def expand_events(events: Iterable[dict], limit_days: int = LIMIT_DAYS) -> Iterator[dict]:
+    """
+    Eventos del plan con las series desplegadas en una copia por ocurrencia (sin 'rrule').
+    Una regla fuera del subconjunto soportado deja el evento como una sola ocurrencia, como antes.
+    """
+    for evj in events:
+        if not evj.get("rrule") or evj.get("all_day"):
+            yield evj
+            continue
+        try:
+            start = datetime.fromisoformat(str(evj["start"])[:19])
+            duration = datetime.fromisoformat(str(evj["end"])[:19]) - start
+            occurrences = expand_rrule(rrule_text(evj["rrule"]), start, limit_days)
+        except (KeyError, ValueError):
+            yield evj
+            continue
+        base = {k: v for k, v in evj.items() if k != "rrule"}
+        for occ in occurrences:
+            yield dict(base, start=occ.isoformat(), end=(occ + duration).isoformat())
+
+
+def _rule_for(days: List[date]) -> Optional[str]:
+    """RRULE (con COUNT) que genera exactamente esos días a partir del primero, si la hay."""
+    n = len(days)
+    steps = {(b - a).days for a, b in zip(days, days[1:])}
+    if len(steps) == 1:
+        step = steps.pop()
+        return f"FREQ=DAILY;COUNT={n}" if step == 1 else f"FREQ=DAILY;INTERVAL={step};COUNT={n}"
+    byday = ",".join(DAYS[d] for d in sorted({d.weekday() for d in days}))
+    rule = f"FREQ=WEEKLY;BYDAY={byday};COUNT={n}"
+    first = datetime.combine(days[0], datetime.min.time())
+    if [o.date() for o in expand_rrule(rule, first)] == days:
+        return rule
+    return None
+
+
+def _runs(days: List[date]) -> Iterator[List[date]]:
+    """Trocea una lista ordenada de días en progresiones aritméticas maximales (p.ej. L-M-X + S-D)."""
+    start = 0
+    while start < len(days):
+        end = start + 1
+        if end < len(days):
+            step = days[end] - days[start]
+            while end + 1 < len(days) and days[end + 1] - days[end] == step:
+                end += 1
+            end += 1
+        yield days[start:end]
+        start = end
+
+
+class Compaction:
+    def __init__(self, before: int, after: int, series: int):
+        self.before = before
+        self.after = after
+        self.series = series
+
+    def report(self) -> str:
+        if not self.series:
+            return f"🔁 Sin bloques repetidos que compactar: {self.before} inserciones."
+        return (f"🔁 Compactación RRULE: {self.before} → {self.after} inserciones "
+                f"({self.series} serie(s) recurrentes, {self.before - self.after} evento(s) menos).")
+
+
+def compact_events(events: List[dict], min_occurrences: int = MIN_OCCURRENCES) -> Tuple[List[dict], int]:
+    """
+    Sustituye los bloques idénticos que se repiten en días distintos por un evento con rrule.
+    Cada serie ocupa el lugar de su primera ocurrencia; devuelve (eventos, número de series).
+    """
+    groups: Dict[Tuple, List[Tuple[int, datetime]]] = {}
+    for i, evj in enumerate(events):
+        if evj.get("rrule") or evj.get("all_day") or "start" not in evj or "end" not in evj:
+            continue
+        try:
+            start = datetime.fromisoformat(str(evj["start"]))
+            end = datetime.fromisoformat(str(evj["end"]))
+        except ValueError:
+            continue
+        rest = json.dumps({k: v for k, v in evj.items() if k not in ("start", "end")}, sort_keys=True)
+        key = (start.time(), start.tzinfo, end - start, rest)
+        groups.setdefault(key, []).append((i, start))
+
+    replace: Dict[int, dict] = {}
+    drop = set()
+    series = 0
+    for members in groups.values():
+        if len(members) < min_occurrences:
+            continue
+        by_day: Dict[date, int] = {}
+        for i, start in sorted(members, key=lambda m: m[1]):
+            by_day.setdefault(start.date(), i)  # un duplicado exacto del mismo día queda como evento suelto
+        days = list(by_day)
+        rule = _rule_for(days)
+        chunks = [days] if rule else list(_runs(days))
+        for chunk in chunks:
+            if len(chunk) < min_occurrences:
+                continue
+            first = by_day[chunk[0]]
+            replace[first] = dict(events[first], rrule=rule if len(chunks) == 1 else _rule_for(chunk))
+            drop.update(by_day[d] for d in chunk[1:])
+            series += 1
+
+    out = [replace.get(i, evj) for i, evj in enumerate(events) if i not in drop]
+    return out, series
+
+
+def compact_plan(data: Dict[str, Any], min_occurrences: int = MIN_OCCURRENCES) -> Tuple[Dict[str, Any], Compaction]:
+    """Plan con los eventos compactados (el original no se modifica) y el recuento de inserciones antes/después."""
+    events = list(data.get("events", []))
+    compacted, series = compact_events(events, min_occurrences)
+    return dict(data, events=compacted), Compaction(len(events), len(compacted), series)
@@ -1,52 +1,80 @@
 from __future__ import annotations
 import re
-from typing import Dict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 """
 * En caso de que el promt se cambie el nombre de los eventos se deberia de cambiar aqui tambien
+  (o añadir reglas en la sección [routing] de settings.toml, que tienen prioridad)
 * Los emojis son opcionales y se usan para facilitar la identificacion visual de los eventos
 * Los eventos que no coincidan con ningun patron iran al calendario por defecto
+* Todas las reglas se compilan en UNA sola expresión (alternancia con grupos con nombre): un único
+  recorrido por título, respetando el orden de las reglas, y memoizado por título distinto.
 """
-_PATTERNS = [
-    (re.compile(r"^(💼\s*)?Trabajo$", re.I), "TRABAJO"),
-    (re.compile(r"^(🚗\s*)?Preparación y desplazamiento al trabajo", re.I), "TRABAJO"),
-    (re.compile(r"^(📚\s*)?Estudio\s*—\s*.+", re.I), "ESTUDIOS"),
-    (re.compile(r"^(💻\s*)?Mejora profesional", re.I), "MEJORA"),
-    (re.compile(r"^(🇬🇧\s*)?Inglés$", re.I), "MEJORA"),
-    (re.compile(r"^(☕\s*)?Desayuno$", re.I), "RUTINAS"),
-    (re.compile(r"^(🍝\s*)?Almuerzo$", re.I), "RUTINAS"),
-    (re.compile(r"^(🍽️\s*)?Cena$", re.I), "RUTINAS"),
-    (re.compile(r"^(🍎\s*)?Comer algo ligero$", re.I), "RUTINAS"),
-    (re.compile(r"^(🧘‍♂️\s*)?Pausa activa$", re.I), "RUTINAS"),
-    (re.compile(r"^(🥗\s*)?Pausa larga$", re.I), "RUTINAS"),
-    (re.compile(r"^(😴\s*)?Descanso$", re.I), "RUTINAS"),
-    (re.compile(r"^(😌\s*)?Descanso breve$", re.I), "RUTINAS"),
-    (re.compile(r"^(🏃‍♂️\s*)?Ejercicio matutino$", re.I), "RUTINAS"),
-    (re.compile(r"^(🌿\s*)?Bloque libre planificado$", re.I), "RUTINAS"),
+DEFAULT_RULES: List[Tuple[str, str]] = [
+    (r"(💼\s*)?Trabajo$", "TRABAJO"),
+    (r"(🚗\s*)?Preparación y desplazamiento al trabajo", "TRABAJO"),
+    (r"(📚\s*)?Estudio\s*—\s*.+", "ESTUDIOS"),
+    (r"(💻\s*)?Mejora profesional", "MEJORA"),
+    (r"(🇬🇧\s*)?Inglés$", "MEJORA"),
+    (r"(☕\s*)?Desayuno$", "RUTINAS"),
+    (r"(🍝\s*)?Almuerzo$", "RUTINAS"),
+    (r"(🍽️\s*)?Cena$", "RUTINAS"),
+    (r"(🍎\s*)?Comer algo ligero$", "RUTINAS"),
+    (r"(🧘‍♂️\s*)?Pausa activa$", "RUTINAS"),
+    (r"(🥗\s*)?Pausa larga$", "RUTINAS"),
+    (r"(😴\s*)?Descanso$", "RUTINAS"),
+    (r"(😌\s*)?Descanso breve$", "RUTINAS"),
+    (r"(🏃‍♂️\s*)?Ejercicio matutino$", "RUTINAS"),
+    (r"(🌿\s*)?Bloque libre planificado$", "RUTINAS"),
+    # Palabras clave en cualquier posición para títulos fuera de la lista del prompt
+    (r".*?(estudio|📚)", "ESTUDIOS"),
+    (r".*?(trabajo|💼)", "TRABAJO"),
+    (r".*?(rutina|🌀)", "RUTINAS"),
+    (r".*?(mejora|⚙️)", "MEJORA"),
 ]
 
-def pick_calendar_id(summary: str, calendars: dict) -> str:
-    """Devuelve el ID de calendario según el título o 'primary' por defecto."""
-    # Siempre trabajar con texto
-    title = (summary or "").lower().strip()
 
-    # Mapear por categorías conocidas
-    if "estudio" in title or "📚" in title:
-        return calendars.get("ESTUDIOS", "primary")
-    if "trabajo" in title or "💼" in title:
-        return calendars.get("TRABAJO", "primary")
-    if "rutina" in title or "🌀" in title:
-        return calendars.get("RUTINAS", "primary")
-    if "mejora" in title or "⚙️" in title:
-        return calendars.get("MEJORA", "primary")
+class Router:
+    def __init__(self, calendars: Dict[str, str], rules: Optional[Iterable[Tuple[str, str]]] = None):
+        self.calendars = calendars or {}
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        # Cada patrón va en su propio grupo; re.match prueba las alternativas en orden → prioridad estable
+        combined = "|".join(f"(?P<r{i}>(?:{pattern}))" for i, (pattern, _) in enumerate(self.rules))
+        self._regex = re.compile(combined, re.I)
+        self._categories = {f"r{i}": category for i, (_, category) in enumerate(self.rules)}
+        self.route = lru_cache(maxsize=4096)(self._route)
 
-    # Fallback total
-    return calendars.get("DEFAULT", "primary")
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any], calendars: Dict[str, str]) -> "Router":
+        """
+        Reglas extra de [routing] en settings.toml (categoría → lista de regex), antes que las de serie:
+            [routing]
+            ESTUDIOS = ["^Repaso .+"]
+        """
+        extra = [(pattern, category)
+                 for category, patterns in ((settings or {}).get("routing") or {}).items()
+                 for pattern in ([patterns] if isinstance(patterns, str) else patterns)]
+        return cls(calendars, extra + DEFAULT_RULES)
 
+    def category(self, summary: str) -> str:
+        m = self._regex.match((summary or "").strip())
+        return self._categories[m.lastgroup] if m else "DEFAULT"
+
+    def _route(self, summary: str) -> Tuple[str, str]:
+        """(categoría, calendarId) del título; 'primary' si la categoría no tiene calendario configurado."""
+        category = self.category(summary)
+        return category, str(self.calendars.get(category) or "").strip() or "primary"
+
+    def label(self, summary: str) -> str:
+        """Etiqueta para los logs: la categoría, marcando cuando cae en el calendario principal."""
+        category, _ = self.route(summary)
+        mapped = str(self.calendars.get(category) or "").strip()
+        return f"{category}{'' if mapped else '→PRIMARY'}"
 
 
 def pick_calendar_category(calendar_id: str, calendars: Dict[str, str]) -> str:
     for k, v in calendars.items():
         if v == calendar_id:
             return k
-    return "DESCONOCIDO"
\ No newline at end of file
+    return "DESCONOCIDO"
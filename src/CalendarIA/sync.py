@@ -0,0 +1,189 @@
+from __future__ import annotations
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from google_calendar import run_batch
+from ratelimit import RateLimiter
+
+"""
+* Sincronización idempotente: en lugar de insertar a ciegas se compara el plan con lo que ya hay.
+* Cada evento lleva en extendedProperties.private:
+    - calendaria_key: identidad estable (título + inicio); si cambia es otro evento
+    - calendaria_hash: huella del contenido; si cambia con la misma clave se hace patch
+* Solo se tocan eventos marcados como nuestros (calendaria=1); lo demás del calendario no se mira.
+"""
+
+OWNER_PROP = "calendaria"
+KEY_PROP = "calendaria_key"
+HASH_PROP = "calendaria_hash"
+LIST_FIELDS = "items(id,etag,start,end,extendedProperties),nextPageToken"
+
+
+def event_key(summary: str, start_iso: str) -> str:
+    return hashlib.sha1(f"{summary}\x1f{start_iso}".encode("utf-8")).hexdigest()[:20]
+
+
+def content_hash(calendar_id: str, body: dict) -> str:
+    payload = json.dumps([calendar_id, body], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
+
+
+def _start_iso(body: dict) -> str:
+    return body["start"].get("dateTime") or body["start"].get("date", "")
+
+
+def _end_iso(body: dict) -> str:
+    return body["end"].get("dateTime") or body["end"].get("date", "")
+
+
+def tag_body(calendar_id: str, body: dict) -> Tuple[str, str, dict]:
+    """Devuelve (clave, hash, body con las propiedades privadas de sincronización)."""
+    key = event_key(body["summary"], _start_iso(body))
+    h = content_hash(calendar_id, body)
+    tagged = dict(body)
+    tagged["extendedProperties"] = {"private": {OWNER_PROP: "1", KEY_PROP: key, HASH_PROP: h}}
+    return key, h, tagged
+
+
+def iter_owned(service, calendar_id: str, time_min: str, time_max: str,
+               limiter: RateLimiter) -> Iterator[dict]:
+    """Eventos marcados como nuestros en [time_min, time_max) de un calendario."""
+    next_page = None
+    while True:
+        request = service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min,
+            timeMax=time_max,
+            privateExtendedProperty=f"{OWNER_PROP}=1",
+            maxResults=2500,
+            pageToken=next_page,
+            fields=LIST_FIELDS,
+        )
+        result = limiter.call(request.execute, op="events.list")
+        yield from result.get("items", []) or []
+        next_page = result.get("nextPageToken")
+        if not next_page:
+            break
+
+
+def diff(plan: List[Tuple[str, dict]], remote: Dict[str, List[dict]]):
+    """
+    Compara el plan con los eventos remotos.
+    - plan: lista de (calendarId, body)
+    - remote: calendarId → eventos nuestros listados
+    Devuelve (inserts, patches, deletes, sin_cambios):
+      inserts: [(calendarId, body)], patches: [(calendarId, eventId, body)], deletes: [(calendarId, eventId)]
+    """
+    by_key: Dict[str, List[Tuple[str, dict]]] = {}
+    for cal_id, events in remote.items():
+        for ev in events:
+            props = (ev.get("extendedProperties") or {}).get("private") or {}
+            by_key.setdefault(props.get(KEY_PROP, ""), []).append((cal_id, ev))
+
+    inserts, patches, deletes = [], [], []
+    unchanged = 0
+    seen = set()
+    for cal_id, body in plan:
+        key, h, tagged = tag_body(cal_id, body)
+        if key in seen:
+            # Evento repetido dentro del propio plan: se sube una sola vez
+            continue
+        seen.add(key)
+        matches = by_key.pop(key, [])
+        same_cal = [ev for c, ev in matches if c == cal_id]
+        # Duplicados de ejecuciones anteriores o eventos que cambiaron de calendario
+        deletes.extend((c, ev["id"]) for c, ev in matches if c != cal_id)
+        deletes.extend((cal_id, ev["id"]) for ev in same_cal[1:])
+        if not same_cal:
+            inserts.append((cal_id, tagged))
+        elif ((same_cal[0].get("extendedProperties") or {}).get("private") or {}).get(HASH_PROP) != h:
+            patches.append((cal_id, same_cal[0]["id"], tagged))
+        else:
+            unchanged += 1
+
+    # Lo que queda es nuestro pero ya no está en el plan
+    for leftovers in by_key.values():
+        deletes.extend((c, ev["id"]) for c, ev in leftovers)
+    return inserts, patches, deletes, unchanged
+
+
+def _execute(service, calls: List[Tuple[str, Callable]], limiter: RateLimiter, batch: bool):
+    """Ejecuta (clave, request_factory) en batch o una a una; devuelve (ok, errores) como run_batch."""
+    if batch:
+        return run_batch(service, calls, limiter)
+    ok: Dict[str, dict] = {}
+    errors: Dict[str, Exception] = {}
+    for key, factory in calls:
+        try:
+            ok[key] = limiter.call(lambda: factory().execute(), op="events.sync")
+        except Exception as e:
+            errors[key] = e
+    return ok, errors
+
+
+def _update_index(index, ok: Dict[str, dict], inserts, patches, deletes) -> None:
+    """Refleja en el índice las escrituras que han ido bien, sin esperar al siguiente syncToken."""
+    for i, (cal_id, _) in enumerate(inserts):
+        if f"i{i}" in ok:
+            index.upsert(cal_id, ok[f"i{i}"])
+    for i, (cal_id, _, _) in enumerate(patches):
+        if f"p{i}" in ok:
+            index.upsert(cal_id, ok[f"p{i}"])
+    for i, (cal_id, event_id) in enumerate(deletes):
+        if f"d{i}" in ok:
+            index.remove(cal_id, event_id)
+
+
+def sync_items(service, items: List[Tuple[str, dict, str]], calendars: Dict[str, str],
+               limiter: RateLimiter, *, batch: bool = False, index=None) -> int:
+    """
+    Sincroniza los eventos del plan con Google Calendar y devuelve el número de errores.
+    - items: (calendarId, body, etiqueta) como los genera google_calendar._build_insert_items
+    - calendars: calendarios configurados; también se revisan por si un evento cambió de categoría
+    - index: SyncIndex opcional; si se da, lo existente se lee del índice local (tras traer solo
+      los cambios remotos con syncToken) en lugar de listar cada calendario
+    """
+    if not items:
+        print("   (plan vacío, nada que sincronizar)")
+        return 0
+
+    # Ventana a días completos: lo nuestro de esos días que ya no esté en el plan se borra
+    first = min((datetime.fromisoformat(_start_iso(body)) for _, body, _ in items), key=lambda d: d.timestamp())
+    last = max((datetime.fromisoformat(_end_iso(body)) for _, body, _ in items), key=lambda d: d.timestamp())
+    time_min = first.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+    time_max = (last - timedelta(microseconds=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    time_max = (time_max + timedelta(days=1)).isoformat()
+    cal_ids = {cal_id for cal_id, _, _ in items}
+    cal_ids |= {str(v).strip() for v in (calendars or {}).values() if v and str(v).strip()}
+
+    if index is not None:
+        changes = sum(index.refresh(service, cal_id, limiter) for cal_id in sorted(cal_ids))
+        print(f"   🗂️ Índice local al día ({changes} cambio(s) remotos).")
+        remote = index.owned(sorted(cal_ids), time_min, time_max)
+    else:
+        remote = {cal_id: list(iter_owned(service, cal_id, time_min, time_max, limiter)) for cal_id in sorted(cal_ids)}
+    inserts, patches, deletes, unchanged = diff([(c, b) for c, b, _ in items], remote)
+    print(f"🔁 Sync {time_min[:10]} → {time_max[:10]}: {len(inserts)} nuevos, {len(patches)} a actualizar, "
+          f"{len(deletes)} a borrar, {unchanged} sin cambios.")
+
+    events = service.events()
+    calls: List[Tuple[str, Callable]] = []
+    labels: Dict[str, str] = {}
+    for i, (cal_id, body) in enumerate(inserts):
+        calls.append((f"i{i}", lambda c=cal_id, b=body: events.insert(calendarId=c, body=b)))
+        labels[f"i{i}"] = f"alta {body['summary']}"
+    for i, (cal_id, event_id, body) in enumerate(patches):
+        calls.append((f"p{i}", lambda c=cal_id, e=event_id, b=body: events.patch(calendarId=c, eventId=e, body=b)))
+        labels[f"p{i}"] = f"cambio {body['summary']}"
+    for i, (cal_id, event_id) in enumerate(deletes):
+        calls.append((f"d{i}", lambda c=cal_id, e=event_id: events.delete(calendarId=c, eventId=e)))
+        labels[f"d{i}"] = f"baja {event_id}"
+
+    ok, errors = _execute(service, calls, limiter, batch)
+    if index is not None:
+        _update_index(index, ok, inserts, patches, deletes)
+    for key, e in errors.items():
+        print(f"   ❌ [{labels[key]}] {e}")
+    return len(errors)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from ratelimit import RateLimiter, http_status
+from sync import HASH_PROP, KEY_PROP, OWNER_PROP
+
+"""
+* Índice local (SQLite) de los eventos que ha creado CalendarIA: clave/hash del plan → evento de Google.
+* Se mantiene al día con el syncToken de la API: cada ejecución solo descarga los cambios desde la anterior.
+* Si Google invalida el token (410 Gone) se vacía ese calendario y se hace un listado completo.
+"""
+
+SYNC_FIELDS = "items(id,etag,status,summary,start,end,extendedProperties),nextPageToken,nextSyncToken"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id    TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    hash        TEXT NOT NULL,
+    etag        TEXT,
+    summary     TEXT,
+    start       TEXT,
+    start_ts    REAL,
+    end_ts      REAL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_window ON events (calendar_id, start_ts, end_ts);
+CREATE TABLE IF NOT EXISTS sync_tokens (
+    calendar_id TEXT PRIMARY KEY,
+    token       TEXT NOT NULL
+);
+"""
+
+
+def _ts(when: dict) -> float:
+    """Epoch de un start/end de la API (dateTime con offset o date de día completo)."""
+    if when.get("dateTime"):
+        return datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00")).timestamp()
+    return datetime.fromisoformat(when["date"]).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _private(ev: dict) -> dict:
+    return (ev.get("extendedProperties") or {}).get("private") or {}
+
+
+class SyncIndex:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> Optional["SyncIndex"]:
+        """Abre el índice de [output] index en settings.toml; None si no está configurado."""
+        path = (settings or {}).get("output", {}).get("index")
+        return cls(Path(path)) if path else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # --- escritura -------------------------------------------------------
+
+    def upsert(self, calendar_id: str, ev: dict) -> None:
+        """Guarda un evento si es nuestro; si ya no lo es (o está cancelado) lo quita."""
+        props = _private(ev)
+        with self._lock, self._db:
+            if ev.get("status") == "cancelled" or props.get(OWNER_PROP) != "1":
+                self._db.execute("DELETE FROM events WHERE calendar_id=? AND event_id=?", (calendar_id, ev["id"]))
+                return
+            start = ev.get("start") or {}
+            self._db.execute(
+                "INSERT OR REPLACE INTO events VALUES (?,?,?,?,?,?,?,?,?)",
+                (calendar_id, ev["id"], props.get(KEY_PROP, ""), props.get(HASH_PROP, ""), ev.get("etag"),
+                 ev.get("summary"), start.get("dateTime") or start.get("date"), _ts(start), _ts(ev.get("end") or start)),
+            )
+
+    def remove(self, calendar_id: str, event_id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM events WHERE calendar_id=? AND event_id=?", (calendar_id, event_id))
+
+    def _reset(self, calendar_id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM events WHERE calendar_id=?", (calendar_id,))
+            self._db.execute("DELETE FROM sync_tokens WHERE calendar_id=?", (calendar_id,))
+
+    def _save_token(self, calendar_id: str, token: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO sync_tokens VALUES (?,?)", (calendar_id, token))
+
+    def _token(self, calendar_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT token FROM sync_tokens WHERE calendar_id=?", (calendar_id,)).fetchone()
+        return row[0] if row else None
+
+    # --- sincronización con la API --------------------------------------
+
+    def refresh(self, service, calendar_id: str, limiter: RateLimiter) -> int:
+        """
+        Trae los cambios del calendario desde la última vez (syncToken) y devuelve cuántos llegaron.
+        Sin token, o con el token caducado (410), vuelve a listar el calendario entero.
+        """
+        token = self._token(calendar_id)
+        try:
+            return self._pull(service, calendar_id, limiter, token)
+        except Exception as e:
+            if token is None or http_status(e) != 410:
+                raise
+            print(f"   ♻️ Token de sincronización caducado para {calendar_id}; resincronizando completo…")
+            self._reset(calendar_id)
+            return self._pull(service, calendar_id, limiter, None)
+
+    def _pull(self, service, calendar_id: str, limiter: RateLimiter, token: Optional[str]) -> int:
+        changes = 0
+        next_page = None
+        while True:
+            request = service.events().list(
+                calendarId=calendar_id,
+                syncToken=token,
+                maxResults=2500,
+                pageToken=next_page,
+                fields=SYNC_FIELDS,
+            )
+            result = limiter.call(request.execute, op="events.list")
+            for ev in result.get("items", []) or []:
+                self.upsert(calendar_id, ev)
+                changes += 1
+            next_page = result.get("nextPageToken")
+            if not next_page:
+                break
+        if result.get("nextSyncToken"):
+            self._save_token(calendar_id, result["nextSyncToken"])
+        return changes
+
+    # --- consultas -------------------------------------------------------
+
+    def owned(self, calendar_ids: Iterable[str], time_min: str, time_max: Optional[str] = None) -> Dict[str, List[dict]]:
+        """
+        Eventos nuestros que se solapan con [time_min, time_max), en el mismo formato que la API
+        (id, etag, summary, start, extendedProperties) para poder reutilizar sync.diff y la purga.
+        """
+        lo = _ts({"dateTime": time_min})
+        hi = _ts({"dateTime": time_max}) if time_max else float("inf")
+        out: Dict[str, List[dict]] = {}
+        with self._lock:
+            for cal_id in calendar_ids:
+                rows = self._db.execute(
+                    "SELECT event_id, key, hash, etag, summary, start FROM events "
+                    "WHERE calendar_id=? AND end_ts>? AND start_ts<? ORDER BY start_ts",
+                    (cal_id, lo, hi),
+                ).fetchall()
+                out[cal_id] = [
+                    {"id": event_id, "etag": etag, "summary": summary,
+                     "start": {"date": start} if start and "T" not in start else {"dateTime": start},
+                     "extendedProperties": {"private": {OWNER_PROP: "1", KEY_PROP: key, HASH_PROP: h}}}
+                    for event_id, key, h, etag, summary, start in rows
+                ]
+        return out
+
+    def iter_owned_since(self, calendar_id: str, time_min: str) -> Iterator[dict]:
+        yield from self.owned([calendar_id], time_min)[calendar_id]
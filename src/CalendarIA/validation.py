@@ -0,0 +1,215 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from recurrence import expand_events
+from routing import Router
+
+"""
+* Validación del plan antes de subirlo: solapes entre eventos, huecos dentro del día y eventos que pisan
+  un turno de trabajo del schedule.
+* Todo se carga en columnas (inicio/fin en segundos de hora local de pared + código de categoría) y se
+  resuelve ordenando y barriendo con searchsorted: O(n log n + solapes), sin bucles O(n²).
+* Los eventos de día completo no entran: abarcan el día entero y se solaparían con todo.
+"""
+
+DAY = 86400
+
+
+def _seconds(values: Iterable[str]) -> np.ndarray:
+    """ISO local ('2025-11-05T09:00[:00][+01:00]') → segundos de reloj local, ignorando el offset como parse_local."""
+    try:
+        return np.array([str(v)[:19] for v in values], dtype="datetime64[s]").astype(np.int64)
+    except ValueError as e:
+        raise ValueError(f"❌ Fecha inválida en el plan: {e}")
+
+
+def _iso(seconds: int) -> str:
+    return str(np.datetime64(int(seconds), "s"))
+
+
+def _pairs(first: np.ndarray, counts: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Expande "el elemento i empareja con counts[i] posiciones a partir de first[i]" a dos arrays (i, posición),
+    sin bucles de Python. Se materializan como mucho 'limit' parejas (el total se cuenta aparte).
+    """
+    if counts.sum() > limit:
+        counts = np.where(np.cumsum(counts) <= limit, counts, 0)
+    total = int(counts.sum())
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, first[owner] + offsets
+
+
+class PlanArrays:
+    """Eventos del plan en columnas, en el orden del JSON."""
+
+    def __init__(self, summaries: List[str], start: np.ndarray, end: np.ndarray,
+                 codes: np.ndarray, categories: List[str]):
+        self.summaries = summaries
+        self.start = start
+        self.end = end
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_events(cls, events: Iterable[dict], router: Optional[Router] = None) -> "PlanArrays":
+        timed = [ev for ev in events if not ev.get("all_day", False)]
+        router = router or Router({})
+        summaries = [ev.get("summary") or "(sin título)" for ev in timed]
+        categories: List[str] = []
+        index: Dict[str, int] = {}
+        codes = np.empty(len(timed), dtype=np.int16)
+        for i, summary in enumerate(summaries):
+            category = router.route(summary)[0]
+            if category not in index:
+                index[category] = len(categories)
+                categories.append(category)
+            codes[i] = index[category]
+        return cls(summaries, _seconds(ev["start"] for ev in timed), _seconds(ev["end"] for ev in timed),
+                   codes, categories)
+
+    def __len__(self) -> int:
+        return len(self.summaries)
+
+    def code(self, category: str) -> int:
+        return self.categories.index(category) if category in self.categories else -1
+
+
+class Shifts:
+    """Turnos del schedule ('trabajo': fecha → "HH:MM - HH:MM" o "Libranza") como intervalos ordenados."""
+
+    def __init__(self, trabajo: Dict[str, str]):
+        days, starts, ends = [], [], []
+        for day, value in sorted((str(k), str(v)) for k, v in (trabajo or {}).items()):
+            if "-" not in value or ":" not in value:
+                continue  # Libranza u otro texto sin horas
+            begin, finish = (part.strip() for part in value.split("-", 1))
+            days.append(day)
+            starts.append(f"{day}T{begin}")
+            ends.append(f"{day}T{finish}")
+        self.days = days
+        self.start = _seconds(starts)
+        self.end = _seconds(ends)
+        # Turno nocturno que cruza la medianoche ("22:00 - 06:00")
+        self.end = np.where(self.end <= self.start, self.end + DAY, self.end)
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+
+class ValidationReport:
+    """Resultado de validate_plan. Guarda índices sobre PlanArrays; los detalles se formatean al pedirlos."""
+
+    def __init__(self, plan: PlanArrays, shifts: Shifts, overlaps: Tuple[np.ndarray, np.ndarray], overlap_count: int,
+                 gaps: Tuple[np.ndarray, np.ndarray], conflicts: Tuple[np.ndarray, np.ndarray], conflict_count: int,
+                 uncovered: np.ndarray, max_gap: int):
+        self.plan = plan
+        self.shifts = shifts
+        self.overlaps = overlaps
+        self.overlap_count = overlap_count
+        self.gaps = gaps
+        self.conflicts = conflicts
+        self.conflict_count = conflict_count
+        self.uncovered = uncovered
+        self.max_gap = max_gap
+
+    @property
+    def ok(self) -> bool:
+        """Sin solapes ni choques con turnos; los huecos y turnos sin evento son solo avisos."""
+        return self.overlap_count == 0 and self.conflict_count == 0
+
+    def to_dict(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        plan, shifts = self.plan, self.shifts
+        a, b = (x[:limit] for x in self.overlaps)
+        g_from, g_to = (x[:limit] for x in self.gaps)
+        c_ev, c_shift = (x[:limit] for x in self.conflicts)
+        return {
+            "events": len(plan),
+            "ok": self.ok,
+            "overlaps": [
+                {"a": plan.summaries[i], "b": plan.summaries[j],
+                 "start": _iso(max(plan.start[i], plan.start[j])), "end": _iso(min(plan.end[i], plan.end[j])),
+                 "minutes": int(min(plan.end[i], plan.end[j]) - max(plan.start[i], plan.start[j])) // 60}
+                for i, j in zip(a.tolist(), b.tolist())
+            ],
+            "overlap_count": self.overlap_count,
+            "gaps": [
+                {"start": _iso(s), "end": _iso(e), "minutes": int(e - s) // 60}
+                for s, e in zip(g_from.tolist(), g_to.tolist())
+            ],
+            "conflicts": [
+                {"event": plan.summaries[i], "start": _iso(plan.start[i]), "end": _iso(plan.end[i]),
+                 "shift": f"{_iso(shifts.start[k])} → {_iso(shifts.end[k])}"}
+                for i, k in zip(c_ev.tolist(), c_shift.tolist())
+            ],
+            "conflict_count": self.conflict_count,
+            "uncovered_shifts": [shifts.days[k] for k in self.uncovered.tolist()],
+        }
+
+    def summary(self, limit: int = 10) -> str:
+        d = self.to_dict(limit)
+        head = "✅ Plan válido" if self.ok else "⚠️ Plan con problemas"
+        lines = [f"{head}: {d['events']} eventos, {self.overlap_count} solape(s), "
+                 f"{self.conflict_count} choque(s) con turnos, {len(self.gaps[0])} hueco(s) > "
+                 f"{self.max_gap // 60} min, {len(self.uncovered)} turno(s) sin evento de trabajo."]
+        lines += [f"   ↔️ {o['a']} / {o['b']}: {o['start']} → {o['end']} ({o['minutes']} min)" for o in d["overlaps"]]
+        lines += [f"   💼 {c['event']} ({c['start']} → {c['end']}) pisa el turno {c['shift']}" for c in d["conflicts"]]
+        lines += [f"   ⏸️ Hueco {g['start']} → {g['end']} ({g['minutes']} min)" for g in d["gaps"]]
+        lines += [f"   ❔ Turno del {day} sin evento de trabajo" for day in d["uncovered_shifts"][:limit]]
+        return "\n".join(lines)
+
+
+@metrics.timed("validation")
+def validate_plan(events: Iterable[dict], trabajo: Optional[Dict[str, str]] = None, router: Optional[Router] = None,
+                  *, max_gap_minutes: float = 10, max_pairs: int = 100_000) -> ValidationReport:
+    """
+    Valida los eventos del JSON del plan contra sí mismos y contra los turnos del schedule.
+    - Solape: dos eventos con intersección positiva (tocarse en un extremo no cuenta).
+    - Hueco: tiempo sin ningún evento entre dos del mismo día mayor que max_gap_minutes.
+    - Choque: un evento que pisa un turno; solo se permiten eventos TRABAJO contenidos en el turno.
+    - Turno sin cubrir: turno del schedule sin ningún evento TRABAJO dentro.
+    Los eventos con rrule se validan ocurrencia a ocurrencia.
+    """
+    plan = PlanArrays.from_events(expand_events(events), router)
+    shifts = Shifts(trabajo or {})
+    max_gap = int(max_gap_minutes * 60)
+    empty = np.empty(0, dtype=np.int64)
+
+    order = np.argsort(plan.start, kind="stable")
+    s, e = plan.start[order], plan.end[order]
+    n = len(order)
+
+    # Solapes: con los inicios ordenados, i solapa con todos los siguientes que empiezan antes de que i acabe
+    first = np.arange(n) + 1
+    counts = np.maximum(np.searchsorted(s, e, side="left") - first, 0)
+    owner, other = _pairs(first, counts, max_pairs)
+    overlaps = (order[owner], order[other])
+
+    # Huecos: barrido con el fin más tardío alcanzado hasta cada evento
+    if n > 1:
+        reach = np.maximum.accumulate(e)[:-1]
+        nxt = s[1:]
+        mask = (nxt - reach > max_gap) & (reach // DAY == nxt // DAY)
+        gaps = (reach[mask], nxt[mask])
+    else:
+        gaps = (empty, empty)
+
+    # Turnos: [primer turno que acaba después del inicio, primer turno que empieza en/tras el fin)
+    if len(shifts) and n:
+        lo = np.searchsorted(shifts.end, plan.start, side="right")
+        hi = np.searchsorted(shifts.start, plan.end, side="left")
+        ev, shift = _pairs(lo, np.maximum(hi - lo, 0), np.iinfo(np.int64).max)
+        inside = ((plan.codes[ev] == plan.code("TRABAJO"))
+                  & (plan.start[ev] >= shifts.start[shift]) & (plan.end[ev] <= shifts.end[shift]))
+        conflicts = (ev[~inside], shift[~inside])
+        covered = np.bincount(shift[inside], minlength=len(shifts)) > 0
+        uncovered = np.flatnonzero(~covered)
+    else:
+        conflicts = (empty, empty)
+        uncovered = np.arange(len(shifts))
+
+    return ValidationReport(plan, shifts, overlaps, int(counts.sum()), gaps,
+                            conflicts, len(conflicts[0]), uncovered, max_gap)